@@ -0,0 +1,294 @@
+"""
+Parallel Multi-Day Availability Prefetch
+
+This module reads court availability for a whole range of dates at once
+instead of one day after another. Over HTTP the days are fetched concurrently
+on the pooled ResilientSession; where plain HTTP is not usable each day is
+opened in its own browser tab instead and all tabs load side by side. Every request
+still goes through the host-wide rate limiter. Days are merged into a single
+AvailabilityModel and streamed to the caller as each one completes, so a week
+costs roughly one page load rather than seven.
+
+Usage:
+    with AvailabilityPrefetcher(fetch_day=http_day_fetcher(client)) as prefetcher:
+        for day in prefetcher.stream(upcoming_dates(7)):
+            print(day.date, len(day.records))
+        print(prefetcher.model.free_cells())
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from selenium.common.exceptions import NoSuchWindowException, WebDriverException
+
+import config
+from page_parser import SlotRecord, free_cells, parse_page
+from rate_limiter import PRIORITY_POLLING, shared_limiter
+from resilient_http import ResilientSession
+
+
+class DayResult(NamedTuple):
+    """One day's outcome, as streamed by the prefetcher."""
+
+    date: str
+    records: List[SlotRecord]
+    error: Optional[Exception]
+    elapsed: float
+
+
+class AvailabilityModel:
+    """
+    Availability of several days merged into one view.
+    """
+
+    def __init__(self):
+        self.days: Dict[str, List[SlotRecord]] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.updated_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def update(self, result: DayResult):
+        """
+        Merge one day's result, replacing whatever was known about that day.
+
+        Args:
+            result: The day's DayResult; a failed day keeps its previous records
+        """
+        with self._lock:
+            if result.error is not None:
+                self.errors[result.date] = result.error
+                return
+            self.errors.pop(result.date, None)
+            self.days[result.date] = list(result.records)
+            self.updated_at[result.date] = time.time()
+
+    def records(self) -> List[SlotRecord]:
+        """Get every known slot record, ordered by date."""
+        with self._lock:
+            return [record for date in sorted(self.days) for record in self.days[date]]
+
+    def free_cells(self) -> List[tuple]:
+        """Get the free (date, court, hour) cells of every known day."""
+        return free_cells(self.records())
+
+
+def http_day_fetcher(client: ResilientSession, url_template: Optional[str] = None) -> Callable[[str], List[SlotRecord]]:
+    """
+    Build a function that reads one day's slot records over HTTP.
+
+    Args:
+        client: The pooled session to fetch with; it consults the rate limiter itself
+        url_template: Availability URL with a {date} placeholder. If None, uses config default
+
+    Returns:
+        Function taking a date string and returning its slot records
+    """
+    from watch_daemon import http_fetcher
+    template = url_template or config.VFMC_AVAILABILITY_URL
+    if not template:
+        raise ValueError("No availability URL configured")
+    return http_fetcher(client, template, lambda date, response: parse_page(response.text, default_date=date))
+
+
+class AvailabilityPrefetcher:
+    """
+    Fetches a range of days concurrently, over HTTP or in browser tabs.
+    """
+
+    def __init__(self, fetch_day: Optional[Callable[[str], List[SlotRecord]]] = None,
+                 scraper=None, url_template: Optional[str] = None, max_workers: int = None,
+                 model: Optional[AvailabilityModel] = None, tab_timeout: float = None):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            fetch_day: Blocking function returning one day's slot records, e.g. from
+                http_day_fetcher(). Preferred whenever it is given
+            scraper: Started WeChatBrowserScraper whose tabs are used when fetch_day is None
+            url_template: Page URL with a {date} placeholder for the tab path. If None,
+                uses config default
+            max_workers: Days fetched at the same time. If None, uses config default
+            model: Model the results are merged into. If None, a new one is created
+            tab_timeout: Seconds to wait for a tab to finish loading. If None, uses config default
+        """
+        if fetch_day is None and scraper is None:
+            raise ValueError("Either fetch_day or scraper is required")
+        self.fetch_day = fetch_day
+        self.scraper = scraper
+        self.url_template = url_template or config.VFMC_AVAILABILITY_URL
+        self.max_workers = max_workers or config.PREFETCH_WORKERS
+        self.model = model or AvailabilityModel()
+        self.tab_timeout = tab_timeout or config.DEFAULT_TIMEOUT
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def stream(self, dates: Iterable[str]) -> Iterator[DayResult]:
+        """
+        Fetch every date and yield each day as soon as it completes.
+
+        Args:
+            dates: Dates as YYYY-MM-DD strings
+
+        Yields:
+            DayResult per date, in completion order; each is already merged into the model
+        """
+        dates = list(dict.fromkeys(dates))
+        results = self._stream_http(dates) if self.fetch_day is not None else self._stream_tabs(dates)
+        for result in results:
+            self.model.update(result)
+            yield result
+
+    def fetch(self, dates: Iterable[str],
+              on_day: Optional[Callable[[DayResult], None]] = None) -> AvailabilityModel:
+        """
+        Fetch every date and return the merged model.
+
+        Args:
+            dates: Dates as YYYY-MM-DD strings
+            on_day: Called with each DayResult as it completes
+
+        Returns:
+            The availability model
+        """
+        for result in self.stream(dates):
+            if on_day is not None:
+                on_day(result)
+        return self.model
+
+    def _fetch_one(self, date: str) -> DayResult:
+        started = time.monotonic()
+        try:
+            records = self.fetch_day(date)
+        except Exception as e:
+            return DayResult(date, [], e, time.monotonic() - started)
+        return DayResult(date, list(records), None, time.monotonic() - started)
+
+    def _stream_http(self, dates: List[str]) -> Iterator[DayResult]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+        futures = [self._executor.submit(self._fetch_one, date) for date in dates]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _open_tab(self, url: str) -> str:
+        driver = self.scraper.driver
+        # Target.createTarget starts the load without waiting for it; chromedriver's
+        # window handles are the target ids
+        try:
+            return driver.execute_cdp_cmd("Target.createTarget", {"url": url})["targetId"]
+        except (WebDriverException, KeyError):
+            before = set(driver.window_handles)
+            driver.execute_script("window.open(arguments[0], '_blank');", url)
+            return next(h for h in driver.window_handles if h not in before)
+
+    def _stream_tabs(self, dates: List[str]) -> Iterator[DayResult]:
+        if not self.url_template:
+            raise ValueError("No availability URL configured")
+        driver = self.scraper.driver
+        if driver is None:
+            raise RuntimeError("Browser not started. Call start() first.")
+        home = driver.current_window_handle
+        limiter = None if getattr(self.scraper, "backend", None) == "fake" else shared_limiter()
+        pending = list(dates)
+        loading: Dict[str, tuple] = {}
+        try:
+            while pending or loading:
+                # Keep up to max_workers tabs loading at once
+                while pending and len(loading) < self.max_workers:
+                    date = pending.pop(0)
+                    url = self.url_template.format(date=date)
+                    started = time.monotonic()
+                    # A day that cannot get a token in time is reported like a tab that never loaded
+                    if limiter is not None and not limiter.acquire(url, PRIORITY_POLLING, timeout=self.tab_timeout):
+                        yield DayResult(date, [], TimeoutError(f"No rate limit token for {date}"),
+                                        time.monotonic() - started)
+                        continue
+                    try:
+                        loading[self._open_tab(url)] = (date, started)
+                    except WebDriverException as e:
+                        yield DayResult(date, [], e, time.monotonic() - started)
+                for handle, (date, started) in list(loading.items()):
+                    elapsed = time.monotonic() - started
+                    try:
+                        driver.switch_to.window(handle)
+                        ready = driver.execute_script("return document.readyState") == "complete"
+                        if not ready and elapsed < self.tab_timeout:
+                            continue
+                        if ready:
+                            result = DayResult(date, parse_page(driver.page_source, default_date=date), None, elapsed)
+                        else:
+                            result = DayResult(date, [], TimeoutError(f"Tab for {date} did not load"), elapsed)
+                        driver.close()
+                    except (NoSuchWindowException, WebDriverException) as e:
+                        result = DayResult(date, [], e, elapsed)
+                    del loading[handle]
+                    yield result
+                if loading:
+                    time.sleep(0.01)
+        finally:
+            for handle in loading:
+                try:
+                    driver.switch_to.window(handle)
+                    driver.close()
+                except WebDriverException:
+                    pass
+            driver.switch_to.window(home)
+
+    def close(self):
+        """Shut down the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+
+def main():
+    from watch_daemon import upcoming_dates
+    from startup import StartupOrchestrator
+    from wechat_scraper import WeChatBrowserScraper
+
+    parser = argparse.ArgumentParser(description="Fetch availability for several days at once")
+    parser.add_argument("--days", type=int, default=7, help="Number of days, starting today")
+    parser.add_argument("--workers", type=int, default=None, help="Days fetched at the same time")
+    parser.add_argument("--browser", action="store_true", help="Load the days in browser tabs instead of over HTTP")
+    args = parser.parse_args()
+
+    dates = upcoming_dates(args.days)
+    started = time.monotonic()
+
+    def report(day: DayResult):
+        status = f"error: {day.error}" if day.error else f"{len(free_cells(day.records))} free hours"
+        print(f"{day.date}: {status} ({day.elapsed:.2f}s)")
+
+    if not config.VFMC_AVAILABILITY_URL:
+        parser.error("Set VFMC_AVAILABILITY_URL in config.py first")
+    if args.browser:
+        with StartupOrchestrator(WeChatBrowserScraper()) as startup:
+            # Chrome launches while the saved cookies load; they are set before the first page opens
+            startup.open(config.VFMC_ENTRY_URL)
+            scraper = startup.scraper
+            prefetcher = AvailabilityPrefetcher(scraper=scraper, max_workers=args.workers)
+            model = prefetcher.fetch(dates, on_day=report)
+    else:
+        with ResilientSession() as client:
+            client.load_cookies(config.COOKIE_FILE)
+            with AvailabilityPrefetcher(fetch_day=http_day_fetcher(client), max_workers=args.workers) as prefetcher:
+                model = prefetcher.fetch(dates, on_day=report)
+    print(f"{len(dates)} days in {time.monotonic() - started:.2f}s, {len(model.free_cells())} free hours")
+
+
+if __name__ == "__main__":
+    main()
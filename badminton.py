@@ -1,17 +1,36 @@
+from nav_graph import NavigationError, NavigationGraph, Navigator, NavRecorder
 from wechat_scraper import WeChatBrowserScraper
 
 from selenium.webdriver.common.by import By
 
+import config
+import json
 import time
 
 # 使用上下文管理器（推荐）
 with WeChatBrowserScraper() as scraper:
-    # 打开你的微信 H5 页面
-    scraper.open_url("http://vfmc.tju.edu.cn/Views/User/UserChoose.html")
+    graph = NavigationGraph.load()
+    reached = False
+    if "login" in graph.goals:
+        # 已学到路径：先恢复上次保存的 Cookie 再直接跳转，直接链接失败或被重定向时 Navigator 会自己走点击路径
+        try:
+            report = Navigator(scraper, graph).goto("login")
+            print(f"少跳转 {report.saved_navigations} 次，节省 {report.saved_seconds:.1f} 秒")
+            reached = True
+        except NavigationError as e:
+            print(f"学到的路径不可用，重新记录: {e}")
 
-    # 找登录按钮
-    button = scraper.wait_for_element(By.XPATH, "/html/body/div/div[2]/div[1]")
-    button.click()
+    if not reached:
+        # 记录每一步跳转（URL、点击的元素、新设置的 Cookie、耗时），供 nav_graph.Navigator 之后直接跳转
+        recorder = NavRecorder(scraper, graph)
+
+        # 打开你的微信 H5 页面
+        recorder.open_url("http://vfmc.tju.edu.cn/Views/User/UserChoose.html")
+
+        # 找登录按钮
+        recorder.click(By.XPATH, "/html/body/div/div[2]/div[1]")
+        recorder.mark("login")
+        graph.save()
 
     # # 登录
     # username_input = scraper.wait_for_element(By.ID, "username")
@@ -26,6 +45,10 @@ with WeChatBrowserScraper() as scraper:
     # 等待登录完成
     time.sleep(30)
 
+    # 保存会话 Cookie，下次运行时新启动的浏览器由 Navigator 恢复后即可直接跳转
+    with open(config.COOKIE_FILE, "w", encoding="utf-8") as f:
+        json.dump(scraper.get_cookies(), f)
+
     # # 访问需要认证的页面
     # scraper.open_url("https://your-authenticated-page.com")
     
\ No newline at end of file
@@ -49,6 +49,10 @@ options.add_argument("--disable-features=IsolateOrigins,site-per-process")
 import tempfile
 _tmp_profile = tempfile.mkdtemp(prefix="selenium_profile_")
 options.add_argument(f"--user-data-dir={_tmp_profile}")
+# HTTP 磁盘缓存放在持久目录（config.BROWSER_CACHE_DIR），跨次运行复用站点的 JS/CSS/图片
+from browser_cache import cache_arguments
+for _arg in cache_arguments():
+    options.add_argument(_arg)
 
 # 关闭 Safe Browsing 等可能拦截页面的设置（prefs）
 prefs = {
@@ -85,35 +89,10 @@ driver.execute_cdp_cmd('Network.setExtraHTTPHeaders', {"headers": {
     "Accept-Language": "zh-CN,zh;q=0.9"
 }})
 
-# 4) 在页面脚本加载前注入脚本：隐藏 navigator.webdriver，注入 WeixinJSBridge 等
-driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-    "source": """
-// 隐藏 webdriver 标志
-try{ Object.defineProperty(navigator, 'webdriver', { get: () => undefined }); }catch(e){}
-
-// 基本的 userAgent 覆盖（备份）
-try{ Object.defineProperty(navigator, 'userAgent', { get: () => '%s' }); }catch(e){}
-
-// 更强力的覆盖：覆盖 Navigator.prototype.userAgent 以及 navigator.__proto__
-try {
-  Object.defineProperty(Navigator.prototype, 'userAgent', { get: function() { return '%s'; }, configurable: true });
-} catch(e) {}
-try {
-  if (window.navigator && window.navigator.__proto__) {
-    Object.defineProperty(window.navigator.__proto__, 'userAgent', { get: function() { return '%s'; }, configurable: true });
-  }
-} catch(e) {}
-
-// 覆盖其他可能被检测的字段
-try { Object.defineProperty(navigator, 'appVersion', { get: () => '%s' }); } catch(e){}
-try { Object.defineProperty(navigator, 'platform', { get: () => 'Linux armv8l' }); } catch(e){}
-try { Object.defineProperty(navigator, 'vendor', { get: () => 'Apple Computer, Inc.' }); } catch(e){}
-
-// 注入微信 JSBridge 的最小 stub（避免页面因缺少而失败）
-window.WeixinJSBridge = window.WeixinJSBridge || { invoke: function(){}, on: function(){}, call: function(){} };
-window.__wxjs_environment = window.__wxjs_environment || 'browser';
-""" % (DEFAULT_USER_AGENT, DEFAULT_USER_AGENT, DEFAULT_USER_AGENT, DEFAULT_USER_AGENT)
-})
+# 4) 在页面脚本加载前注入 WeChat 环境引导脚本（wechat_bootstrap.py）：隐藏 navigator.webdriver，
+#    覆盖 UA 相关字段，注入 WeixinJSBridge stub 与 __wxjs_environment
+from wechat_bootstrap import install_bootstrap
+print("WeChat bootstrap:", install_bootstrap(driver, DEFAULT_USER_AGENT))
 
 # 打开页面并等待
 driver.get(TARGET_URL)
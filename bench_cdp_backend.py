@@ -0,0 +1,78 @@
+"""
+CDP vs Selenium Backend Benchmark
+
+Measures per-command latency of the direct CDP backend against the
+chromedriver-based WeChatBrowserScraper, plus the pipelined throughput that
+only the CDP backend offers. Both run headless against a local data: URL, so
+the numbers are dominated by the automation round trip, not the network.
+
+Usage:
+    python bench_cdp_backend.py [--iterations 200]
+"""
+
+import argparse
+import statistics
+import time
+
+from cdp_scraper import CDPBrowserScraper
+from wechat_scraper import WeChatBrowserScraper
+
+PAGE = ("data:text/html,<html><body><div id='slot' class='slot free'>18:00-19:00</div>"
+        + "".join(f"<p>row {i}</p>" for i in range(200)) + "</body></html>")
+
+COMMANDS = {
+    "execute_script": lambda s: s.execute_script("return 1 + 1"),
+    "get_page_source": lambda s: s.get_page_source(),
+    "wait_for_element": lambda s: s.wait_for_element("id", "slot"),
+    "get_cookies": lambda s: s.get_cookies(),
+}
+
+
+def measure(func, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples: list) -> str:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    return f"{statistics.median(samples):>9.3f} {p95:>9.3f}"
+
+
+def bench_backend(name: str, scraper, iterations: int) -> dict:
+    results = {}
+    with scraper:
+        scraper.open_url(PAGE)
+        for command, func in COMMANDS.items():
+            func(scraper)  # warm up
+            results[command] = measure(lambda: func(scraper), iterations)
+            print(f"{name:<10} {command:<20} {summarize(results[command])}")
+        if isinstance(scraper, CDPBrowserScraper):
+            batch = [("Runtime.evaluate", {"expression": "1 + 1", "returnByValue": True})] * 50
+            samples = measure(lambda: scraper.connection.batch(batch), max(1, iterations // 10))
+            per_command = [s / len(batch) for s in samples]
+            print(f"{name:<10} {'pipelined x50':<20} {summarize(per_command)}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CDP and Selenium command latency")
+    parser.add_argument("--iterations", type=int, default=200, help="Samples per command")
+    args = parser.parse_args()
+
+    print(f"{'backend':<10} {'command':<20} {'p50 ms':>9} {'p95 ms':>9}")
+    cdp = bench_backend("cdp", CDPBrowserScraper(headless=True), args.iterations)
+    selenium = bench_backend("selenium", WeChatBrowserScraper(headless=True), args.iterations)
+
+    print("\nSpeedup (selenium p50 / cdp p50):")
+    for command in COMMANDS:
+        ratio = statistics.median(selenium[command]) / statistics.median(cdp[command])
+        print(f"  {command:<20} {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Fake Driver Flow Benchmark
+
+Runs the login-entry flow (open the vfmc entry page, wait for the login entry,
+click it, classify the resulting page) on the fake driver backend and reports
+flows per second. Fails with exit code 1 when a flow is slower than
+--max-ms, so it can guard CI against performance regressions.
+
+Usage:
+    python bench_fake_flow.py [--flows 1000] [--max-ms 20]
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+
+from selenium.webdriver.common.by import By
+
+import config
+from page_parser import classify_page
+from wechat_scraper import WeChatBrowserScraper
+
+
+def run_flow() -> str:
+    with WeChatBrowserScraper(backend="fake") as scraper:
+        scraper.open_url(config.VFMC_ENTRY_URL)
+        scraper.wait_for_element_clickable(By.XPATH, config.VFMC_LOGIN_XPATH).click()
+        return classify_page(scraper.get_page_source())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark booking flows on the fake driver")
+    parser.add_argument("--flows", type=int, default=1000, help="Number of flows to run")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the median flow takes longer")
+    args = parser.parse_args()
+
+    durations = []
+    # The scraper prints every navigation; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.flows):
+            started = time.perf_counter()
+            result = run_flow()
+            durations.append((time.perf_counter() - started) * 1000)
+    durations.sort()
+    median = statistics.median(durations)
+    print(f"result: {result}")
+    print(f"flows/s: {1000 / statistics.mean(durations):.0f}")
+    print(f"p50: {median:.2f} ms  p95: {durations[int(len(durations) * 0.95) - 1]:.2f} ms")
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.2f} ms exceeds {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Network Condition Sensitivity Benchmark
+
+Runs the booking flow under a sweep of network profiles and prints a
+latency-sensitivity table: the median time of every step under every profile,
+how many milliseconds each step gains per millisecond of added round-trip
+time, and its share of the flow under the worst profile. The browser steps
+are throttled with Network.emulateNetworkConditions, the HTTP steps go
+through a local ThrottlingProxy. Both talk to a local stand-in for the vfmc
+site, so the only variable is the network.
+
+Usage:
+    python bench_network_profiles.py [--profiles lan campus congested] [--runs 3]
+    python bench_network_profiles.py --profiles lan dorm:120:2000:500:0.01 --mode http
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from selenium.webdriver.common.by import By
+
+import config
+from fake_driver import FakeSite
+from network_conditions import ThrottlingProxy, apply_browser_profile, get_profile
+from rate_limiter import RateLimiter
+from resilient_http import ResilientSession
+from wechat_scraper import WeChatBrowserScraper
+
+# Roughly the size of the real pages: the entry page carries its scripts inline
+ENTRY_PAGE = ("<html><head><title>vfmc</title><script>" + "var pad = 0;\n" * 4000 + "</script></head>"
+              "<body><div><a id='login' href='/User/Login'>登录</a></div></body></html>")
+LOGIN_PAGE = "<html><head><title>用户类型选择</title></head><body>" + "<p>用户类型选择</p>" * 200 + "</body></html>"
+AVAILABILITY = json.dumps([{"court": f"{c}号场", "date": "2026-10-20", "start": f"{h}:00", "end": f"{h + 1}:00",
+                            "status": "free" if (c + h) % 5 == 0 else "booked", "price": 20}
+                           for c in range(1, 13) for h in range(8, 22)], ensure_ascii=False)
+PAGES = {"/": ENTRY_PAGE, "/User/Login": LOGIN_PAGE, "/courts": AVAILABILITY}
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self, body: str, content_type: str):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        # Proxied requests may keep the absolute form on reused connections
+        path = urlsplit(self.path).path
+        content_type = "application/json" if path == "/courts" else "text/html; charset=utf-8"
+        self._reply(PAGES.get(path, "<html><body>404</body></html>"), content_type)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._reply('{"ok": true}', "application/json")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def http_flow(client: ResilientSession, base: str) -> dict:
+    steps = {}
+    for name, call in (
+        ("availability", lambda: client.get(base + "/courts?date=2026-10-20")),
+        ("booking_page", lambda: client.get(base + "/")),
+        ("book", lambda: client.post(base + "/book", data={"court": "3", "date": "2026-10-20", "start": 18})),
+    ):
+        started = time.perf_counter()
+        call().raise_for_status()
+        steps[f"http:{name}"] = (time.perf_counter() - started) * 1000
+    return steps
+
+
+def browser_flow(scraper: WeChatBrowserScraper, base: str) -> dict:
+    steps = {}
+    started = time.perf_counter()
+    scraper.open_url(base + "/")
+    steps["browser:entry_page"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    scraper.wait_for_element_clickable(By.ID, "login").click()
+    while scraper.execute_script("return document.readyState") != "complete":
+        time.sleep(0.005)
+    steps["browser:login_click"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    scraper.open_url(base + "/courts?date=2026-10-20")
+    steps["browser:availability"] = (time.perf_counter() - started) * 1000
+    return steps
+
+
+def _throttle_fake(driver, profile):
+    # The fake driver only records Network.emulateNetworkConditions; slow its page loads the same way
+    throughput = profile.down_kbps * 1000 / 8
+
+    def load_delay(url, html):
+        if url == "about:blank":
+            return 0.0
+        return profile.latency / 1000 + (len(html.encode("utf-8")) / throughput if throughput > 0 else 0)
+    driver.load_delay = load_delay
+
+
+def sweep(profiles: list, runs: int, modes: list, backend: str) -> dict:
+    """Run every flow `runs` times per profile; returns {step: {profile name: [ms, ...]}}."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    results = defaultdict(lambda: defaultdict(list))
+    # Local traffic must not spend (or wait for) the real site's shared budget
+    limiter = RateLimiter(path=os.path.join(tempfile.gettempdir(), "bench_network_ratelimit"), limits={})
+    scraper = None
+    try:
+        if "browser" in modes:
+            scraper = WeChatBrowserScraper(headless=True, backend=backend)
+            scraper.start()
+            if backend == "fake":
+                scraper.driver.site = FakeSite({base + path: page for path, page in PAGES.items()})
+        for profile in profiles:
+            if "http" in modes:
+                with ThrottlingProxy(profile) as proxy, ResilientSession(limiter=limiter, deadline=60) as client:
+                    client.session.proxies = proxy.proxies
+                    for _ in range(runs):
+                        for step, ms in http_flow(client, base).items():
+                            results[step][profile.name].append(ms)
+            if scraper is not None:
+                apply_browser_profile(scraper.driver, profile)
+                if backend == "fake":
+                    _throttle_fake(scraper.driver, profile)
+                for _ in range(runs):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        steps = browser_flow(scraper, base)
+                    for step, ms in steps.items():
+                        results[step][profile.name].append(ms)
+    finally:
+        if scraper is not None:
+            scraper.close()
+        limiter.close()
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def print_table(results: dict, profiles: list):
+    best = min(profiles, key=lambda p: p.latency)
+    worst = max(profiles, key=lambda p: p.latency)
+    medians = {step: {name: statistics.median(samples) for name, samples in by_profile.items()}
+               for step, by_profile in results.items()}
+    worst_total = defaultdict(float)
+    for step, by_profile in medians.items():
+        worst_total[step.split(":")[0]] += by_profile[worst.name]
+
+    header = f"{'step':<22}" + "".join(f"{p.name[:14]:>15}" for p in profiles) + f"{'ms/ms RTT':>11}{'share':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = sorted(medians.items(), key=lambda item: item[1][worst.name], reverse=True)
+    for step, by_profile in rows:
+        spread = worst.latency - best.latency
+        slope = (by_profile[worst.name] - by_profile[best.name]) / spread if spread else 0.0
+        share = by_profile[worst.name] / worst_total[step.split(":")[0]] * 100
+        print(f"{step:<22}" + "".join(f"{by_profile[p.name]:>13.1f}ms" for p in profiles)
+              + f"{slope:>11.2f}{share:>7.0f}%")
+    print(f"\nms/ms RTT: growth per ms of round-trip time from {best.name} to {worst.name}; "
+          f"share: fraction of its flow under {worst.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how the booking flow degrades under bad networks")
+    parser.add_argument("--profiles", nargs="+", default=list(config.NETWORK_PROFILES),
+                        help="Profile names or name:latency_ms:down_kbps:up_kbps[:loss] specifications")
+    parser.add_argument("--profile-file", default=None, help="JSON file of recorded profiles")
+    parser.add_argument("--runs", type=int, default=3, help="Flows per profile")
+    parser.add_argument("--mode", choices=["http", "browser", "both"], default="both", help="Flows to run")
+    parser.add_argument("--backend", choices=["chrome", "fake"], default=None, help="Browser backend")
+    args = parser.parse_args()
+
+    profiles = [get_profile(name, args.profile_file) for name in args.profiles]
+    modes = ["http", "browser"] if args.mode == "both" else [args.mode]
+    results = sweep(profiles, args.runs, modes, args.backend or config.DRIVER_BACKEND)
+    print_table(results, profiles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Page Parser Benchmark
+
+Measures page_parser throughput in pages per second over the saved captures in
+debug_wechat/, plus a synthetic full-week court grid since none of the saved
+captures contains one.
+
+Usage:
+    python bench_page_parser.py [--seconds 2]
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+from page_parser import classify_page, parse_page
+
+CAPTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug_wechat")
+
+
+def synthetic_grid(courts: int = 12, hours=range(8, 22)) -> str:
+    """Build an HTML court grid shaped like the booking page."""
+    rows = []
+    for court in range(1, courts + 1):
+        cells = "".join(
+            f'<td class="slot {"free" if (court + hour) % 3 else "booked"}" data-price="20">'
+            f"{hour:02d}:00-{hour + 1:02d}:00</td>"
+            for hour in hours
+        )
+        rows.append(f'<tr data-court="{court}号场" data-date="2026-10-20">{cells}</tr>')
+    return "<html><body><table>" + "".join(rows) + "</table></body></html>"
+
+
+def synthetic_json(courts: int = 12, hours=range(8, 22)) -> str:
+    """Build a JSON court list shaped like the booking API response."""
+    return json.dumps({"data": [
+        {"CourtName": f"{court}号场", "Date": "2026-10-20", "StartTime": f"{hour:02d}:00",
+         "EndTime": f"{hour + 1:02d}:00", "Status": (court + hour) % 2, "Price": 20}
+        for court in range(1, courts + 1) for hour in hours
+    ]})
+
+
+def bench(name: str, text: str, seconds: float):
+    records = parse_page(text)
+    pages = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        parse_page(text)
+        pages += 1
+    elapsed = time.perf_counter() - started
+    print(f"{name:<36} {classify_page(text):<14} {len(text):>8} {len(records):>7} "
+          f"{pages / elapsed:>12.0f} {elapsed / pages * 1e6:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline page parser")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time spent on each page")
+    args = parser.parse_args()
+
+    print(f"{'page':<36} {'kind':<14} {'bytes':>8} {'records':>7} {'pages/s':>12} {'us/page':>10}")
+    for path in sorted(glob.glob(os.path.join(CAPTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            bench(os.path.basename(path), f.read(), args.seconds)
+    bench("synthetic grid (html)", synthetic_grid(), args.seconds)
+    bench("synthetic grid (json)", synthetic_json(), args.seconds)
+
+
+if __name__ == "__main__":
+    main()
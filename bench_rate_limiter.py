@@ -0,0 +1,52 @@
+"""
+Rate Limiter Overhead Benchmark
+
+Measures what one RateLimiter.try_acquire() costs, the price every request
+and navigation pays for sharing the host-wide budget. The bucket is given an
+effectively unlimited budget so only the locking and state-file work is
+timed. With --budget the exit status is non-zero when a call costs more.
+
+Usage:
+    python bench_rate_limiter.py [--calls 20000] [--budget 200]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from rate_limiter import RateLimiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time RateLimiter.try_acquire()")
+    parser.add_argument("--calls", type=int, default=20000, help="Calls per round")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds; the median is reported")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Fail if the median cost per call exceeds this many microseconds")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        with RateLimiter(os.path.join(tmp_dir, "ratelimit"), limits={"cheap.example": (1e9, 1e9)}) as limiter:
+            per_call = []
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                for _ in range(args.calls):
+                    limiter.try_acquire("http://cheap.example/")
+                per_call.append((time.perf_counter() - started) / args.calls * 1e6)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    median = statistics.median(per_call)
+    print(f"try_acquire: {median:.1f}us per call (min {min(per_call):.1f}us, max {max(per_call):.1f}us)")
+    if args.budget is not None and median > args.budget:
+        print(f"Rate limiter regression: {median:.1f}us exceeds the {args.budget:.1f}us budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
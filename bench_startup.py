@@ -0,0 +1,76 @@
+"""
+Startup Time Benchmark
+
+Starts the scraper several times with the phases run one after another and
+with StartupOrchestrator running them concurrently, and prints the median
+duration of every phase, the median time to the first page, and the critical
+path of the last concurrent run. With --budget the exit status is non-zero
+when the concurrent median exceeds it, so a startup regression fails CI or
+a cron check.
+
+Usage:
+    python bench_startup.py [--runs 5] [--url http://vfmc.tju.edu.cn/Views/User/UserChoose.html]
+    python bench_startup.py --backend fake --budget 50
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+from collections import defaultdict
+
+import config
+from startup import StartupOrchestrator
+from wechat_scraper import WeChatBrowserScraper
+
+
+def run_startup(url: str, concurrent: bool, backend: str, headless: bool):
+    """Start, open `url` and close once; returns the timeline."""
+    startup = StartupOrchestrator(WeChatBrowserScraper(headless=headless, backend=backend), url,
+                                  concurrent=concurrent)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            startup.start()
+            return startup.open()
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            startup.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the scraper's startup, sequential against concurrent")
+    parser.add_argument("--runs", type=int, default=5, help="Startups per mode")
+    parser.add_argument("--url", default=config.VFMC_ENTRY_URL, help="First page to open")
+    parser.add_argument("--backend", choices=["chrome", "fake"], default=None, help="Browser backend")
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Fail if the concurrent median time to the first page exceeds this many ms")
+    args = parser.parse_args()
+    backend = args.backend or config.DRIVER_BACKEND
+
+    medians = {}
+    last = None
+    for mode in ("sequential", "concurrent"):
+        samples = defaultdict(list)
+        for _ in range(args.runs):
+            last = run_startup(args.url, mode == "concurrent", backend, not args.headed)
+            for phase, ms in last.breakdown().items():
+                samples[phase].append(ms)
+        medians[mode] = {phase: statistics.median(values) for phase, values in samples.items()}
+
+    phases = list(medians["concurrent"])
+    print(f"{'phase':<12}{'sequential':>14}{'concurrent':>14}")
+    print("-" * 40)
+    for phase in phases:
+        print(f"{phase:<12}{medians['sequential'].get(phase, 0):>12.1f}ms{medians['concurrent'][phase]:>12.1f}ms")
+    print(f"\nLast concurrent run:\n{last.report()}")
+
+    total = medians["concurrent"]["total"]
+    if args.budget is not None and total > args.budget:
+        print(f"\nStartup regression: {total:.1f}ms median exceeds the {args.budget:.1f}ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Booking Candidate Planner
+
+This module turns an availability grid and a preference spec into a ranked,
+deduplicated list of booking attempts. Preferences are compiled once into
+per-court and per-start-hour score tables and the grid is indexed as one hour
+bitmask per (date, court), so re-planning after each availability change is a
+handful of integer operations per court.
+"""
+
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+HOURS_PER_DAY = 24
+
+
+class BookingAttempt(NamedTuple):
+    """One ranked booking attempt, ready to hand to whatever submits bookings."""
+
+    rank: int
+    account: Optional[str]
+    date: Hashable
+    court: Hashable
+    start_hour: int
+    end_hour: int
+    score: float
+
+
+class PreferenceSpec:
+    """
+    What the user wants to book.
+
+    Args:
+        courts: Preferred courts, best first
+        time_windows: (start_hour, end_hour) windows, best first. An optional
+            third element overrides the window's weight; only the order of the
+            weights counts, so a large weight cannot outrank court preference
+        hours: Number of contiguous hours each booking must cover
+        accounts: Accounts to spread attempts over. If None, attempts are unassigned
+        max_per_account: Maximum attempts assigned to any single account
+        dates: Acceptable dates, best first. If None, every date in the grid is acceptable
+        allow_other_courts: Whether courts not listed in `courts` may be used as a last resort
+        max_attempts: Upper bound on the length of the plan
+    """
+
+    def __init__(
+        self,
+        courts: Sequence[Hashable] = (),
+        time_windows: Sequence[Tuple] = ((0, HOURS_PER_DAY),),
+        hours: int = 1,
+        accounts: Optional[Sequence[str]] = None,
+        max_per_account: int = 1,
+        dates: Optional[Sequence[Hashable]] = None,
+        allow_other_courts: bool = True,
+        max_attempts: Optional[int] = None
+    ):
+        if not 1 <= hours <= HOURS_PER_DAY:
+            raise ValueError(f"hours must be between 1 and {HOURS_PER_DAY}, got {hours}")
+        self.courts = list(courts)
+        self.time_windows = list(time_windows)
+        self.hours = hours
+        self.accounts = list(accounts) if accounts else None
+        self.max_per_account = max_per_account
+        self.dates = list(dates) if dates is not None else None
+        self.allow_other_courts = allow_other_courts
+        self.max_attempts = max_attempts
+
+
+class PlanSolver:
+    """
+    Precompiled solver for one PreferenceSpec.
+
+    Court and start-hour scores are computed once here; plan() only walks the
+    grid's bitmasks. Court preference dominates, then time window, then date.
+    """
+
+    # Weight tiers keep the lexicographic order court > window > date
+    _COURT_TIER = 1_000_000.0
+    _WINDOW_TIER = 1_000.0
+
+    def __init__(self, spec: PreferenceSpec):
+        """
+        Compile the score tables for a spec.
+
+        Args:
+            spec: The preferences to plan for
+        """
+        self.spec = spec
+        self._block = (1 << spec.hours) - 1
+
+        n = len(spec.courts)
+        self._court_scores: Dict[Hashable, float] = {
+            court: (n - i) * self._COURT_TIER for i, court in enumerate(spec.courts)
+        }
+        self._date_scores = None
+        if spec.dates is not None:
+            self._date_scores = {date: float(len(spec.dates) - i) for i, date in enumerate(spec.dates)}
+
+        # Score of a booking starting at each hour; None if the block leaves every window
+        hour_scores = [None] * HOURS_PER_DAY
+        n = len(spec.time_windows)
+        weights = [window[2] if len(window) > 2 else float(n - i) for i, window in enumerate(spec.time_windows)]
+        # Replace weights by their rank so window scores stay inside their tier
+        ranks = {weight: float(i + 1) for i, weight in enumerate(sorted(set(weights)))}
+        for window, weight in zip(spec.time_windows, weights):
+            start, end = window[0], window[1]
+            weight = ranks[weight]
+            for hour in range(max(0, start), min(HOURS_PER_DAY, end)):
+                if hour_scores[hour] is None or hour_scores[hour] < weight:
+                    hour_scores[hour] = weight
+        self._start_scores: List[Tuple[int, float]] = []
+        for start in range(HOURS_PER_DAY - spec.hours + 1):
+            block = hour_scores[start:start + spec.hours]
+            if all(score is not None for score in block):
+                self._start_scores.append((start, min(block) * self._WINDOW_TIER))
+        # Highest-scoring starts first so each court's candidates come out pre-sorted
+        self._start_scores.sort(key=lambda item: (-item[1], item[0]))
+
+    @staticmethod
+    def index_grid(free_cells: Iterable[Tuple[Hashable, Hashable, int]]) -> Dict[Tuple, int]:
+        """
+        Index free (date, court, hour) cells as one hour bitmask per (date, court).
+
+        Args:
+            free_cells: Iterable of free (date, court, hour) cells
+
+        Returns:
+            Dictionary mapping (date, court) to a bitmask of free hours
+        """
+        grid: Dict[Tuple, int] = {}
+        for date, court, hour in free_cells:
+            grid[(date, court)] = grid.get((date, court), 0) | (1 << hour)
+        return grid
+
+    def plan(self, grid) -> List[BookingAttempt]:
+        """
+        Produce the ranked attempt plan for the current availability.
+
+        Args:
+            grid: Either the output of index_grid() or an iterable of free
+                (date, court, hour) cells
+
+        Returns:
+            Deduplicated attempts, best first, with accounts assigned. Attempts
+            on the same court and date never overlap: a block is dropped if a
+            better one already covers any of its hours
+        """
+        if not isinstance(grid, dict):
+            grid = self.index_grid(grid)
+
+        spec = self.spec
+        block = self._block
+        candidates = []
+        for (date, court), mask in grid.items():
+            court_score = self._court_scores.get(court)
+            if court_score is None:
+                if not spec.allow_other_courts:
+                    continue
+                court_score = 0.0
+            if self._date_scores is None:
+                date_score = 0.0
+            else:
+                date_score = self._date_scores.get(date)
+                if date_score is None:
+                    continue
+            base = court_score + date_score
+            for start, start_score in self._start_scores:
+                if (mask >> start) & block == block:
+                    candidates.append((base + start_score, date, court, start))
+
+        # The grid has one bitmask per (date, court), so every candidate is unique
+        candidates.sort(key=lambda c: (-c[0], str(c[1]), str(c[2]), c[3]))
+        plan: List[BookingAttempt] = []
+        planned: Dict[Tuple, int] = {}
+        accounts = spec.accounts
+        used = dict.fromkeys(accounts, 0) if accounts else None
+        next_account = 0
+        for score, date, court, start in candidates:
+            # Two attempts sharing an hour on one court would book it twice if both won
+            taken = planned.get((date, court), 0)
+            if (taken >> start) & block:
+                continue
+            account = None
+            if accounts:
+                # Round-robin over accounts that still have capacity
+                for _ in range(len(accounts)):
+                    candidate = accounts[next_account]
+                    next_account = (next_account + 1) % len(accounts)
+                    if used[candidate] < spec.max_per_account:
+                        account = candidate
+                        break
+                if account is None:
+                    break
+                used[account] += 1
+
+            planned[(date, court)] = taken | (block << start)
+            plan.append(BookingAttempt(len(plan) + 1, account, date, court,
+                                       start, start + spec.hours, score))
+            if spec.max_attempts is not None and len(plan) >= spec.max_attempts:
+                break
+        return plan
+
+
+def plan_attempts(free_cells: Iterable[Tuple[Hashable, Hashable, int]],
+                  spec: PreferenceSpec) -> List[BookingAttempt]:
+    """
+    One-shot helper: compile a spec and plan against a set of free cells.
+
+    Keep a PlanSolver around instead when re-planning repeatedly.
+
+    Args:
+        free_cells: Iterable of free (date, court, hour) cells
+        spec: The preferences to plan for
+
+    Returns:
+        Ranked list of BookingAttempt
+    """
+    return PlanSolver(spec).plan(free_cells)
@@ -0,0 +1,366 @@
+"""
+Pre-Serialized Booking Requests
+
+This module prepares booking requests ahead of the release instant so that
+nothing but a socket write is left for T=0. Staging looks up everything a
+request needs (encoded form or JSON body, headers, cookies, anti-CSRF token)
+and serializes it to raw HTTP/1.1 bytes; pre-warming opens the TCP connections
+in advance. Firing then only writes the prepared bytes, and every fire is
+timed from the trigger to the first byte on the wire.
+
+Usage:
+    stager = BookingStager(cookies=client.get_cookies())
+    stager.set_csrf_token(scrape_csrf_token(booking_page_html))
+    stager.stage(config.VFMC_BOOKING_URL, form={"date": "2026-10-20", "court": "3"})
+    stager.prewarm()
+    stager.fire_at(release_time)
+    print(stager.timing_report())
+"""
+
+import json
+import re
+import select
+import socket
+import ssl
+import statistics
+import threading
+import time
+import uuid
+from http.client import HTTPResponse
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+import config
+from rate_limiter import PRIORITY_BOOKING, RateLimiter, shared_limiter
+
+_CSRF_PATTERNS = (
+    re.compile(r'name=["\']__RequestVerificationToken["\'][^>]*value=["\']([^"\']+)', re.I),
+    re.compile(r'value=["\']([^"\']+)["\'][^>]*name=["\']__RequestVerificationToken["\']', re.I),
+    re.compile(r'<meta[^>]+name=["\']csrf-token["\'][^>]*content=["\']([^"\']+)', re.I),
+)
+
+
+def scrape_csrf_token(html: str) -> Optional[str]:
+    """
+    Find an anti-CSRF token in a page.
+
+    Args:
+        html: Page HTML, e.g. the booking page fetched before release
+
+    Returns:
+        The token, or None if the page has none
+    """
+    for pattern in _CSRF_PATTERNS:
+        match = pattern.search(html)
+        if match:
+            return match.group(1)
+    return None
+
+
+class StagedRequest:
+    """
+    A booking request serialized to the exact bytes that will be written.
+    """
+
+    def __init__(self, method: str, url: str, payload: bytes, key: str, label: str = ""):
+        parts = urlsplit(url)
+        self.method = method
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.payload = payload
+        self.key = key
+        self.label = label or key
+        self.sock: Optional[socket.socket] = None
+        self.reserved = False  # Rate limit token taken ahead of the release instant
+        self.trigger_ns = None
+        self.first_byte_ns = None
+        self.sent_ns = None
+        self.response = None
+        self.error: Optional[Exception] = None
+
+    @property
+    def trigger_to_first_byte_us(self) -> Optional[float]:
+        if self.trigger_ns is None or self.first_byte_ns is None:
+            return None
+        return (self.first_byte_ns - self.trigger_ns) / 1000
+
+
+class BookingStager:
+    """
+    Stages booking requests as raw bytes on pre-opened connections.
+    """
+
+    def __init__(self, cookies: Optional[list] = None, user_agent: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None, csrf_header: str = None,
+                 csrf_field: str = None, limiter: Optional[RateLimiter] = None):
+        """
+        Initialize the stager.
+
+        Args:
+            cookies: Session cookies as a list of cookie dictionaries
+            user_agent: User-Agent header. If None, uses default WeChat User-Agent
+            headers: Extra headers added to every request
+            csrf_header: Header carrying the anti-CSRF token. If None, uses config default
+            csrf_field: Form field carrying the anti-CSRF token. If None, uses config default
+            limiter: Rate limiter consulted (at booking priority) before each write. If None,
+                uses the host-wide shared limiter
+        """
+        self.user_agent = user_agent or config.DEFAULT_USER_AGENT
+        self.headers = dict(headers or {})
+        self.csrf_header = csrf_header or config.STAGER_CSRF_HEADER
+        self.csrf_field = csrf_field or config.STAGER_CSRF_FIELD
+        self.csrf_token = None
+        self.limiter = limiter or shared_limiter()
+        self.staged: List[StagedRequest] = []
+        self._specs: List[dict] = []
+        self._cookies: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.set_cookies(cookies or [])
+
+    def set_cookies(self, cookies: list):
+        """
+        Replace the cookies and re-serialize every staged request with them.
+
+        Args:
+            cookies: List of cookie dictionaries
+        """
+        with self._lock:
+            self._cookies = {c["name"]: c.get("value", "") for c in cookies}
+            self._restage()
+
+    def set_csrf_token(self, token: Optional[str]):
+        """
+        Set the anti-CSRF token scraped beforehand and re-serialize staged requests.
+
+        Args:
+            token: The token, e.g. from scrape_csrf_token()
+        """
+        with self._lock:
+            self.csrf_token = token
+            self._restage()
+
+    def _serialize(self, spec: dict) -> bytes:
+        parts = urlsplit(spec["url"])
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        if spec["json"] is not None:
+            body = json.dumps(spec["json"], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        else:
+            form = dict(spec["form"] or {})
+            if self.csrf_token and self.csrf_field:
+                form.setdefault(self.csrf_field, self.csrf_token)
+            body = urlencode(form).encode("utf-8")
+            content_type = "application/x-www-form-urlencoded; charset=UTF-8"
+
+        headers = {
+            "Host": parts.netloc,
+            "User-Agent": self.user_agent,
+            "Accept": "application/json, text/javascript, */*; q=0.01",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive",
+            "Idempotency-Key": spec["key"],
+            "X-Requested-With": "XMLHttpRequest",
+        }
+        if self._cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self._cookies.items())
+        if self.csrf_token and self.csrf_header:
+            headers[self.csrf_header] = self.csrf_token
+        headers.update(self.headers)
+        headers.update(spec["headers"])
+        head = f"{spec['method']} {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        return head.encode("latin-1", "replace") + b"\r\n" + body
+
+    def _restage(self):
+        # Keep the warm connections; only the bytes change
+        for request, spec in zip(self.staged, self._specs):
+            request.payload = self._serialize(spec)
+
+    def stage(self, url: str, form: Optional[dict] = None, json_body=None, method: str = "POST",
+              headers: Optional[Dict[str, str]] = None, key: Optional[str] = None,
+              label: str = "") -> StagedRequest:
+        """
+        Fully prepare one booking request.
+
+        Args:
+            url: Booking endpoint
+            form: Form fields, sent url-encoded
+            json_body: JSON body, sent instead of the form if given
+            method: HTTP method
+            headers: Extra headers for this request
+            key: Idempotency key. If None, a new one is generated
+            label: Name used in the timing report
+
+        Returns:
+            The staged request
+        """
+        spec = {"url": url, "form": form, "json": json_body, "method": method.upper(),
+                "headers": dict(headers or {}), "key": key or uuid.uuid4().hex, "label": label}
+        request = StagedRequest(spec["method"], url, self._serialize(spec), spec["key"], label)
+        with self._lock:
+            self._specs.append(spec)
+            self.staged.append(request)
+        return request
+
+    def stage_attempts(self, url: str, attempts, make_form) -> List[StagedRequest]:
+        """
+        Stage one request per BookingAttempt from the planner.
+
+        Args:
+            url: Booking endpoint
+            attempts: Iterable of BookingAttempt, best first
+            make_form: Function turning an attempt into its form fields
+
+        Returns:
+            The staged requests, in attempt order
+        """
+        return [self.stage(url, form=make_form(a), key=f"{a.date}-{a.court}-{a.start_hour}",
+                           label=f"#{a.rank} {a.court} {a.date} {a.start_hour}:00")
+                for a in attempts]
+
+    @staticmethod
+    def _connect(request: StagedRequest, timeout: float) -> socket.socket:
+        sock = socket.create_connection((request.host, request.port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if request.scheme == "https":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=request.host)
+        return sock
+
+    def prewarm(self, timeout: float = None):
+        """
+        Open one connection per staged request, and take its rate limit token, ahead of time.
+
+        Reserving the tokens here keeps fire() from waiting for token refill
+        at T=0 when more requests are staged than the burst allows.
+
+        Args:
+            timeout: Connect timeout, and longest wait for each token, in seconds. If None, uses config default
+        """
+        timeout = timeout or config.DEFAULT_TIMEOUT
+        for request in self.staged:
+            if request.sock is None:
+                request.sock = self._connect(request, timeout)
+            if not request.reserved:
+                request.reserved = self.limiter.acquire(request.url, PRIORITY_BOOKING, timeout=timeout)
+
+    @staticmethod
+    def _connection_alive(sock: socket.socket) -> bool:
+        # Readable is not dead: a TLS 1.3 server sends session tickets on a healthy idle
+        # connection. Peek at the raw TCP bytes (below any TLS layer) and only treat EOF
+        # or an error as a closed connection.
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return True
+            return socket.socket.recv(sock, 1, socket.MSG_PEEK) != b""
+        except (OSError, ValueError):
+            return False
+
+    def fire(self) -> List[StagedRequest]:
+        """
+        Write every staged request onto its pre-opened connection, best first.
+
+        Returns:
+            The staged requests, with trigger and first-byte timestamps filled in
+        """
+        trigger_ns = time.perf_counter_ns()
+        for request in self.staged:
+            request.trigger_ns = trigger_ns
+            try:
+                if request.sock is None or not self._connection_alive(request.sock):
+                    # Lost the warm connection; reconnecting costs a handshake but keeps the attempt
+                    if request.sock is not None:
+                        request.sock.close()
+                    request.sock = self._connect(request, config.DEFAULT_TIMEOUT)
+                # Requests without a reserved token must not hold up the rest of the burst
+                if not request.reserved and self.limiter.try_acquire(request.url, PRIORITY_BOOKING) > 0:
+                    raise BlockingIOError(f"No rate limit token for {request.label}; prewarm() reserves them")
+                request.reserved = False
+                request.sock.sendall(request.payload)
+                # The bytes are in the kernel's send buffer once sendall returns
+                request.first_byte_ns = request.sent_ns = time.perf_counter_ns()
+            except OSError as e:
+                request.error = e
+        return self.staged
+
+    def fire_at(self, when: float, spin: float = 0.002) -> List[StagedRequest]:
+        """
+        Fire at a wall-clock instant, sleeping until just before it and spinning the rest.
+
+        Args:
+            when: Unix timestamp of the release instant
+            spin: Seconds before `when` to stop sleeping and busy-wait
+
+        Returns:
+            The fired requests
+        """
+        while True:
+            remaining = when - time.time()
+            if remaining <= spin:
+                break
+            time.sleep(remaining - spin)
+        while time.time() < when:
+            pass
+        return self.fire()
+
+    def collect(self, timeout: float = None) -> List[StagedRequest]:
+        """
+        Read the response to every fired request.
+
+        Args:
+            timeout: Seconds to wait for each response. If None, uses config default
+
+        Returns:
+            The requests, with `response` set to (status, headers, body) or `error` set
+        """
+        timeout = timeout or config.DEFAULT_TIMEOUT
+        for request in self.staged:
+            if request.sock is None or request.sent_ns is None:
+                continue
+            try:
+                request.sock.settimeout(timeout)
+                response = HTTPResponse(request.sock, method=request.method)
+                response.begin()
+                request.response = (response.status, dict(response.getheaders()), response.read())
+            except OSError as e:
+                request.error = e
+        return self.staged
+
+    def timing_report(self) -> dict:
+        """
+        Summarize the gap between the trigger and the first byte on the wire.
+
+        Returns:
+            Dictionary with per-request gaps and their min/median/max, in microseconds
+        """
+        gaps = {r.label: r.trigger_to_first_byte_us for r in self.staged
+                if r.trigger_to_first_byte_us is not None}
+        values = list(gaps.values())
+        report = {"requests": gaps}
+        if values:
+            report.update(min_us=min(values), median_us=statistics.median(values), max_us=max(values))
+        return report
+
+    def close(self):
+        """Close every pre-opened connection."""
+        for request in self.staged:
+            if request.sock is not None:
+                try:
+                    request.sock.close()
+                except OSError:
+                    pass
+                request.sock = None
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
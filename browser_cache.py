@@ -0,0 +1,308 @@
+"""
+Persistent Browser Cache
+
+This module gives every browser started by the helper one managed, persistent
+HTTP disk cache (config.BROWSER_CACHE_DIR), so the site's JS, CSS and images
+are downloaded once and served from disk on later runs. Chrome cannot share a
+disk cache between running browsers, so each process locks its own numbered
+slot under the directory; a lone run always gets slot 0 and its warm cache,
+and concurrent runs fall through to the next free slot. It also provides a
+warmup routine that loads the booking pages ahead of time, and cache
+statistics read from the browser's network events: hit ratio and bytes saved.
+
+Usage:
+    with WeChatBrowserScraper(cache_stats=True) as scraper:  # start() already passes cache_arguments()
+        stats = warmup(scraper)
+        print(stats.report())
+"""
+
+import itertools
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_MANIFEST = "asset_sizes.json"
+
+# Cache directory -> (slot directory, open lock file), held until the process exits
+_claimed: Dict[str, tuple] = {}
+_claim_lock = threading.Lock()
+
+
+def cache_dir(path: Optional[str] = None, create: bool = False) -> str:
+    """
+    Get the persistent cache directory.
+
+    Args:
+        path: Cache directory; "~" is expanded. If None, uses config default
+        create: Whether to create the directory if it does not exist
+
+    Returns:
+        Absolute path of the directory
+    """
+    path = os.path.abspath(os.path.expanduser(path or config.BROWSER_CACHE_DIR))
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _try_lock(handle) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def process_cache_dir(path: Optional[str] = None) -> str:
+    """
+    Get this process's own slot of the persistent cache directory.
+
+    The first slot whose lock file no other process holds is claimed and kept
+    until the process exits; the operating system drops the lock even after a
+    crash. Every browser this process starts uses the same slot.
+
+    Args:
+        path: Cache directory. If None, uses config default
+
+    Returns:
+        Absolute path of the slot directory (Chrome creates it on first use)
+    """
+    base = cache_dir(path, create=True)
+    with _claim_lock:
+        if base not in _claimed:
+            for slot in itertools.count():
+                handle = open(os.path.join(base, f"{slot}.lock"), "a+")
+                if _try_lock(handle):
+                    _claimed[base] = (os.path.join(base, str(slot)), handle)
+                    break
+                handle.close()
+        return _claimed[base][0]
+
+
+def cache_arguments(path: Optional[str] = None, size: Optional[int] = None) -> List[str]:
+    """
+    Chrome command-line switches that point the HTTP disk cache at this process's slot.
+
+    Args:
+        path: Cache directory. If None, uses config default
+        size: Maximum cache size in bytes. If None, uses config default
+
+    Returns:
+        List of Chrome arguments; empty when config.BROWSER_CACHE_DIR is None
+    """
+    if path is None and not config.BROWSER_CACHE_DIR:
+        return []
+    size = size or config.BROWSER_CACHE_SIZE
+    return [f"--disk-cache-dir={process_cache_dir(path)}", f"--disk-cache-size={size}"]
+
+
+class CacheStats:
+    """
+    Counts cache hits and bytes saved from Chrome DevTools Network events.
+
+    The size of every asset downloaded over the network is remembered in a
+    manifest kept next to the cache, so a later hit on that URL can be
+    credited with the bytes it saved.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the statistics.
+
+        Args:
+            path: Cache directory holding the size manifest. If None, uses config default
+        """
+        self.manifest_path = os.path.join(cache_dir(path), _MANIFEST)
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.sizes = json.load(f)
+        except (OSError, ValueError):
+            self.sizes = {}
+        self.requests = 0
+        self.hits = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self._pending = {}
+        self._watched = set()
+        self._lock = threading.Lock()
+
+    def feed(self, method: str, params: dict):
+        """
+        Process one Network.* event.
+
+        Args:
+            method: CDP event name
+            params: CDP event parameters
+        """
+        with self._lock:
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                url = response.get("url", "")
+                if not url.startswith("http"):
+                    return
+                cached = bool(response.get("fromDiskCache") or response.get("fromPrefetchCache"))
+                self._pending[params["requestId"]] = [url, cached, response.get("status")]
+            elif method == "Network.requestServedFromCache":
+                if params.get("requestId") in self._pending:
+                    self._pending[params["requestId"]][1] = True
+            elif method == "Network.loadingFinished":
+                pending = self._pending.pop(params.get("requestId"), None)
+                if pending is None:
+                    return
+                url, cached, status = pending
+                self.requests += 1
+                if cached:
+                    self.hits += 1
+                    self.bytes_saved += self.sizes.get(url, 0)
+                else:
+                    size = int(params.get("encodedDataLength") or 0)
+                    self.bytes_downloaded += size
+                    if status == 200 and size > 0:
+                        self.sizes[url] = size
+
+    def feed_performance_log(self, entries: Iterable[dict]):
+        """
+        Process Selenium performance-log entries (driver.get_log("performance")).
+
+        Args:
+            entries: Log entries whose message holds a CDP event
+        """
+        for entry in entries:
+            message = json.loads(entry["message"]).get("message", {})
+            if message.get("method", "").startswith("Network."):
+                self.feed(message["method"], message.get("params", {}))
+
+    def watch(self, scraper) -> "CacheStats":
+        """
+        Start receiving events from a CDPBrowserScraper.
+
+        Args:
+            scraper: A started CDPBrowserScraper
+
+        Returns:
+            self
+        """
+        if id(scraper.connection) in self._watched:
+            return self
+        self._watched.add(id(scraper.connection))
+        for method in ("Network.responseReceived", "Network.requestServedFromCache", "Network.loadingFinished"):
+            scraper.connection.on(method, lambda params, method=method: self.feed(method, params))
+        return self
+
+    def collect(self, scraper):
+        """
+        Pull pending events from the scraper. Needed for Selenium, a no-op for CDP.
+
+        Args:
+            scraper: A started WeChatBrowserScraper (created with cache_stats=True) or CDPBrowserScraper
+        """
+        driver = getattr(scraper, "driver", None)
+        if driver is not None and getattr(scraper, "cache_stats", True) is False:
+            print("Cache statistics need WeChatBrowserScraper(cache_stats=True)")
+            return
+        if driver is not None:
+            try:
+                self.feed_performance_log(driver.get_log("performance"))
+            except Exception as e:
+                print(f"Performance log unavailable: {e}")
+
+    def save(self):
+        """Write the asset size manifest for later runs."""
+        with self._lock:
+            sizes = dict(self.sizes)
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        # Processes in other cache slots share the manifest; each writes its own temporary file
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sizes, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def report(self) -> dict:
+        """
+        Get the cache statistics.
+
+        Returns:
+            Dictionary with requests, hits, hit_ratio, bytes_downloaded and bytes_saved
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "hit_ratio": self.hits / self.requests if self.requests else 0.0,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+def warmup(scraper, urls: Optional[Iterable[str]] = None, stats: Optional[CacheStats] = None) -> CacheStats:
+    """
+    Load the booking pages once so their static assets land in the disk cache.
+
+    Run it right after start(), well before the release instant; the browser
+    is left on about:blank.
+
+    Args:
+        scraper: A started WeChatBrowserScraper or CDPBrowserScraper
+        urls: Pages to load. If None, uses config.WARMUP_URLS
+        stats: Statistics to add to. If None, a new CacheStats is created
+
+    Returns:
+        The cache statistics of the warmup navigations
+    """
+    stats = stats or CacheStats()
+    if getattr(scraper, "connection", None) is not None:
+        stats.watch(scraper)
+    for url in urls or config.WARMUP_URLS:
+        try:
+            scraper.open_url(url)
+        except Exception as e:
+            print(f"Warmup of {url} failed: {e}")
+    scraper.open_url("about:blank")
+    stats.collect(scraper)
+    stats.save()
+    report = stats.report()
+    print(f"Cache warmup: {report['hits']}/{report['requests']} from disk, "
+          f"{report['bytes_saved'] / 1024:.0f} KiB saved")
+    return stats
+
+
+def warmup_in_background(scraper, urls: Optional[Iterable[str]] = None) -> threading.Thread:
+    """
+    Run warmup() in a separate tab of the scraper's browser on a background thread.
+
+    The tab shares the browser's disk cache but has its own connection, so the
+    scraper stays free for the booking flow while the warmup runs. A Selenium
+    driver cannot take commands from two threads, so WeChatBrowserScraper
+    needs a plain warmup() before the booking window instead.
+
+    Args:
+        scraper: A started CDPBrowserScraper
+        urls: Pages to load. If None, uses config.WARMUP_URLS
+
+    Returns:
+        The started thread
+    """
+    if not hasattr(scraper, "open_tab"):
+        raise TypeError("Background warmup needs a CDPBrowserScraper; call warmup() before the booking window")
+    tab = scraper.open_tab()
+
+    def run():
+        try:
+            warmup(tab, urls)
+        finally:
+            tab.close()
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
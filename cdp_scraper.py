@@ -0,0 +1,639 @@
+"""
+Direct CDP Browser Scraper
+
+This module provides CDPBrowserScraper, an alternative to WeChatBrowserScraper
+that skips chromedriver. It launches Chrome with a remote-debugging port and
+talks the Chrome DevTools Protocol over one persistent websocket. Commands are
+pipelined: each is sent immediately with its own id and matched to its reply
+by a reader thread, so independent commands run concurrently instead of one
+HTTP round trip at a time.
+
+The public API matches WeChatBrowserScraper (start, open_url, wait_for_element,
+wait_for_element_clickable, get_page_source, take_screenshot, execute_script,
+get_cookies, add_cookie, close), so either backend can drive the same script.
+"""
+
+import base64
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+import websocket
+from selenium.common.exceptions import TimeoutException
+
+import config
+from browser_cache import cache_arguments
+from rate_limiter import PRIORITY_POLLING, shared_limiter
+from wechat_bootstrap import bootstrap_bundle
+
+# Locator strategies, using the same strings as selenium's By constants
+_LOCATORS = {
+    "id": "document.getElementById(v)",
+    "name": "document.getElementsByName(v)[0] || null",
+    "class name": "document.getElementsByClassName(v)[0] || null",
+    "tag name": "document.getElementsByTagName(v)[0] || null",
+    "css selector": "document.querySelector(v)",
+    "xpath": "document.evaluate(v, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue",
+    "link text": "Array.from(document.links).find(a => a.textContent.trim() === v) || null",
+    "partial link text": "Array.from(document.links).find(a => a.textContent.includes(v)) || null",
+}
+
+_CHROME_CANDIDATES = (
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome",
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+)
+
+
+class CDPError(RuntimeError):
+    """Raised when Chrome answers a CDP command with an error."""
+
+
+def find_chrome() -> str:
+    """
+    Locate the Chrome executable.
+
+    Returns:
+        Path to Chrome, from config.CHROME_BINARY or the usual install locations
+    """
+    if config.CHROME_BINARY:
+        return config.CHROME_BINARY
+    for candidate in _CHROME_CANDIDATES:
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    raise FileNotFoundError("Chrome not found; set CHROME_BINARY in config.py")
+
+
+class CDPConnection:
+    """
+    One persistent CDP websocket with pipelined commands and event dispatch.
+    """
+
+    def __init__(self, ws):
+        """
+        Wrap an open websocket and start the reader thread.
+
+        Args:
+            ws: A connected websocket.WebSocket (or anything with send/recv/close)
+        """
+        self.ws = ws
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._listeners: Dict[str, List[Callable[[dict], None]]] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def connect(cls, url: str, timeout: float = 10) -> "CDPConnection":
+        """Open a websocket to a DevTools target."""
+        ws = websocket.create_connection(url, timeout=timeout, suppress_origin=True)
+        ws.settimeout(None)
+        return cls(ws)
+
+    def _read_loop(self):
+        while not self._closed:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception as e:
+                self._fail_pending(e)
+                return
+            if "id" in message:
+                with self._lock:
+                    future = self._pending.pop(message["id"], None)
+                if future is None:
+                    continue
+                if "error" in message:
+                    future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+                else:
+                    future.set_result(message.get("result", {}))
+            else:
+                with self._lock:
+                    listeners = list(self._listeners.get(message.get("method"), ()))
+                for listener in listeners:
+                    try:
+                        listener(message.get("params", {}))
+                    except Exception as e:
+                        print(f"CDP listener for {message.get('method')} failed: {e}")
+
+    def _fail_pending(self, error: Exception):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError(f"CDP connection lost: {error}"))
+
+    def send(self, method: str, params: Optional[dict] = None) -> Future:
+        """
+        Send a command without waiting for its reply.
+
+        Args:
+            method: CDP method, e.g. "Page.navigate"
+            params: Command parameters
+
+        Returns:
+            Future resolving to the command's result dictionary
+        """
+        return self._send(method, params)[1]
+
+    def _send(self, method: str, params: Optional[dict] = None) -> tuple:
+        future = Future()
+        command_id = next(self._ids)
+        with self._lock:
+            if self._closed:
+                raise ConnectionError("CDP connection is closed")
+            self._pending[command_id] = future
+        payload = json.dumps({"id": command_id, "method": method, "params": params or {}})
+        with self._send_lock:
+            self.ws.send(payload)
+        return command_id, future
+
+    def _forget(self, command_ids):
+        # A reply that never came must not keep its future around for the life of the connection
+        with self._lock:
+            for command_id in command_ids:
+                self._pending.pop(command_id, None)
+
+    def call(self, method: str, params: Optional[dict] = None, timeout: float = None) -> dict:
+        """
+        Send a command and wait for its result.
+
+        Args:
+            method: CDP method
+            params: Command parameters
+            timeout: Seconds to wait. If None, uses config.DEFAULT_TIMEOUT
+
+        Returns:
+            The command's result dictionary
+        """
+        command_id, future = self._send(method, params)
+        try:
+            return future.result(timeout or config.DEFAULT_TIMEOUT)
+        finally:
+            self._forget([command_id])
+
+    def batch(self, commands: List[tuple], timeout: float = None) -> List[dict]:
+        """
+        Pipeline several commands and wait for all of them.
+
+        Args:
+            commands: List of (method, params) tuples
+            timeout: Seconds to wait for the whole batch
+
+        Returns:
+            Results in the same order as the commands
+        """
+        sent = [self._send(method, params) for method, params in commands]
+        deadline = time.monotonic() + (timeout or config.DEFAULT_TIMEOUT)
+        try:
+            return [f.result(max(0.0, deadline - time.monotonic())) for _, f in sent]
+        finally:
+            self._forget([command_id for command_id, _ in sent])
+
+    def on(self, event: str, listener: Callable[[dict], None]):
+        """Call `listener(params)` for every `event` notification."""
+        with self._lock:
+            self._listeners.setdefault(event, []).append(listener)
+
+    def off(self, event: str, listener: Callable[[dict], None]):
+        with self._lock:
+            listeners = self._listeners.get(event, [])
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def expect(self, event: str, predicate: Callable[[dict], bool] = lambda params: True) -> Future:
+        """
+        Get a future for the next matching event. Register it before triggering the event.
+
+        The listener is removed once the future is done; cancel the future to
+        stop waiting without leaving the listener behind.
+
+        Args:
+            event: CDP event name, e.g. "Page.loadEventFired"
+            predicate: Filter on the event's params
+
+        Returns:
+            Future resolving to the event's params
+        """
+        future = Future()
+
+        def listener(params):
+            if not future.done() and predicate(params):
+                future.set_result(params)
+        self.on(event, listener)
+        future.add_done_callback(lambda _: self.off(event, listener))
+        return future
+
+    def close(self):
+        self._closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+        self._fail_pending(ConnectionError("closed"))
+
+
+class CDPElement:
+    """
+    Handle to a DOM element, exposing the WebElement methods the scripts use.
+    """
+
+    def __init__(self, scraper: "CDPBrowserScraper", object_id: str):
+        self._scraper = scraper
+        self.object_id = object_id
+
+    def _call(self, function: str, *args):
+        result = self._scraper.connection.call("Runtime.callFunctionOn", {
+            "objectId": self.object_id,
+            "functionDeclaration": function,
+            "arguments": [{"value": a} for a in args],
+            "returnByValue": True,
+            "awaitPromise": True,
+        })
+        if "exceptionDetails" in result:
+            raise CDPError(result["exceptionDetails"].get("text", "script error"))
+        return result.get("result", {}).get("value")
+
+    def click(self):
+        self._call("function() { this.scrollIntoView({block: 'center'}); this.click(); }")
+
+    def send_keys(self, text: str):
+        self._call("function() { this.focus(); }")
+        self._scraper.connection.call("Input.insertText", {"text": text})
+
+    def clear(self):
+        self._call("function() { this.value = ''; this.dispatchEvent(new Event('input', {bubbles: true})); }")
+
+    def get_attribute(self, name: str):
+        return self._call("function(n) { return n in this ? this[n] : this.getAttribute(n); }", name)
+
+    @property
+    def text(self) -> str:
+        return self._call("function() { return this.innerText; }")
+
+    def is_displayed(self) -> bool:
+        return self._call("function() { const r = this.getBoundingClientRect();"
+                          " return !!(r.width || r.height) && getComputedStyle(this).visibility !== 'hidden'; }")
+
+    def is_enabled(self) -> bool:
+        return self._call("function() { return !this.disabled; }")
+
+
+class CDPBrowserScraper:
+    """
+    WeChat-configured Chrome driven directly over the DevTools Protocol.
+
+    Drop-in alternative to WeChatBrowserScraper without chromedriver in between.
+    """
+
+    def __init__(
+        self,
+        user_agent: Optional[str] = None,
+        headless: bool = None,
+        window_size: tuple = None,
+        timeout: int = None
+    ):
+        """
+        Initialize the CDP scraper.
+
+        Args:
+            user_agent: Custom User-Agent string. If None, uses default WeChat User-Agent
+            headless: Whether to run browser in headless mode. If None, uses config default
+            window_size: Browser window size as (width, height). If None, uses config default
+            timeout: Default wait timeout in seconds. If None, uses config default
+        """
+        self.user_agent = user_agent or config.DEFAULT_USER_AGENT
+        self.headless = headless if headless is not None else config.HEADLESS
+        self.window_size = window_size or (config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
+        self.timeout = timeout or config.DEFAULT_TIMEOUT
+        self.process = None
+        self.connection: Optional[CDPConnection] = None
+        self._profile_dir = None
+        self._port = None
+        self._is_tab = False
+
+    def _chrome_args(self) -> List[str]:
+        args = [
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self._profile_dir}",
+            f"--user-agent={self.user_agent}",
+            f"--window-size={self.window_size[0]},{self.window_size[1]}",
+            "--disable-blink-features=AutomationControlled",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "about:blank",
+        ]
+        args[-1:-1] = cache_arguments()
+        if self.headless:
+            args[:0] = ["--headless=new", "--no-sandbox", "--disable-dev-shm-usage"]
+        return args
+
+    def _wait_for_port(self) -> int:
+        # With port 0 Chrome picks a free port and writes it to DevToolsActivePort
+        port_file = os.path.join(self._profile_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Chrome exited during startup with code {self.process.returncode}")
+            try:
+                with open(port_file) as f:
+                    return int(f.readline().strip())
+            except (OSError, ValueError):
+                time.sleep(0.05)
+        raise TimeoutException("Chrome did not open its remote-debugging port")
+
+    def _page_websocket_url(self, port: int) -> str:
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list", timeout=2) as resp:
+                    targets = json.load(resp)
+            except OSError:
+                targets = []
+            for target in targets:
+                if target.get("type") == "page" and target.get("webSocketDebuggerUrl"):
+                    return target["webSocketDebuggerUrl"]
+            time.sleep(0.05)
+        raise TimeoutException("No page target found")
+
+    def start(self):
+        """
+        Launch Chrome and attach to its first tab with WeChat configuration.
+        """
+        if self.connection is not None:
+            print("Browser is already running")
+            return
+
+        self._profile_dir = tempfile.mkdtemp(prefix="cdp_profile_")
+        self.process = subprocess.Popen([find_chrome()] + self._chrome_args(),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self._port = self._wait_for_port()
+            self.connection = CDPConnection.connect(self._page_websocket_url(self._port), timeout=self.timeout)
+            self._configure()
+        except Exception:
+            self.close()
+            raise
+
+        print(f"Browser started with User-Agent: {self.user_agent}")
+
+    def _configure(self):
+        width, height = self.window_size
+        # Independent setup commands are pipelined and awaited together
+        self.connection.batch([
+            ("Page.enable", {}),
+            ("Network.enable", {}),
+            ("Network.setUserAgentOverride", {"userAgent": self.user_agent}),
+            ("Emulation.setDeviceMetricsOverride",
+             {"width": width, "height": height, "deviceScaleFactor": 3, "mobile": True}),
+            ("Emulation.setTouchEmulationEnabled", {"enabled": True}),
+            ("Page.addScriptToEvaluateOnNewDocument", {"source": bootstrap_bundle(self.user_agent)[0]}),
+        ], timeout=self.timeout)
+
+    def open_tab(self) -> "CDPBrowserScraper":
+        """
+        Open another tab in the same browser, with the same WeChat configuration.
+
+        The tab shares the browser's cookies and disk cache but has its own
+        connection, so another thread can drive it while this scraper is in
+        use. Closing the tab leaves the browser running.
+
+        Returns:
+            A started CDPBrowserScraper for the new tab
+        """
+        self._require_started()
+        target = self.connection.call("Target.createTarget", {"url": "about:blank"}, timeout=self.timeout)
+        tab = CDPBrowserScraper(self.user_agent, self.headless, self.window_size, self.timeout)
+        tab._is_tab = True
+        tab.connection = CDPConnection.connect(
+            f"ws://127.0.0.1:{self._port}/devtools/page/{target['targetId']}", timeout=self.timeout)
+        try:
+            tab._configure()
+        except Exception:
+            tab.close()
+            raise
+        return tab
+
+    def _require_started(self):
+        if self.connection is None:
+            raise RuntimeError("Browser not started. Call start() first.")
+
+    def open_url(self, url: str, priority: int = PRIORITY_POLLING):
+        """
+        Navigate to a URL and wait for its load event.
+
+        Same-document navigations (a changed #fragment) fire no load event and
+        return as soon as Chrome has committed them.
+
+        Args:
+            url: The URL to navigate to
+            priority: Rate limiter priority class of the navigation
+        """
+        self._require_started()
+        if not shared_limiter().acquire(url, priority, timeout=self.timeout):
+            raise TimeoutException(f"No rate limit token for {url} within {self.timeout}s")
+        print(f"Navigating to: {url}")
+        loaded = self.connection.expect("Page.loadEventFired")
+        try:
+            result = self.connection.call("Page.navigate", {"url": url}, timeout=self.timeout)
+            if result.get("errorText"):
+                raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+            # Chrome omits loaderId when the navigation stayed in the current document
+            if result.get("loaderId"):
+                loaded.result(self.timeout)
+        except FutureTimeoutError:
+            raise TimeoutException(f"Page did not load within {self.timeout}s: {url}")
+        finally:
+            loaded.cancel()
+
+    def _find(self, by: str, value: str) -> Optional[CDPElement]:
+        locator = _LOCATORS.get(by)
+        if locator is None:
+            raise ValueError(f"Unsupported locator strategy: {by}")
+        result = self.connection.call("Runtime.evaluate", {
+            "expression": f"(function(v) {{ return {locator}; }})({json.dumps(value)})",
+        })
+        object_id = result.get("result", {}).get("objectId")
+        return CDPElement(self, object_id) if object_id else None
+
+    def _wait(self, by: str, value: str, timeout: Optional[int], condition) -> CDPElement:
+        self._require_started()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        while True:
+            element = self._find(by, value)
+            if element is not None:
+                if condition(element):
+                    return element
+                # Every poll creates a remote object; let Chrome free the ones that did not match
+                self.connection.send("Runtime.releaseObject", {"objectId": element.object_id})
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"Element not found: {by}={value}")
+            time.sleep(0.05)
+
+    def wait_for_element(self, by: str, value: str, timeout: Optional[int] = None) -> CDPElement:
+        """
+        Wait for an element to be present on the page.
+
+        Args:
+            by: The method to locate the element (e.g., By.ID, By.XPATH)
+            value: The value to search for
+            timeout: Maximum time to wait in seconds. If None, uses default timeout
+
+        Returns:
+            A CDPElement once it's found
+        """
+        return self._wait(by, value, timeout, lambda element: True)
+
+    def wait_for_element_clickable(self, by: str, value: str, timeout: Optional[int] = None) -> CDPElement:
+        """
+        Wait for an element to be visible and enabled.
+
+        Args:
+            by: The method to locate the element (e.g., By.ID, By.XPATH)
+            value: The value to search for
+            timeout: Maximum time to wait in seconds. If None, uses default timeout
+
+        Returns:
+            A CDPElement once it's clickable
+        """
+        return self._wait(by, value, timeout, lambda element: element.is_displayed() and element.is_enabled())
+
+    def get_page_source(self) -> str:
+        """
+        Get the current page's HTML source.
+
+        Returns:
+            The page source as a string
+        """
+        self._require_started()
+        return self.execute_script("return document.documentElement.outerHTML")
+
+    def take_screenshot(self, filename: str):
+        """
+        Take a screenshot of the current page.
+
+        Args:
+            filename: The filename to save the screenshot to
+        """
+        self._require_started()
+        data = self.connection.call("Page.captureScreenshot", {"format": "png"}, timeout=self.timeout)
+        with open(filename, "wb") as f:
+            f.write(base64.b64decode(data["data"]))
+        print(f"Screenshot saved to: {filename}")
+
+    def execute_script(self, script: str, *args):
+        """
+        Execute JavaScript in the page, with selenium's calling convention.
+
+        Args:
+            script: Function body; use `return` and `arguments[i]` as with selenium
+            *args: JSON-serializable values or CDPElement handles
+
+        Returns:
+            The return value from the script
+        """
+        self._require_started()
+        function = f"function() {{ {script} }}"
+        element = next((a for a in args if isinstance(a, CDPElement)), None)
+        if element is None:
+            result = self.connection.call("Runtime.evaluate", {
+                "expression": f"({function}).apply(window, {json.dumps(list(args))})",
+                "returnByValue": True,
+                "awaitPromise": True,
+            }, timeout=self.timeout)
+        else:
+            result = self.connection.call("Runtime.callFunctionOn", {
+                "objectId": element.object_id,
+                "functionDeclaration": function,
+                "arguments": [{"objectId": a.object_id} if isinstance(a, CDPElement) else {"value": a}
+                              for a in args],
+                "returnByValue": True,
+                "awaitPromise": True,
+            }, timeout=self.timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text"))
+        return result.get("result", {}).get("value")
+
+    def get_cookies(self) -> list:
+        """
+        Get all cookies visible to the current page.
+
+        Returns:
+            List of cookie dictionaries in selenium's format
+        """
+        self._require_started()
+        cookies = self.connection.call("Network.getCookies", timeout=self.timeout)["cookies"]
+        result = []
+        for c in cookies:
+            cookie = {"name": c["name"], "value": c["value"], "domain": c["domain"], "path": c["path"],
+                      "secure": c.get("secure", False), "httpOnly": c.get("httpOnly", False)}
+            if not c.get("session") and c.get("expires", -1) > 0:
+                cookie["expiry"] = int(c["expires"])
+            if c.get("sameSite"):
+                cookie["sameSite"] = c["sameSite"]
+            result.append(cookie)
+        return result
+
+    def add_cookie(self, cookie_dict: dict):
+        """
+        Add a cookie to the current session.
+
+        Args:
+            cookie_dict: Dictionary containing cookie information
+        """
+        self._require_started()
+        params = {"name": cookie_dict["name"], "value": cookie_dict.get("value", "")}
+        for key in ("domain", "path", "secure", "httpOnly", "sameSite"):
+            if key in cookie_dict:
+                params[key] = cookie_dict[key]
+        if "expiry" in cookie_dict:
+            params["expires"] = cookie_dict["expiry"]
+        if "domain" not in params:
+            params["url"] = self.execute_script("return location.href")
+        result = self.connection.call("Network.setCookie", params, timeout=self.timeout)
+        if result.get("success") is False:
+            raise CDPError(f"Chrome rejected cookie {cookie_dict['name']}")
+
+    def close(self):
+        """
+        Close the browser.
+        """
+        if self.connection is not None:
+            try:
+                self.connection.send("Page.close" if self._is_tab else "Browser.close")
+            except Exception:
+                pass
+            self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+            print("Browser closed")
+        if self._profile_dir is not None:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+            self._profile_dir = None
+
+    def __enter__(self):
+        """Context manager entry."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
@@ -34,3 +34,108 @@ DEFAULT_TIMEOUT = 10
 
 # Whether to run browser in headless mode
 HEADLESS = False
+
+# Resilient HTTP layer (resilient_http.py)
+HTTP_DEADLINE = 8.0  # Hard deadline for one logical request, in seconds
+HTTP_MAX_ATTEMPTS = 4  # Attempts per request, each possibly hedged
+HTTP_HEDGE_QUANTILE = 0.9  # Send a hedged duplicate once this latency quantile is exceeded
+HTTP_HEDGE_DEFAULT_DELAY = 0.5  # Hedge delay used until enough latency samples exist
+HTTP_MIN_HEDGE_DELAY = 0.05  # Never hedge sooner than this, in seconds
+HTTP_LATENCY_WINDOW = 200  # Number of recent latencies kept per endpoint
+HTTP_RETRY_BASE_DELAY = 0.1  # Base of the jittered exponential backoff, in seconds
+HTTP_RETRY_MAX_DELAY = 1.0  # Cap of the jittered exponential backoff, in seconds
+HTTP_IDEMPOTENCY_TTL = 600  # Seconds a confirmed booking response is returned for repeated calls
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures that open an endpoint's circuit
+CIRCUIT_RESET_TIMEOUT = 5.0  # Seconds an open circuit waits before a trial request
+
+# vfmc booking site
+VFMC_BASE_URL = "http://vfmc.tju.edu.cn"
+VFMC_ENTRY_URL = VFMC_BASE_URL + "/Views/User/UserChoose.html"
+# Court-list and booking endpoints as captured from the site; {date} is filled in as YYYY-MM-DD
+VFMC_AVAILABILITY_URL = None
+VFMC_BOOKING_URL = None
+# XPath of the login entry on the user-type page (see badminton.py)
+VFMC_LOGIN_XPATH = "/html/body/div/div[2]/div[1]"
+COOKIE_FILE = "session_cookies.json"  # Where the authenticated session is persisted
+
+# Watch daemon (watch_daemon.py)
+WATCH_INTERVAL = 5.0  # Seconds between availability polls
+WATCH_DAYS_AHEAD = 3  # Number of days, starting today, to watch
+WATCH_STATUS_HOST = "127.0.0.1"
+WATCH_STATUS_PORT = 8765  # Local status endpoint; 0 disables it
+LOGIN_WAIT = 60  # Seconds to wait for a manual login in the browser
+
+# Availability history (history_store.py)
+HISTORY_DB = "history.sqlite3"  # SQLite file holding every observed availability change
+HISTORY_BATCH_SIZE = 500  # Events written per transaction
+HISTORY_FLUSH_INTERVAL = 1.0  # Longest time an event waits before being written, in seconds
+
+# Polling budget (poll_budget.py)
+POLL_BUDGET = 60  # Total availability polls per minute shared by all targets
+POLL_BUDGET_UNITS = 120  # Number of equal slices the budget is allocated in
+POLL_PRIOR_RATE = 1 / 86400  # Free-ups per second assumed for a slot with no history
+POLL_PRIOR_LIFETIME = 300  # Seconds a freed slot is assumed to stay free with no history
+POLL_PRIOR_EXPOSURE = 3600  # Seconds of observation the prior is worth
+
+# Direct CDP backend (cdp_scraper.py)
+CHROME_BINARY = None  # Path to Chrome; if None, the usual install locations are searched
+
+# Pre-serialized booking requests (booking_stager.py)
+STAGER_CSRF_FIELD = "__RequestVerificationToken"  # Form field the anti-CSRF token is sent in
+STAGER_CSRF_HEADER = "RequestVerificationToken"  # Header the anti-CSRF token is sent in
+
+# Session keep-alive (session_manager.py)
+SESSION_HEARTBEAT_URL = None  # Cheap page that needs a login; if None, today's availability page is used
+SESSION_HEARTBEAT_INTERVAL = 120  # Seconds between heartbeats
+SESSION_IDLE_TIMEOUT = 1200  # Server drops a session idle this long (ASP.NET default is 20 minutes)
+SESSION_REFRESH_MARGIN = 300  # Start a background login this many seconds before expiry
+SESSION_COOKIES = ("ASP.NET_SessionId", ".ASPXAUTH")  # Cookies whose expiry ends the login; others are ignored
+SESSION_LOGIN_BACKOFF = 30  # Seconds before retrying a failed login; doubles with each failure in a row
+SESSION_LOGIN_BACKOFF_MAX = 900  # Longest wait between failed logins
+
+# Persistent browser cache (browser_cache.py)
+BROWSER_CACHE_DIR = "~/.cache/vfmc-helper/browser"  # Disk cache kept across runs, one slot per process; None for a fresh cache
+BROWSER_CACHE_SIZE = 200 * 1024 * 1024  # Maximum disk cache size in bytes
+WARMUP_URLS = [VFMC_ENTRY_URL]  # Pages whose static assets are preloaded by warmup()
+
+# Host-wide rate limiter (rate_limiter.py)
+RATE_LIMIT_FILE = None  # Shared state file; if None, a file in the system temp directory
+RATE_LIMITS = {"vfmc.tju.edu.cn": (5.0, 10)}  # "host[/path-prefix]": (requests per second, burst)
+RATE_LIMIT_BOOKING_RESERVE = 2  # Tokens polling leaves untouched for booking requests
+
+# Multi-node slot claiming (slot_claims.py)
+CLAIM_STORE = None  # "tcp://host:port" of a claim server, or a SQLite file shared by local nodes; None disables claiming
+CLAIM_TTL = 10  # Seconds a lease lasts without renewal; a dead node's targets are free again after this
+CLAIM_NODE_ID = None  # This node's id; if None, hostname-pid is used
+CLAIM_SERVER_PORT = 8766  # Port of `python slot_claims.py serve`
+
+# Driver backend (fake_driver.py)
+DRIVER_BACKEND = "chrome"  # "chrome" launches a real browser; "fake" serves pages from an in-memory DOM
+FAKE_CAPTURE_DIR = "debug_wechat"  # Saved pages served by the fake driver, relative to the repo
+
+# Multi-day availability prefetch (availability_prefetch.py)
+PREFETCH_WORKERS = 7  # Days fetched at the same time, over HTTP or in browser tabs
+
+# Browser memory governor (memory_governor.py)
+MEMORY_SAMPLE_INTERVAL = 30  # Seconds between memory samples
+MEMORY_RSS_TRIM = 800 * 1024 * 1024  # Chrome process-tree RSS at which caches are trimmed
+MEMORY_RSS_LIMIT = 1500 * 1024 * 1024  # Chrome process-tree RSS at which the browser is recycled
+MEMORY_HEAP_TRIM = 150 * 1024 * 1024  # Page JS heap at which caches are trimmed
+MEMORY_HEAP_LIMIT = 400 * 1024 * 1024  # Page JS heap at which the browser is recycled
+MEMORY_IDLE_GRACE = 5  # Seconds without busy work before a recycle may run
+
+# Network condition profiles (network_conditions.py, bench_network_profiles.py)
+# Round-trip latency in ms, bandwidth in kilobits/s, packet loss ratio
+NETWORK_PROFILES = {
+    "lan": {"latency": 2, "down_kbps": 100000, "up_kbps": 100000, "loss": 0.0},
+    "campus": {"latency": 40, "down_kbps": 10000, "up_kbps": 5000, "loss": 0.0},
+    "campus_release": {"latency": 300, "down_kbps": 1000, "up_kbps": 500, "loss": 0.02},
+    "congested": {"latency": 800, "down_kbps": 256, "up_kbps": 128, "loss": 0.05},
+}
+
+# Learned navigation graph (nav_graph.py)
+NAV_GRAPH_FILE = "nav_graph.json"  # Recorded hops and goals, learned from earlier runs
+
+# DOM change journal (dom_journal.py)
+DOM_JOURNAL_SIZE = 500  # Entries the in-page buffer holds between drains before it overflows
+DOM_JOURNAL_MAX_HTML = 2000  # Longest innerHTML a children entry carries; larger ones only name the element
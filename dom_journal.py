@@ -0,0 +1,112 @@
+"""
+DOM Change Journal
+
+This module records what changes on a page instead of re-reading all of it.
+A MutationObserver injected into the page writes compact entries into a
+bounded in-page buffer; draining the buffer returns only what changed since
+the previous drain, a few hundred bytes where get_page_source() transfers and
+re-parses the whole document. Entries for the same node and attribute are
+coalesced, so a cell that flips several times between checks costs one entry;
+the coalesced entry moves to the end, so replaying the changes in order always
+ends on each node's latest state.
+
+Entries are lists:
+    ["a", path, attribute, value]   an attribute changed (value None if removed)
+    ["t", path, text]               the text inside an element changed
+    ["c", path, html]               an element's children changed; html is its new
+                                    innerHTML, or None if larger than DOM_JOURNAL_MAX_HTML
+
+A path is the nearest ancestor id followed by child indexes, e.g. "#grid/3/1";
+elements with an id are addressed as "#id" directly.
+
+Usage:
+    scraper.start_change_journal()
+    ...
+    delta = scraper.drain_changes()
+    if delta["reset"] or delta["overflow"]:
+        html = scraper.get_page_source()  # the journal cannot describe this, read the page once
+    else:
+        for entry in delta["changes"]:
+            ...
+"""
+
+from typing import Optional
+
+import config
+
+# Both scripts start with a marker comment so they are recognisable in logs and by the fake driver
+INSTALL_SCRIPT = r"""/* dom-journal install */ (function (limit, maxHtml) {
+  var journal = window.__domJournal;
+  if (journal) {
+    // Installed already (an earlier registration ran first); the latest limits apply
+    journal.limit = limit; journal.maxHtml = maxHtml;
+    return journal.doc;
+  }
+  journal = window.__domJournal = {
+    doc: Date.now().toString(36) + Math.random().toString(36).slice(2), entries: [], keys: {}, overflow: false,
+    limit: limit, maxHtml: maxHtml
+  };
+  function path(node) {
+    var parts = [];
+    while (node && node.nodeType === 1 && node !== document.documentElement) {
+      if (node.id) { parts.unshift('#' + node.id); break; }
+      var index = 0, sibling = node;
+      while ((sibling = sibling.previousElementSibling)) index++;
+      parts.unshift(index);
+      node = node.parentElement;
+    }
+    return parts.join('/');
+  }
+  function push(key, entry) {
+    if (key in journal.keys) {
+      // Move the coalesced entry to the end, so replaying in order ends on the latest value
+      var old = journal.keys[key];
+      journal.entries.splice(old, 1);
+      for (var k in journal.keys) if (journal.keys[k] > old) journal.keys[k]--;
+    } else if (journal.entries.length >= journal.limit) {
+      journal.overflow = true; return;
+    }
+    journal.keys[key] = journal.entries.length;
+    journal.entries.push(entry);
+  }
+  new MutationObserver(function (mutations) {
+    for (var i = 0; i < mutations.length; i++) {
+      var m = mutations[i], target = m.target;
+      if (m.type === 'characterData') target = target.parentElement;
+      if (!target || target.nodeType !== 1) continue;
+      var p = path(target);
+      if (m.type === 'attributes') {
+        push('a' + p + ' ' + m.attributeName, ['a', p, m.attributeName, target.getAttribute(m.attributeName)]);
+      } else if (m.type === 'characterData') {
+        push('t' + p, ['t', p, target.textContent]);
+      } else {
+        var html = target.innerHTML;
+        push('c' + p, ['c', p, html.length > journal.maxHtml ? null : html]);
+      }
+    }
+  }).observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+  return journal.doc;
+})(%d, %d);
+"""
+
+DRAIN_SCRIPT = r"""/* dom-journal drain */
+var journal = window.__domJournal;
+if (!journal) return null;
+var out = { doc: journal.doc, changes: journal.entries, overflow: journal.overflow };
+journal.entries = []; journal.keys = {}; journal.overflow = false;
+return out;
+"""
+
+
+def install_script(limit: Optional[int] = None, max_html: Optional[int] = None) -> str:
+    """
+    Build the journal's install script.
+
+    Args:
+        limit: Entries the in-page buffer holds between drains. If None, uses config default
+        max_html: Longest innerHTML kept in a children entry. If None, uses config default
+
+    Returns:
+        JavaScript source; "return " + source evaluates to the journal's document id
+    """
+    return INSTALL_SCRIPT % (limit or config.DOM_JOURNAL_SIZE, max_html or config.DOM_JOURNAL_MAX_HTML)
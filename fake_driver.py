@@ -0,0 +1,737 @@
+"""
+Fake In-Memory Driver
+
+This module provides a browser-free stand-in for the Selenium Chrome driver.
+Pages come from an in-process site model: routes to HTML strings, saved
+captures in debug_wechat/, or Python callables. They are parsed into a small
+DOM that supports element lookup (id, name, class, tag, CSS and a practical
+XPath subset), clicks, typing, cookies and stubbed scripts. A whole booking
+flow runs in milliseconds, so flows and schedules can be simulated thousands
+of times without Chrome.
+
+Select it with DRIVER_BACKEND = "fake" in config.py, or per scraper:
+
+Usage:
+    with WeChatBrowserScraper(backend="fake") as scraper:
+        scraper.open_url(config.VFMC_ENTRY_URL)
+        scraper.wait_for_element_clickable(By.XPATH, config.VFMC_LOGIN_XPATH).click()
+        print(scraper.driver.current_url)
+"""
+
+import os
+import re
+import time
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Union
+from urllib.parse import urljoin, urlsplit
+
+from selenium.common.exceptions import NoSuchElementException, NoSuchWindowException
+
+import config
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+              "source", "track", "wbr"}
+_RAW_TEXT_TAGS = {"script", "style"}
+_BLANK_PNG = (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f"
+              b"\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00"
+              b"\x00IEND\xaeB`\x82")
+
+Page = Union[str, Callable[["FakeDriver", str], str]]
+
+
+class FakeElement:
+    """
+    A DOM element with the WebElement methods the scrapers use.
+    """
+
+    def __init__(self, tag: str, attrs: Optional[Dict[str, str]] = None, parent: "FakeElement" = None):
+        self.tag_name = tag
+        self.attrs = dict(attrs or {})
+        self.parent = parent
+        self.children: List[Union["FakeElement", str]] = []
+        self.driver: Optional["FakeDriver"] = None
+
+    # Tree helpers
+
+    def elements(self) -> List["FakeElement"]:
+        return [child for child in self.children if isinstance(child, FakeElement)]
+
+    def iter(self):
+        """Yield this element and all descendant elements in document order."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.elements()))
+
+    def _raw_text(self) -> str:
+        parts = []
+        for child in self.children:
+            if isinstance(child, str):
+                parts.append(child)
+            elif child.tag_name not in _RAW_TEXT_TAGS:
+                parts.append(child._raw_text())
+                if child.tag_name in ("br", "p", "div", "li", "tr"):
+                    parts.append("\n")
+        return "".join(parts)
+
+    def outer_html(self) -> str:
+        attrs = "".join(f' {k}="{v}"' if v is not None else f" {k}" for k, v in self.attrs.items())
+        if self.tag_name in _VOID_TAGS:
+            return f"<{self.tag_name}{attrs}>"
+        inner = "".join(c if isinstance(c, str) else c.outer_html() for c in self.children)
+        return f"<{self.tag_name}{attrs}>{inner}</{self.tag_name}>"
+
+    # WebElement API
+
+    @property
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in self._raw_text().split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        if name == "innerHTML":
+            return "".join(c if isinstance(c, str) else c.outer_html() for c in self.children)
+        if name == "outerHTML":
+            return self.outer_html()
+        if name == "textContent":
+            return self._raw_text()
+        if name == "value" and self.tag_name == "textarea" and "value" not in self.attrs:
+            return self._raw_text()
+        value = self.attrs.get(name)
+        if value is None and name in self.attrs:
+            return "true"
+        return value
+
+    get_property = get_attribute
+    get_dom_attribute = get_attribute
+
+    def is_displayed(self) -> bool:
+        node = self
+        while node is not None:
+            style = node.attrs.get("style") or ""
+            if ("hidden" in node.attrs or re.search(r"display\s*:\s*none", style)
+                    or (node.tag_name == "input" and node.attrs.get("type") == "hidden")):
+                return False
+            node = node.parent
+        return True
+
+    def is_enabled(self) -> bool:
+        return "disabled" not in self.attrs
+
+    def is_selected(self) -> bool:
+        return "checked" in self.attrs or "selected" in self.attrs
+
+    def click(self):
+        if self.driver is None:
+            raise RuntimeError("Element is not attached to a page")
+        self.driver._click(self)
+
+    def send_keys(self, *values):
+        self.attrs["value"] = (self.attrs.get("value") or "") + "".join(str(v) for v in values)
+
+    def clear(self):
+        self.attrs["value"] = ""
+
+    # Changes a page script would make; the driver's on_mutation() hook sees them
+
+    def set_attribute(self, name: str, value: Optional[str]):
+        """Set an attribute, or remove it when value is None."""
+        if value is None:
+            self.attrs.pop(name, None)
+        else:
+            self.attrs[name] = value
+        if self.driver is not None:
+            self.driver.on_mutation("a", self, name, value)
+
+    def set_text(self, text: str):
+        """Replace the element's content with text."""
+        # Rewriting a lone text node is a characterData mutation, anything else replaces children
+        kind = "t" if len(self.children) == 1 and isinstance(self.children[0], str) else "c"
+        self.children = [text]
+        if self.driver is not None:
+            self.driver.on_mutation(kind, self)
+
+    def find_element(self, by: str, value: str) -> "FakeElement":
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"Unable to locate element: {by}={value}")
+        return found[0]
+
+    def find_elements(self, by: str, value: str) -> List["FakeElement"]:
+        return find_all(self, by, value)
+
+    def __repr__(self):
+        return f"<FakeElement {self.tag_name} {self.attrs}>"
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = FakeElement("#document")
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        element = FakeElement(tag, {k: v for k, v in attrs}, self.stack[-1])
+        self.stack[-1].children.append(element)
+        if tag not in _VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        # Close the nearest open element with this tag, implicitly closing anything inside it
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag_name == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+def parse_document(html: str) -> FakeElement:
+    """
+    Parse HTML into a FakeElement tree rooted at a "#document" node.
+    """
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+# Locators
+
+_XPATH_STEP = re.compile(r"(//|/)?(\.\.|\.|\*|[\w:-]+(?:\(\))?)((?:\[(?:[^\]'\"]|'[^']*'|\"[^\"]*\")*\])*)")
+_XPATH_PRED = re.compile(r"\[((?:[^\]'\"]|'[^']*'|\"[^\"]*\")*)\]")
+_CSS_COMPOUND = re.compile(r"([\w-]+|\*)?((?:#[\w-]+|\.[\w-]+|\[[^\]]+\])*)")
+_CSS_PART = re.compile(r"#([\w-]+)|\.([\w-]+)|\[\s*([\w-]+)\s*(?:([~^$*|]?=)\s*['\"]?([^'\"\]]*)['\"]?\s*)?\]")
+
+
+def _xpath_value(expr: str, element: FakeElement) -> Optional[str]:
+    expr = expr.strip()
+    if expr.startswith("@"):
+        return element.attrs.get(expr[1:])
+    if expr in ("text()", "."):
+        return element._raw_text()
+    if expr == "normalize-space()" or expr == "normalize-space(.)":
+        return " ".join(element._raw_text().split())
+    if expr[:1] in "'\"":
+        return expr[1:-1]
+    raise ValueError(f"Unsupported XPath expression: {expr}")
+
+
+def _xpath_test(predicate: str, element: FakeElement) -> bool:
+    for clause in re.split(r"\s+and\s+", predicate):
+        clause = clause.strip()
+        match = re.fullmatch(r"(contains|starts-with)\((.+?),\s*(['\"].*['\"])\)", clause)
+        if match:
+            haystack = _xpath_value(match.group(2), element)
+            needle = _xpath_value(match.group(3), element)
+            if haystack is None:
+                return False
+            ok = needle in haystack if match.group(1) == "contains" else haystack.startswith(needle)
+        elif "=" in clause:
+            left, right = (part.strip() for part in clause.split("=", 1))
+            left_value = _xpath_value(left, element)
+            right_value = _xpath_value(right, element)
+            if left.startswith("text()"):
+                ok = left_value is not None and left_value.strip() == right_value
+            else:
+                ok = left_value == right_value
+        else:
+            ok = _xpath_value(clause, element) is not None
+        if not ok:
+            return False
+    return True
+
+
+def _apply_predicates(candidates: List[FakeElement], predicates: List[str]) -> List[FakeElement]:
+    for predicate in predicates:
+        predicate = predicate.strip()
+        if predicate.isdigit():
+            index = int(predicate) - 1
+            candidates = candidates[index:index + 1]
+        elif predicate == "last()":
+            candidates = candidates[-1:]
+        else:
+            candidates = [c for c in candidates if _xpath_test(predicate, c)]
+    return candidates
+
+
+def find_xpath(context: FakeElement, xpath: str) -> List[FakeElement]:
+    """
+    Evaluate an XPath subset: child and descendant steps, "*", "..", positional,
+    attribute, text() and contains()/starts-with() predicates joined by "and".
+    """
+    root = context
+    while root.parent is not None:
+        root = root.parent
+    nodes = [root] if xpath.startswith("/") else [context]
+    pos = 0
+    first = True
+    while pos < len(xpath):
+        match = _XPATH_STEP.match(xpath, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"Unsupported XPath: {xpath}")
+        pos = match.end()
+        axis, name, predicates = match.group(1) or "/", match.group(2), _XPATH_PRED.findall(match.group(3))
+        if first and match.group(1) is None and name == ".":
+            first = False
+            continue
+        first = False
+        result = []
+        seen = set()
+        for node in nodes:
+            parents = node.iter() if axis == "//" else [node]
+            for parent in parents:
+                if name == "..":
+                    candidates = [parent.parent] if parent.parent is not None else []
+                elif name == ".":
+                    candidates = [parent]
+                else:
+                    candidates = [c for c in parent.elements() if name in ("*", c.tag_name)]
+                for element in _apply_predicates(candidates, predicates):
+                    if id(element) not in seen:
+                        seen.add(id(element))
+                        result.append(element)
+        nodes = result
+    return [n for n in nodes if n.tag_name != "#document"]
+
+
+def _css_compound_matches(compound: str, element: FakeElement) -> bool:
+    match = _CSS_COMPOUND.fullmatch(compound)
+    if match is None:
+        raise ValueError(f"Unsupported CSS selector: {compound}")
+    tag, rest = match.groups()
+    if tag and tag != "*" and element.tag_name != tag:
+        return False
+    for id_, cls, attr, op, value in _CSS_PART.findall(rest or ""):
+        if id_ and element.attrs.get("id") != id_:
+            return False
+        if cls and cls not in (element.attrs.get("class") or "").split():
+            return False
+        if attr:
+            actual = element.attrs.get(attr)
+            if actual is None and attr not in element.attrs:
+                return False
+            actual = actual or ""
+            if op == "=" and actual != value:
+                return False
+            if op == "*=" and value not in actual:
+                return False
+            if op == "^=" and not actual.startswith(value):
+                return False
+            if op == "$=" and not actual.endswith(value):
+                return False
+            if op == "~=" and value not in actual.split():
+                return False
+    return True
+
+
+def _css_matches(parts: List[str], element: FakeElement) -> bool:
+    if not _css_compound_matches(parts[-1], element):
+        return False
+    if len(parts) == 1:
+        return True
+    combinator, rest = parts[-2], parts[:-2]
+    node = element.parent
+    while node is not None and node.tag_name != "#document":
+        if _css_matches(rest, node):
+            return True
+        if combinator == ">":
+            return False
+        node = node.parent
+    return False
+
+
+def find_css(context: FakeElement, selector: str) -> List[FakeElement]:
+    """
+    Evaluate a CSS subset: tag, #id, .class and [attr op value] compounds with
+    descendant and ">" combinators, and "," groups.
+    """
+    groups = []
+    for group in selector.split(","):
+        tokens = re.sub(r"\s*>\s*", " > ", group.strip()).split()
+        parts = []
+        for token in tokens:
+            if token != ">" and parts and parts[-1] != ">":
+                parts.append(" ")
+            parts.append(token)
+        groups.append(parts)
+    return [element for element in list(context.iter())[1:]
+            if any(_css_matches(parts, element) for parts in groups)]
+
+
+def find_all(context: FakeElement, by: str, value: str) -> List[FakeElement]:
+    """
+    Find elements below `context` with a Selenium locator strategy.
+
+    Args:
+        context: Element (or document) to search under
+        by: Selenium By value, e.g. "xpath" or "css selector"
+        value: The locator
+
+    Returns:
+        Matching elements in document order
+    """
+    if by == "xpath":
+        return find_xpath(context, value)
+    if by == "css selector":
+        return find_css(context, value)
+    descendants = list(context.iter())[1:]
+    if by == "id":
+        return [e for e in descendants if e.attrs.get("id") == value]
+    if by == "name":
+        return [e for e in descendants if e.attrs.get("name") == value]
+    if by == "class name":
+        return [e for e in descendants if value in (e.attrs.get("class") or "").split()]
+    if by == "tag name":
+        return [e for e in descendants if e.tag_name == value]
+    if by == "link text":
+        return [e for e in descendants if e.tag_name == "a" and e.text == value]
+    if by == "partial link text":
+        return [e for e in descendants if e.tag_name == "a" and value in e.text]
+    raise ValueError(f"Unsupported locator strategy: {by}")
+
+
+class FakeSite:
+    """
+    Routes URLs to pages, and clicks to handlers, for FakeDriver.
+    """
+
+    def __init__(self, pages: Optional[Dict[str, Page]] = None, not_found: Optional[Page] = None):
+        """
+        Initialize the site.
+
+        Args:
+            pages: Mapping of full URL, path with query, or path to HTML or a
+                callable taking (driver, url) and returning HTML
+            not_found: Page for unknown URLs. If None, a minimal 404 page
+        """
+        self.pages: Dict[str, Page] = dict(pages or {})
+        self.not_found = not_found or "<html><head><title>404</title></head><body>Not Found</body></html>"
+        self.click_handlers: List[tuple] = []
+
+    def route(self, url: str, page: Page):
+        """Serve `page` for a full URL, a path with query, or a path."""
+        self.pages[url] = page
+
+    def on_click(self, by: str, value: str, handler: Callable[["FakeDriver", FakeElement], None]):
+        """
+        Run `handler(driver, element)` when an element matching the locator is clicked.
+
+        The handler replaces the default click behaviour (links and inline onclick navigation).
+        """
+        self.click_handlers.append((by, value, handler))
+
+    def page_for(self, url: str) -> Page:
+        parts = urlsplit(url)
+        path_query = parts.path + (f"?{parts.query}" if parts.query else "")
+        for key in (url.split("#")[0], path_query, parts.path):
+            if key in self.pages:
+                return self.pages[key]
+        return self.not_found
+
+
+def _read_capture(name: str) -> str:
+    directory = config.FAKE_CAPTURE_DIR
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+    with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def capture_site() -> FakeSite:
+    """
+    Build a site from the saved debug_wechat captures.
+
+    The vfmc entry page serves the captured user-type page, and the login
+    entry it links to serves the captured WeChat block page, which is what
+    the real site returned outside WeChat.
+    """
+    entry = _read_capture("page_source.html")
+    blocked = _read_capture("page_2_fallback.html")
+    return FakeSite({
+        config.VFMC_ENTRY_URL: entry,
+        "/Views/User/UserChoose.html": entry,
+        "/User/UserChoose": blocked,
+    })
+
+
+class _SwitchTo:
+    def __init__(self, driver: "FakeDriver"):
+        self._driver = driver
+
+    def window(self, handle: str):
+        self._driver._switch(handle)
+
+    def new_window(self, type_hint: Optional[str] = None):
+        self._driver._switch(self._driver._open_tab("about:blank"))
+
+
+class FakeDriver:
+    """
+    Selenium-compatible driver over a FakeSite.
+
+    Implements the core driver surface used by WeChatBrowserScraper:
+    navigation, element lookup, cookies, tabs, scripts (through stubs), CDP
+    commands (recorded; Target.createTarget opens a tab, new-document scripts
+    and Network.setCookies are kept) and screenshots (a blank PNG).
+
+    Fakes of individual features live with their tests, as script stubs or as
+    subclasses overriding execute_cdp_cmd(), load_delay() and on_mutation().
+    """
+
+    def __init__(self, site: Optional[FakeSite] = None, user_agent: Optional[str] = None,
+                 latency: float = 0.0):
+        """
+        Initialize the driver.
+
+        Args:
+            site: The pages to serve. If None, uses capture_site()
+            user_agent: Value of navigator.userAgent. If None, uses default WeChat User-Agent
+            latency: Seconds each navigation takes, to simulate the network
+        """
+        self.site = site or capture_site()
+        self.user_agent = user_agent or config.DEFAULT_USER_AGENT
+        self.latency = latency
+        self.current_url = "about:blank"
+        self.document = parse_document("<html><head></head><body></body></html>")
+        self.history: List[str] = []
+        self.ready_at = 0.0
+        self.current_window_handle = "tab-1"
+        self.switch_to = _SwitchTo(self)
+        self._tabs: Dict[str, Optional[dict]] = {"tab-1": None}
+        self._tab_ids = 1
+        self.cookies: List[dict] = []
+        self.executed_scripts: List[str] = []
+        self.cdp_commands: List[tuple] = []
+        # Sources registered with Page.addScriptToEvaluateOnNewDocument; pages may inspect them
+        self.new_document_scripts: List[str] = []
+        self._new_document_ids: Dict[str, str] = {}
+        self._script_ids = 0
+        self.script_stubs: List[tuple] = []
+        self._install_default_stubs()
+
+    def _install_default_stubs(self):
+        self.add_script_stub(r"navigator,\s*['\"]webdriver['\"]", lambda d, *a: None)
+        self.add_script_stub(r"^\s*return\s+document\.readyState",
+                             lambda d, *a: "complete" if time.monotonic() >= d.ready_at else "loading")
+        self.add_script_stub(r"^\s*return\s+document\.title", lambda d, *a: d.title)
+        self.add_script_stub(r"^\s*return\s+(?:window\.)?location\.href", lambda d, *a: d.current_url)
+        self.add_script_stub(r"^\s*return\s+navigator\.userAgent", lambda d, *a: d.user_agent)
+        self.add_script_stub(r"^\s*return\s+document\.documentElement\.outerHTML", lambda d, *a: d.page_source)
+        self.add_script_stub(r"arguments\[0\]\.click\(\)", lambda d, *a: a[0].click())
+
+    def add_script_stub(self, pattern: str, handler: Callable):
+        """
+        Answer scripts matching a regex with `handler(driver, *args)`.
+
+        Later stubs take precedence over earlier ones.
+        """
+        self.script_stubs.insert(0, (re.compile(pattern), handler))
+
+    # Navigation and page state
+
+    def get(self, url: str):
+        url = urljoin(self.current_url, url) if not urlsplit(url).scheme else url
+        if url == "about:blank":
+            html = "<html><head></head><body></body></html>"
+        else:
+            page = self.site.page_for(url)
+            html = page(self, url) if callable(page) else page
+        delay = self.load_delay(url, html)
+        if delay:
+            time.sleep(delay)
+        self.history.append(url)
+        self.current_url = url
+        self.document = parse_document(html)
+        for element in self.document.iter():
+            element.driver = self
+
+    def load_delay(self, url: str, html: str) -> float:
+        """Seconds the navigation to `url`, serving `html`, takes."""
+        return self.latency
+
+    def on_mutation(self, kind: str, element: FakeElement, name: Optional[str] = None,
+                    value: Optional[str] = None):
+        """
+        Called when a page script changes the DOM.
+
+        Args:
+            kind: "a" for an attribute, "t" for a lone text node, "c" for replaced children
+            element: The changed element
+            name: Attribute name, for "a"
+            value: New attribute value (None when removed), for "a"
+        """
+
+    # Tabs. The active tab's state lives on the driver; the others are saved in _tabs.
+
+    _TAB_STATE = ("current_url", "document", "history", "ready_at")
+
+    @property
+    def window_handles(self) -> List[str]:
+        return list(self._tabs)
+
+    def _switch(self, handle: str):
+        if handle not in self._tabs:
+            raise NoSuchWindowException(f"No such window: {handle}")
+        if self.current_window_handle in self._tabs:
+            self._tabs[self.current_window_handle] = {k: getattr(self, k) for k in self._TAB_STATE}
+        for key, value in (self._tabs[handle] or {}).items():
+            setattr(self, key, value)
+        self.current_window_handle = handle
+
+    def _open_tab(self, url: str) -> str:
+        """Open a tab that loads `url` in the background, without switching to it."""
+        self._tab_ids += 1
+        handle = f"tab-{self._tab_ids}"
+        active = self.current_window_handle
+        self._tabs[handle] = None
+        self._switch(handle)
+        self.current_url, self.history = "about:blank", []
+        latency, self.latency = self.latency, 0.0
+        try:
+            self.get(url)
+        finally:
+            self.latency = latency
+        # Loads in other tabs overlap: each is ready `latency` seconds after it started
+        self.ready_at = time.monotonic() + latency
+        if active in self._tabs:
+            self._switch(active)
+        return handle
+
+    def close(self):
+        """Close the active tab; switch to another handle before using the driver again."""
+        self._tabs.pop(self.current_window_handle, None)
+
+    def back(self):
+        if len(self.history) > 1:
+            self.history.pop()
+            self.get(self.history.pop())
+
+    def refresh(self):
+        self.get(self.current_url)
+
+    @property
+    def title(self) -> str:
+        found = find_all(self.document, "tag name", "title")
+        return found[0].text if found else ""
+
+    @property
+    def page_source(self) -> str:
+        return "".join(c if isinstance(c, str) else c.outer_html() for c in self.document.children)
+
+    def find_element(self, by: str, value: str) -> FakeElement:
+        found = find_all(self.document, by, value)
+        if not found:
+            raise NoSuchElementException(f"Unable to locate element: {by}={value}")
+        return found[0]
+
+    def find_elements(self, by: str, value: str) -> List[FakeElement]:
+        return find_all(self.document, by, value)
+
+    def _click(self, element: FakeElement):
+        for by, value, handler in self.site.click_handlers:
+            if any(match is element for match in find_all(self.document, by, value)):
+                handler(self, element)
+                return
+        node = element
+        while node is not None:
+            if node.tag_name == "a" and node.attrs.get("href") and not node.attrs["href"].startswith("javascript:"):
+                self.get(urljoin(self.current_url, node.attrs["href"]))
+                return
+            onclick = node.attrs.get("onclick")
+            if onclick:
+                self._run_inline(onclick)
+                return
+            node = node.parent
+
+    def _run_inline(self, code: str):
+        # Follow the common "location.href = ..." pattern, directly or through a page function
+        target = re.search(r"location(?:\.href)?\s*=\s*['\"]([^'\"]+)['\"]", code)
+        if target is None:
+            call = re.match(r"\s*([\w$]+)\s*\(", code)
+            if call is not None:
+                for script in find_all(self.document, "tag name", "script"):
+                    body = re.search(r"function\s+" + re.escape(call.group(1)) + r"\s*\([^)]*\)\s*\{([^}]*)\}",
+                                     script._raw_text())
+                    if body is not None:
+                        target = re.search(r"location(?:\.href)?\s*=\s*['\"]([^'\"]+)['\"]", body.group(1))
+                        break
+        if target is not None:
+            self.get(urljoin(self.current_url, target.group(1)))
+
+    # Scripts and CDP
+
+    def execute_script(self, script: str, *args):
+        self.executed_scripts.append(script)
+        for pattern, handler in self.script_stubs:
+            if pattern.search(script):
+                return handler(self, *args)
+        return None
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        self.cdp_commands.append((cmd, params))
+        if cmd == "Target.createTarget":
+            return {"targetId": self._open_tab(params.get("url", "about:blank"))}
+        if cmd == "Page.addScriptToEvaluateOnNewDocument":
+            self._script_ids += 1
+            identifier = str(self._script_ids)
+            self._new_document_ids[identifier] = params["source"]
+            self.new_document_scripts.append(params["source"])
+            return {"identifier": identifier}
+        if cmd == "Page.removeScriptToEvaluateOnNewDocument":
+            source = self._new_document_ids.pop(params["identifier"], None)
+            if source is not None:
+                self.new_document_scripts.remove(source)
+        if cmd == "Network.setCookies":
+            for cookie in params.get("cookies", []):
+                cookie = dict(cookie)
+                if "expires" in cookie:
+                    cookie["expiry"] = cookie.pop("expires")
+                if "url" in cookie:
+                    cookie["domain"] = urlsplit(cookie.pop("url")).hostname or ""
+                self.add_cookie(cookie)
+        return {}
+
+    # Cookies
+
+    def get_cookies(self) -> List[dict]:
+        return [dict(cookie) for cookie in self.cookies]
+
+    def get_cookie(self, name: str) -> Optional[dict]:
+        return next((dict(c) for c in self.cookies if c["name"] == name), None)
+
+    def add_cookie(self, cookie_dict: dict):
+        cookie = {"path": "/", "domain": urlsplit(self.current_url).hostname or "", **cookie_dict}
+        self.cookies = [c for c in self.cookies if c["name"] != cookie["name"]] + [cookie]
+
+    def delete_cookie(self, name: str):
+        self.cookies = [c for c in self.cookies if c["name"] != name]
+
+    def delete_all_cookies(self):
+        self.cookies = []
+
+    # Misc
+
+    def save_screenshot(self, filename: str) -> bool:
+        with open(filename, "wb") as f:
+            f.write(_BLANK_PNG)
+        return True
+
+    def get_log(self, log_type: str) -> list:
+        return []
+
+    def set_page_load_timeout(self, timeout: float):
+        pass
+
+    def implicitly_wait(self, timeout: float):
+        pass
+
+    def quit(self):
+        self.document = parse_document("")
@@ -0,0 +1,308 @@
+"""
+Availability History Store
+
+This module keeps an append-only SQLite log of every availability change the
+watchers observe, so we can study when cancellations appear and how quickly
+popular slots are taken. Writes go through a background thread that commits in
+batches, so recording a poll never blocks on disk.
+
+Usage:
+    store = HistoryStore("history.sqlite3")
+    store.observe(states_from_records(records))
+    store.freeups_by_hour(court="3号场")
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+
+FREE = "free"
+TAKEN = "taken"
+# Statuses a slot can be freed from by a cancellation: TAKEN from observe_free(), "booked" from page_parser
+BOOKED_STATUSES = (TAKEN, "booked")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slot_events (
+    id INTEGER PRIMARY KEY,
+    observed_at REAL NOT NULL,
+    observed_hour INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    court TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    previous TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_slot_events_slot ON slot_events (date, court, hour, observed_at);
+CREATE INDEX IF NOT EXISTS idx_slot_events_time ON slot_events (observed_at);
+CREATE INDEX IF NOT EXISTS idx_slot_events_court_hour ON slot_events (court, status, observed_hour);
+"""
+
+Slot = Tuple[str, str, int]
+
+
+def states_from_records(records: Iterable) -> Dict[Slot, str]:
+    """
+    Expand parsed SlotRecords into per-hour slot states.
+
+    Args:
+        records: SlotRecord tuples from page_parser
+
+    Returns:
+        Dictionary mapping (date, court, hour) to status
+    """
+    states = {}
+    for record in records:
+        end_hour = record.end.hour if record.end.hour > record.start.hour else 24
+        for hour in range(record.start.hour, end_hour):
+            states[(record.date, record.court, hour)] = record.status
+    return states
+
+
+class HistoryStore:
+    """
+    Append-only, indexed log of slot status changes backed by SQLite.
+
+    observe() compares a snapshot with the last known state of each slot and
+    queues only the differences; a writer thread inserts them in batches.
+    """
+
+    def __init__(self, path: str = None, batch_size: int = None, flush_interval: float = None):
+        """
+        Open (or create) a history store.
+
+        Args:
+            path: SQLite database file. If None, uses config default
+            batch_size: Events per insert transaction. If None, uses config default
+            flush_interval: Longest time an event waits before being written, in seconds
+        """
+        self.path = path or config.HISTORY_DB
+        self.batch_size = batch_size or config.HISTORY_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else config.HISTORY_FLUSH_INTERVAL
+        self._queue = queue.Queue()
+        self._state: Dict[Slot, str] = {}
+        self._state_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        # Resume from the latest state of every slot so restarts do not log spurious deltas
+        rows = conn.execute(
+            "SELECT e.date, e.court, e.hour, e.status FROM slot_events e "
+            "JOIN (SELECT date, court, hour, MAX(id) AS id FROM slot_events "
+            "GROUP BY date, court, hour) last ON e.id = last.id"
+        )
+        self._state = {(d, c, h): s for d, c, h, s in rows}
+
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _open(self) -> sqlite3.Connection:
+        # Each connection is used by one thread only, but close() closes them all from its own
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection for queries."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            with self._state_lock:
+                self._connections.append(conn)
+        return conn
+
+    def observe(self, states: Dict[Slot, str], observed_at: Optional[float] = None) -> int:
+        """
+        Record a snapshot of slot states, storing only what changed.
+
+        Args:
+            states: Dictionary mapping (date, court, hour) to status
+            observed_at: Unix timestamp of the observation. If None, uses now
+
+        Returns:
+            Number of change events queued
+        """
+        observed_at = observed_at if observed_at is not None else time.time()
+        observed_hour = time.localtime(observed_at).tm_hour
+        events = []
+        with self._state_lock:
+            for slot, status in states.items():
+                previous = self._state.get(slot)
+                if previous != status:
+                    self._state[slot] = status
+                    events.append((observed_at, observed_hour, slot[0], slot[1], slot[2], status, previous))
+        for event in events:
+            self._queue.put(event)
+        return len(events)
+
+    def observe_free(self, cells: Iterable[Slot], dates: Iterable[str],
+                     observed_at: Optional[float] = None) -> int:
+        """
+        Record a snapshot given only the free cells of some dates.
+
+        Slots of those dates that were free before and are missing now are
+        recorded as taken.
+
+        Args:
+            cells: Free (date, court, hour) cells
+            dates: Dates the snapshot covers completely
+            observed_at: Unix timestamp of the observation. If None, uses now
+
+        Returns:
+            Number of change events queued
+        """
+        dates = set(dates)
+        states = {cell: FREE for cell in cells}
+        with self._state_lock:
+            for slot, status in self._state.items():
+                if slot[0] in dates and status == FREE and slot not in states:
+                    states[slot] = TAKEN
+        return self.observe(states, observed_at)
+
+    def _write_loop(self):
+        conn = self._open()
+        try:
+            self._drain(conn)
+        finally:
+            conn.close()
+
+    def _drain(self, conn: sqlite3.Connection):
+        while True:
+            batch = []
+            event = self._queue.get()
+            if event is None:
+                self._queue.task_done()
+                return
+            batch.append(event)
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stop = True
+                    break
+                batch.append(event)
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO slot_events (observed_at, observed_hour, date, court, hour, status, previous) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            except sqlite3.Error as e:
+                print(f"History write failed, dropped {len(batch)} events: {e}")
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every queued event has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Write pending events, stop the writer thread and close every thread's connection."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._state_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+    # Query helpers. They read committed data only; call flush() first to include queued events.
+
+    def events(self, date: Optional[str] = None, court: Optional[str] = None,
+               hour: Optional[int] = None, since: Optional[float] = None,
+               until: Optional[float] = None) -> List[tuple]:
+        """
+        Get raw change events, oldest first.
+
+        Args:
+            date: Only this date
+            court: Only this court
+            hour: Only this slot hour
+            since: Only events observed at or after this Unix timestamp
+            until: Only events observed before this Unix timestamp
+
+        Returns:
+            List of (observed_at, date, court, hour, status, previous) tuples
+        """
+        clauses, params = [], []
+        for column, value in (("date", date), ("court", court), ("hour", hour)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("observed_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("observed_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._connect().execute(
+            f"SELECT observed_at, date, court, hour, status, previous FROM slot_events {where} "
+            "ORDER BY observed_at, id", params).fetchall()
+
+    def freeups_by_hour(self, court: Optional[str] = None) -> Dict[int, int]:
+        """
+        Count free-up events (a taken slot becoming free) per local hour of day.
+
+        Args:
+            court: Only count this court. If None, counts all courts
+
+        Returns:
+            Dictionary mapping hour of day (0-23) to number of free-ups
+        """
+        # Closed or not-yet-released slots opening up are releases, not cancellations
+        sql = ("SELECT observed_hour, COUNT(*) FROM slot_events "
+               "WHERE status = ? AND previous IN (%s)" % ", ".join("?" * len(BOOKED_STATUSES)))
+        params = [FREE, *BOOKED_STATUSES]
+        if court is not None:
+            sql += " AND court = ?"
+            params.append(court)
+        rows = self._connect().execute(sql + " GROUP BY observed_hour", params)
+        return {hour: count for hour, count in rows}
+
+    def free_durations(self, court: Optional[str] = None, since: Optional[float] = None) -> List[tuple]:
+        """
+        Measure how long slots stayed free before being taken.
+
+        Args:
+            court: Only this court. If None, all courts
+            since: Only free periods that started at or after this Unix timestamp
+
+        Returns:
+            List of (date, court, hour, freed_at, seconds_free) tuples
+        """
+        clauses, params = ["status = ?"], [FREE]
+        if court is not None:
+            clauses.append("court = ?")
+            params.append(court)
+        if since is not None:
+            clauses.append("observed_at >= ?")
+            params.append(since)
+        sql = (
+            "SELECT date, court, hour, observed_at, "
+            "(SELECT MIN(n.observed_at) FROM slot_events n WHERE n.date = e.date AND n.court = e.court "
+            " AND n.hour = e.hour AND n.observed_at > e.observed_at AND n.status != ?) - observed_at "
+            f"FROM slot_events e WHERE {' AND '.join(clauses)}"
+        )
+        rows = self._connect().execute(sql, [FREE] + params).fetchall()
+        return [row for row in rows if row[4] is not None]
@@ -0,0 +1,311 @@
+"""
+Browser Memory Governor
+
+This module keeps a long-running WeChatBrowserScraper within a memory budget.
+It periodically samples the resident memory of the whole Chrome process tree
+(through psutil when installed, otherwise /proc) and the page's JS heap and
+DOM size (through CDP Performance.getMetrics). Crossing the trim thresholds
+drains the buffered performance log, drops the back/forward history and asks
+the renderer to collect garbage; crossing the hard limits recycles the
+browser with WeChatBrowserScraper.recycle(), keeping cookies and the current
+URL. Recycling only ever happens while the scraper is idle: work wrapped in
+busy() (a booking, a navigation flow) holds it off until it is done.
+
+Usage:
+    governor = MemoryGovernor(scraper)
+    governor.start()
+    with governor.busy():
+        book_slot(scraper)
+    governor.stop()
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import config
+
+try:
+    import psutil
+except ImportError:  # Optional; /proc is read instead
+    psutil = None
+
+
+def _proc_children() -> Dict[int, list]:
+    children: Dict[int, list] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", encoding="ascii", errors="replace") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces and parentheses; fields resume after the last ")"
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(name))
+    return children
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """
+    Get the resident memory of a process and all its descendants.
+
+    Args:
+        pid: Root process, e.g. chromedriver's (Chrome and its renderers are its children)
+
+    Returns:
+        Bytes, or None if memory cannot be read on this platform
+    """
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    if not os.path.isdir("/proc"):
+        return None
+    children = _proc_children()
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total, stack, seen = 0, [pid], set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/statm", encoding="ascii") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            if current == pid:
+                return None
+        stack.extend(children.get(current, []))
+    return total
+
+
+def browser_pid(driver) -> Optional[int]:
+    """Get the pid of the driver's chromedriver process, or None for drivers without one."""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(process, "pid", None)
+
+
+class MemoryGovernor:
+    """
+    Samples a scraper's memory and trims or recycles the browser when it grows too large.
+    """
+
+    def __init__(
+        self,
+        scraper,
+        rss_trim: float = None,
+        rss_limit: float = None,
+        heap_trim: float = None,
+        heap_limit: float = None,
+        idle_grace: float = None,
+        log_sink: Optional[Callable[[list], None]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the governor.
+
+        Args:
+            scraper: A started WeChatBrowserScraper
+            rss_trim: Process-tree RSS in bytes above which caches are trimmed. If None, uses config default
+            rss_limit: Process-tree RSS in bytes above which the browser is recycled. If None, uses config default
+            heap_trim: JS heap in bytes above which caches are trimmed. If None, uses config default
+            heap_limit: JS heap in bytes above which the browser is recycled. If None, uses config default
+            idle_grace: Seconds after the last busy() block before a recycle may run.
+                If None, uses config default
+            log_sink: Receives performance-log entries drained while trimming, e.g.
+                CacheStats.feed_performance_log. If None, they are discarded
+            clock: Monotonic time source
+        """
+        self.scraper = scraper
+        self.rss_trim = rss_trim or config.MEMORY_RSS_TRIM
+        self.rss_limit = rss_limit or config.MEMORY_RSS_LIMIT
+        self.heap_trim = heap_trim or config.MEMORY_HEAP_TRIM
+        self.heap_limit = heap_limit or config.MEMORY_HEAP_LIMIT
+        self.idle_grace = idle_grace if idle_grace is not None else config.MEMORY_IDLE_GRACE
+        self.log_sink = log_sink
+        self.clock = clock
+        self.last_sample: Dict[str, Optional[float]] = {}
+        self.recycle_pending = False
+        self._busy = 0
+        self._last_busy = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_error = None
+        self._counters = {"samples": 0, "trims": 0, "recycles": 0, "deferred_recycles": 0}
+
+    @contextmanager
+    def busy(self):
+        """
+        Mark work that must not be interrupted by a recycle. Waits for a running recycle first.
+        """
+        with self._lock:
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._busy -= 1
+                self._last_busy = self.clock()
+
+    def idle(self) -> bool:
+        """Check whether no busy() block is running and the grace period has passed."""
+        with self._lock:
+            return self._idle()
+
+    def _idle(self) -> bool:
+        return self._busy == 0 and (self._last_busy is None or self.clock() - self._last_busy >= self.idle_grace)
+
+    def sample(self) -> Dict[str, Optional[float]]:
+        """
+        Measure the browser's memory.
+
+        Returns:
+            Dictionary with rss (process tree, bytes), js_heap and js_heap_total (bytes)
+            and nodes (DOM nodes); values that cannot be measured are None
+        """
+        driver = self.scraper.driver
+        metrics = {}
+        try:
+            driver.execute_cdp_cmd("Performance.enable", {})
+            response = driver.execute_cdp_cmd("Performance.getMetrics", {})
+            metrics = {m["name"]: m["value"] for m in response.get("metrics", [])}
+        except Exception as e:
+            self._last_error = f"Performance.getMetrics: {e}"
+        pid = browser_pid(driver)
+        self.last_sample = {
+            "rss": process_tree_rss(pid) if pid else None,
+            "js_heap": metrics.get("JSHeapUsedSize"),
+            "js_heap_total": metrics.get("JSHeapTotalSize"),
+            "nodes": metrics.get("Nodes"),
+        }
+        self._counters["samples"] += 1
+        return self.last_sample
+
+    def trim(self):
+        """
+        Release memory without restarting: drain the performance log, drop the
+        back/forward history and let the renderer collect garbage.
+        """
+        driver = self.scraper.driver
+        try:
+            entries = driver.get_log("performance")
+            if self.log_sink is not None:
+                self.log_sink(entries)
+        except Exception:
+            pass  # Performance logging not enabled
+        for cmd in ("Page.resetNavigationHistory", "HeapProfiler.collectGarbage"):
+            try:
+                driver.execute_cdp_cmd(cmd, {})
+            except Exception as e:
+                self._last_error = f"{cmd}: {e}"
+        try:
+            driver.execute_cdp_cmd("Memory.simulatePressureNotification", {"level": "critical"})
+        except Exception:
+            pass  # Not available on every Chrome build
+        self._counters["trims"] += 1
+
+    def recycle(self) -> bool:
+        """
+        Recycle the browser if the scraper is idle, otherwise leave it for later.
+
+        Returns:
+            True if the browser was recycled
+        """
+        with self._lock:
+            if not self._idle():
+                self.recycle_pending = True
+                self._counters["deferred_recycles"] += 1
+                return False
+            # Holding the lock keeps busy() callers out until the new browser is up
+            self.scraper.recycle()
+            self.recycle_pending = False
+            self._counters["recycles"] += 1
+            return True
+
+    @staticmethod
+    def _over(value: Optional[float], limit: float) -> bool:
+        return value is not None and value > limit
+
+    def check(self) -> str:
+        """
+        Sample memory and act on it.
+
+        Returns:
+            "recycled", "deferred" (over the limit but busy), "trimmed" or "ok"
+        """
+        if self.scraper.driver is None:
+            return "ok"
+        sample = self.sample()
+        if (self.recycle_pending or self._over(sample["rss"], self.rss_limit)
+                or self._over(sample["js_heap"], self.heap_limit)):
+            if self.recycle():
+                return "recycled"
+            # Trimming buys time until the scraper goes idle
+            self.trim()
+            return "deferred"
+        if self._over(sample["rss"], self.rss_trim) or self._over(sample["js_heap"], self.heap_trim):
+            self.trim()
+            return "trimmed"
+        return "ok"
+
+    def _loop(self, period: float):
+        while not self._stopping.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                self._last_error = str(e)
+            self._stopping.wait(period)
+
+    def start(self, period: float = None):
+        """
+        Run check() on a background thread every `period` seconds.
+
+        Args:
+            period: Seconds between samples. If None, uses config default
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, args=(period or config.MEMORY_SAMPLE_INTERVAL,),
+                                        name="memory-governor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sampling thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def status(self) -> dict:
+        """
+        Get the latest sample and counters.
+
+        Returns:
+            JSON-serializable status dictionary
+        """
+        return {**self.last_sample, "recycle_pending": self.recycle_pending,
+                "last_error": self._last_error, **self._counters}
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.stop()
@@ -0,0 +1,366 @@
+"""
+Learned Navigation Graph
+
+This module learns the vfmc site's navigation graph from recorded runs and
+uses it to skip the click path. A NavRecorder follows a normal run (open the
+entry page, click through to the booking screen) and records every hop: the
+URL before and after, the click or link that made it, the cookies it set and
+how long it took. Marking the page a run was after ("court list for date D")
+turns the recorded URLs into templates with the goal's parameters as
+placeholders.
+
+A Navigator then opens the goal's URL directly when the cookies the click
+path would have set are present, restoring the saved session (COOKIE_FILE)
+into a fresh browser first, verifies it arrived, and falls back to walking
+the learned click path only when the direct link fails or redirects. Each call
+reports the navigations and wall time saved against the learned click path.
+
+Usage:
+    graph = NavigationGraph.load()
+    recorder = NavRecorder(scraper, graph)
+    recorder.open_url(config.VFMC_ENTRY_URL)
+    recorder.click(By.XPATH, config.VFMC_LOGIN_XPATH)
+    ...
+    recorder.mark("court_list", date="2026-10-20")
+    graph.save()
+
+    report = Navigator(scraper, graph).goto("court_list", date="2026-10-21")
+    print(report.saved_navigations, report.saved_seconds)
+"""
+
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import config
+from page_parser import classify_page
+from startup import load_saved_cookies
+from wechat_bootstrap import FALLBACK_KINDS
+
+START = ""  # Node every run starts from, before its first navigation
+
+
+class NavigationError(RuntimeError):
+    """Raised when neither the direct link nor the click path reaches a goal."""
+
+
+def url_template(url: str, params: Optional[Dict[str, str]] = None) -> str:
+    """
+    Turn a URL into a template by replacing parameter values with {name} placeholders.
+
+    Query parameters are sorted so that equivalent URLs share one template.
+
+    Args:
+        url: The URL as visited
+        params: Goal parameters, e.g. {"date": "2026-10-20"}
+
+    Returns:
+        The template, e.g. "http://host/List.html?date={date}"
+    """
+    values = {str(v): k for k, v in (params or {}).items()}
+    parts = urlsplit(url)
+    path = "/".join("{%s}" % values[s] if s in values else s.replace("{", "{{").replace("}", "}}")
+                    for s in parts.path.split("/"))
+    query = []
+    for key, value in sorted(parse_qsl(parts.query, keep_blank_values=True)):
+        if value in values:
+            query.append(f"{key}={{{values[value]}}}")
+        else:
+            query.append(urlencode({key: value}).replace("{", "{{").replace("}", "}}"))
+    return urlunsplit((parts.scheme, parts.netloc, path, "&".join(query), ""))
+
+
+class NavReport(NamedTuple):
+    """Outcome of one Navigator.goto() call."""
+
+    goal: str
+    url: str
+    direct: bool
+    navigations: int
+    seconds: float
+    saved_navigations: int
+    saved_seconds: float
+
+
+class NavigationGraph:
+    """
+    Pages (URL templates) and the hops between them, learned from recorded runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize an empty graph.
+
+        Args:
+            path: JSON file the graph is saved to. If None, uses config default
+        """
+        self.path = path or config.NAV_GRAPH_FILE
+        self.edges: Dict[str, dict] = {}
+        self.goals: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "NavigationGraph":
+        """
+        Load a saved graph, or start an empty one if the file does not exist.
+
+        Args:
+            path: JSON file. If None, uses config default
+        """
+        graph = cls(path)
+        if os.path.exists(graph.path):
+            with open(graph.path, encoding="utf-8") as f:
+                data = json.load(f)
+            graph.edges = data.get("edges", {})
+            graph.goals = data.get("goals", {})
+        return graph
+
+    def save(self):
+        """Write the graph to its file atomically."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"edges": self.edges, "goals": self.goals}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def add_run(self, steps: List[dict], goal: str, params: Dict[str, str]):
+        """
+        Merge a recorded run into the graph.
+
+        Args:
+            steps: Hops as recorded by NavRecorder
+            goal: Name of the page the run ended on
+            params: Parameter values of that page, e.g. {"date": "2026-10-20"}
+        """
+        for step in steps:
+            src = url_template(step["src"], params) if step["src"] else START
+            dst = url_template(step["dst"], params)
+            target = step["value"] if step["action"] == "click" else dst
+            key = f"{src} {step['action']} {step['by'] or ''} {target}"
+            edge = self.edges.setdefault(key, {
+                "src": src, "dst": dst, "action": step["action"], "by": step["by"], "value": target,
+                "cookies": [], "count": 0, "failures": 0, "seconds": 0.0,
+            })
+            edge["dst"] = dst
+            edge["cookies"] = sorted(set(edge["cookies"]) | set(step["cookies"]))
+            # Running mean of the hop's duration
+            edge["count"] += 1
+            edge["seconds"] += (step["seconds"] - edge["seconds"]) / edge["count"]
+        if steps:
+            self.goals[goal] = {"template": url_template(steps[-1]["dst"], params), "params": sorted(params)}
+
+    def path_to(self, goal: str) -> List[dict]:
+        """
+        Find the shortest learned click path from the start to a goal.
+
+        Args:
+            goal: Goal name
+
+        Returns:
+            The edges to follow, in order
+        """
+        target = self.goals[goal]["template"]
+        outgoing: Dict[str, List[dict]] = {}
+        for edge in self.edges.values():
+            outgoing.setdefault(edge["src"], []).append(edge)
+        previous = {START: None}
+        queue = deque([START])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                break
+            # Prefer hops that have worked before
+            for edge in sorted(outgoing.get(node, []), key=lambda e: e["failures"] - e["count"]):
+                if edge["dst"] not in previous:
+                    previous[edge["dst"]] = edge
+                    queue.append(edge["dst"])
+        if target not in previous:
+            raise NavigationError(f"No recorded path to {goal}")
+        path = []
+        node = target
+        while previous[node] is not None:
+            path.append(previous[node])
+            node = previous[node]["src"]
+        return path[::-1]
+
+    @staticmethod
+    def cookies_along(path: List[dict]) -> Set[str]:
+        """Get the names of the cookies the hops of a path set."""
+        return {name for edge in path for name in edge["cookies"]}
+
+
+class NavRecorder:
+    """
+    Drives a scraper through a run and records each hop for the graph.
+    """
+
+    def __init__(self, scraper, graph: NavigationGraph):
+        """
+        Initialize the recorder.
+
+        Args:
+            scraper: A started WeChatBrowserScraper
+            graph: Graph the run is merged into when it is marked
+        """
+        self.scraper = scraper
+        self.graph = graph
+        self.steps: List[dict] = []
+
+    def _record(self, action: str, by: Optional[str], value: Optional[str], navigate):
+        driver = self.scraper.driver
+        src = driver.current_url if self.steps else ""
+        before = {c["name"] for c in driver.get_cookies()}
+        started = time.monotonic()
+        navigate()
+        _wait_ready(self.scraper)
+        self.steps.append({
+            "src": src, "dst": driver.current_url, "action": action, "by": by, "value": value,
+            "cookies": sorted({c["name"] for c in driver.get_cookies()} - before),
+            "seconds": time.monotonic() - started,
+        })
+
+    def open_url(self, url: str):
+        """Navigate to a URL and record the hop."""
+        self._record("get", None, None, lambda: self.scraper.open_url(url))
+
+    def click(self, by: str, value: str):
+        """Click an element and record the hop it triggers."""
+        self._record("click", by, value, lambda: self.scraper.wait_for_element_clickable(by, value).click())
+
+    def mark(self, goal: str, **params):
+        """
+        Name the page the run has reached and merge the run into the graph.
+
+        Args:
+            goal: Goal name, e.g. "court_list"
+            **params: Values in the URL that vary per visit, e.g. date="2026-10-20"
+        """
+        self.graph.add_run(self.steps, goal, {k: str(v) for k, v in params.items()})
+
+
+def _wait_ready(scraper, timeout: float = None):
+    deadline = time.monotonic() + (timeout or scraper.timeout)
+    while (scraper.execute_script("return document.readyState") != "complete"
+           and time.monotonic() < deadline):
+        time.sleep(0.02)
+
+
+class Navigator:
+    """
+    Reaches learned goals by direct link, falling back to the learned click path.
+    """
+
+    def __init__(self, scraper, graph: NavigationGraph, cookie_file: Optional[str] = None):
+        """
+        Initialize the navigator.
+
+        Args:
+            scraper: A started WeChatBrowserScraper
+            graph: Learned navigation graph
+            cookie_file: Saved session cookies, restored when the browser lacks them. If None, uses config default
+        """
+        self.scraper = scraper
+        self.graph = graph
+        self.cookie_file = cookie_file or config.COOKIE_FILE
+        self.reports: List[NavReport] = []
+
+    def _restore_cookies(self, url: str) -> Set[str]:
+        # A freshly started browser has no cookies; the last run's saved session may still be good
+        try:
+            saved = load_saved_cookies(self.cookie_file)
+            if saved:
+                self.scraper.set_cookies(saved, url=url)
+        except Exception as e:
+            print(f"Could not restore saved cookies: {e}")
+        return {c["name"] for c in self.scraper.get_cookies()}
+
+    def _arrived(self, url: str) -> bool:
+        current, wanted = urlsplit(self.scraper.driver.current_url), urlsplit(url)
+        if (current.netloc, current.path) != (wanted.netloc, wanted.path):
+            return False
+        if not set(parse_qsl(wanted.query)) <= set(parse_qsl(current.query)):
+            return False
+        kind = classify_page(self.scraper.get_page_source())
+        # Landing on the user-type page means the server sent us back to log in
+        return kind not in FALLBACK_KINDS and (kind != "user_choose" or "UserChoose" in wanted.path)
+
+    def _walk(self, path: List[dict], url: str, params: dict) -> int:
+        navigations = 0
+        for edge in path:
+            try:
+                if edge["action"] == "click":
+                    self.scraper.wait_for_element_clickable(edge["by"], edge["value"]).click()
+                else:
+                    self.scraper.open_url(edge["value"].format(**params))
+            except Exception:
+                # Persist the failure so later runs stop preferring this hop
+                edge["failures"] += 1
+                self.graph.save()
+                raise
+            navigations += 1
+            _wait_ready(self.scraper)
+        if not self._arrived(url):
+            # The recorded clicks lead to the recorded parameters; finish on the requested ones
+            self.scraper.open_url(url)
+            _wait_ready(self.scraper)
+            navigations += 1
+        return navigations
+
+    def goto(self, goal: str, **params) -> NavReport:
+        """
+        Navigate to a goal page.
+
+        Args:
+            goal: Goal name recorded with NavRecorder.mark()
+            **params: The goal's parameters, e.g. date="2026-10-21"
+
+        Returns:
+            NavReport with the navigations and time saved against the click path
+        """
+        if goal not in self.graph.goals:
+            raise NavigationError(f"Unknown goal {goal}; record a run to it first")
+        url = self.graph.goals[goal]["template"].format(**params)
+        path = self.graph.path_to(goal)
+        started = time.monotonic()
+        navigations = 0
+        direct = False
+
+        # A direct link only works with the state the click path would have set up
+        needed = self.graph.cookies_along(path)
+        have = {c["name"] for c in self.scraper.get_cookies()}
+        if not needed <= have:
+            have = self._restore_cookies(url)
+        if needed <= have:
+            navigations += 1
+            try:
+                self.scraper.open_url(url)
+                _wait_ready(self.scraper)
+                direct = self._arrived(url)
+            except Exception as e:
+                print(f"Direct link to {goal} failed: {e}")
+        if not direct:
+            navigations += self._walk(path, url, params)
+            if not self._arrived(url):
+                raise NavigationError(f"Could not reach {goal} at {url}")
+
+        seconds = time.monotonic() - started
+        baseline = sum(edge["seconds"] for edge in path)
+        report = NavReport(goal, url, direct, navigations, seconds,
+                           saved_navigations=len(path) - navigations, saved_seconds=baseline - seconds)
+        self.reports.append(report)
+        return report
+
+    def summary(self) -> dict:
+        """
+        Totals over every goto() call so far.
+
+        Returns:
+            Dictionary with runs, direct hits, navigations and seconds saved
+        """
+        return {
+            "runs": len(self.reports),
+            "direct": sum(r.direct for r in self.reports),
+            "saved_navigations": sum(r.saved_navigations for r in self.reports),
+            "saved_seconds": round(sum(r.saved_seconds for r in self.reports), 3),
+        }
@@ -0,0 +1,297 @@
+"""
+Network Condition Emulation
+
+This module applies latency, bandwidth and packet-loss profiles to both
+clients the booking flow uses, so the flow can be measured under conditions
+like the campus network at release time instead of whatever network the
+machine happens to be on. The browser is throttled with CDP
+Network.emulateNetworkConditions; HTTP clients are routed through a local
+ThrottlingProxy, a forwarding proxy that delays, rate-limits and (by charging
+a retransmission timeout) "loses" the bytes passing through it.
+
+Profiles are configured in config.NETWORK_PROFILES, loaded from a JSON file
+of recorded conditions, or given on the command line as
+"name:latency_ms:down_kbps:up_kbps:loss".
+
+Usage:
+    profile = get_profile("campus_release")
+    apply_browser_profile(scraper.driver, profile)
+    with ThrottlingProxy(profile) as proxy:
+        client.session.proxies = proxy.proxies
+        client.get(url)
+"""
+
+import json
+import random
+import select
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import config
+
+
+class NetworkProfile(NamedTuple):
+    """A network condition: round-trip latency, bandwidth in kilobits/s and packet loss ratio."""
+
+    name: str
+    latency: float
+    down_kbps: float
+    up_kbps: float
+    loss: float = 0.0
+
+
+def parse_profile(spec: str) -> NetworkProfile:
+    """
+    Parse a "name:latency_ms:down_kbps:up_kbps[:loss]" profile specification.
+
+    Args:
+        spec: The specification, e.g. "dorm:120:2000:500:0.01"
+
+    Returns:
+        The profile
+    """
+    parts = spec.split(":")
+    if len(parts) not in (4, 5):
+        raise ValueError(f"Expected name:latency_ms:down_kbps:up_kbps[:loss], got {spec!r}")
+    return NetworkProfile(parts[0], *(float(p) for p in parts[1:]))
+
+
+def load_profiles(path: Optional[str] = None) -> Dict[str, NetworkProfile]:
+    """
+    Load profiles from config and, optionally, a JSON file of recorded conditions.
+
+    Args:
+        path: JSON file mapping names to {"latency", "down_kbps", "up_kbps", "loss"}
+
+    Returns:
+        Mapping of name to profile; file entries override config ones
+    """
+    profiles = dict(config.NETWORK_PROFILES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            profiles.update(json.load(f))
+    return {name: NetworkProfile(name, float(p["latency"]), float(p["down_kbps"]), float(p["up_kbps"]),
+                                 float(p.get("loss", 0.0)))
+            for name, p in profiles.items()}
+
+
+def get_profile(name: str, path: Optional[str] = None) -> NetworkProfile:
+    """Look up a profile by name, or parse it if it is a full specification."""
+    if ":" in name:
+        return parse_profile(name)
+    profiles = load_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"Unknown network profile {name!r}; known: {', '.join(profiles)}")
+    return profiles[name]
+
+
+def apply_browser_profile(driver, profile: Optional[NetworkProfile]):
+    """
+    Throttle a Selenium driver with Network.emulateNetworkConditions.
+
+    Args:
+        driver: Chrome WebDriver
+        profile: The conditions, or None to remove throttling
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    if profile is None:
+        params = {"offline": False, "latency": 0, "downloadThroughput": -1, "uploadThroughput": -1}
+    else:
+        params = {"offline": False, "latency": profile.latency,
+                  "downloadThroughput": profile.down_kbps * 1000 / 8,
+                  "uploadThroughput": profile.up_kbps * 1000 / 8}
+        if profile.loss:
+            # Only honoured by recent Chrome versions; older ones ignore it
+            params["packetLoss"] = profile.loss * 100
+    driver.execute_cdp_cmd("Network.emulateNetworkConditions", params)
+
+
+class _Pipe:
+    """
+    Delivers chunks from one socket to another after a one-way delay, at a limited rate.
+    """
+
+    def __init__(self, dst: socket.socket, one_way: float, bytes_per_s: float, loss: float, rto: float):
+        self.dst = dst
+        self.one_way = one_way
+        self.bytes_per_s = bytes_per_s
+        self.loss = loss
+        self.rto = rto
+        self.queue = deque()
+        self.ready = threading.Condition()
+        self.closed = False
+        self.last_delivery = 0.0
+        self.thread = threading.Thread(target=self._deliver, daemon=True)
+        self.thread.start()
+
+    def push(self, data: bytes):
+        now = time.monotonic()
+        # Serialization: a chunk cannot finish before the previous one plus its own transfer time
+        at = max(now + self.one_way, self.last_delivery) + len(data) / self.bytes_per_s
+        if self.loss and random.random() < self.loss:
+            at += self.rto
+        self.last_delivery = at
+        with self.ready:
+            self.queue.append((at, data))
+            self.ready.notify()
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+
+    def _deliver(self):
+        while True:
+            with self.ready:
+                while not self.queue and not self.closed:
+                    self.ready.wait()
+                if not self.queue:
+                    break
+                at, data = self.queue.popleft()
+            delay = at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.dst.sendall(data)
+            except OSError:
+                break
+        try:
+            self.dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+class _ProxyHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        proxy: "ThrottlingProxy" = self.server.proxy
+        client = self.request
+        head = b""
+        while b"\r\n\r\n" not in head:
+            chunk = client.recv(65536)
+            if not chunk:
+                return
+            head += chunk
+        line, rest = head.split(b"\r\n", 1)
+        method, target, version = line.decode("latin-1").split(" ", 2)
+        if method == "CONNECT":
+            host, _, port = target.rpartition(":")
+            upstream = socket.create_connection((host, int(port)), timeout=proxy.connect_timeout)
+            client.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            initial = head.split(b"\r\n\r\n", 1)[1]
+        else:
+            parts = urlsplit(target)
+            upstream = socket.create_connection((parts.hostname, parts.port or 80), timeout=proxy.connect_timeout)
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            initial = f"{method} {path} {version}\r\n".encode("latin-1") + rest
+        # The whole connection is forwarded to the first request's host
+        upstream.settimeout(None)
+        for sock in (client, upstream):
+            # Delays come from the profile only, not from Nagle's algorithm
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        proxy.forward(client, upstream, initial)
+
+
+class _ProxyServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ThrottlingProxy:
+    """
+    A local HTTP forwarding proxy (plain requests and CONNECT tunnels) that applies a NetworkProfile.
+    """
+
+    def __init__(self, profile: NetworkProfile, host: str = "127.0.0.1", port: int = 0,
+                 connect_timeout: float = 10.0):
+        """
+        Initialize the proxy.
+
+        Args:
+            profile: Conditions applied to every connection
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+            connect_timeout: Seconds to wait when connecting upstream
+        """
+        self.profile = profile
+        self.connect_timeout = connect_timeout
+        self.server = _ProxyServer((host, port), _ProxyHandler)
+        self.server.proxy = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def proxies(self) -> dict:
+        """Proxy mapping for requests.Session.proxies."""
+        return {"http": self.url, "https": self.url}
+
+    def forward(self, client: socket.socket, upstream: socket.socket, initial: bytes = b""):
+        """
+        Relay both directions of a connection through the profile until either side closes.
+
+        Args:
+            client: Socket of the proxied client
+            upstream: Socket of the server
+            initial: Bytes already read from the client that must go upstream first
+        """
+        p = self.profile
+        one_way = p.latency / 2000
+        rto = max(0.2, 2 * p.latency / 1000)
+        pipes = {
+            client: _Pipe(upstream, one_way, p.up_kbps * 1000 / 8, p.loss, rto),
+            upstream: _Pipe(client, one_way, p.down_kbps * 1000 / 8, p.loss, rto),
+        }
+        if initial:
+            pipes[client].push(initial)
+        open_sockets = [client, upstream]
+        quickack = getattr(socket, "TCP_QUICKACK", None)
+        try:
+            while open_sockets:
+                readable, _, _ = select.select(open_sockets, [], [], 1.0)
+                for sock in readable:
+                    try:
+                        data = sock.recv(65536)
+                        if quickack is not None:
+                            # Acknowledge at once so a client's Nagle wait does not add a delayed-ACK stall
+                            sock.setsockopt(socket.IPPROTO_TCP, quickack, 1)
+                    except OSError:
+                        data = b""
+                    if data:
+                        pipes[sock].push(data)
+                    else:
+                        open_sockets.remove(sock)
+                        pipes[sock].close()
+        finally:
+            for pipe in pipes.values():
+                pipe.close()
+                pipe.thread.join(timeout=5)
+            upstream.close()
+
+    def start(self) -> "ThrottlingProxy":
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="throttling-proxy", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop serving."""
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread = None
+        self.server.server_close()
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
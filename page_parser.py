@@ -0,0 +1,449 @@
+"""
+Offline vfmc Page Parser
+
+This module turns saved or freshly fetched vfmc pages into typed slot records
+without a browser. HTML is scanned in a single pass with precompiled tag and
+attribute regexes, matching each start tag against precompiled selectors; JSON
+court lists are read through a table of known field aliases.
+
+Usage:
+    from page_parser import parse_page
+    records = parse_page(open("debug_wechat/page_source.html", encoding="utf-8").read())
+"""
+
+import datetime
+import html
+import json
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+FREE = "free"
+BOOKED = "booked"
+CLOSED = "closed"
+UNKNOWN = "unknown"
+
+
+class SlotRecord(NamedTuple):
+    """One court time slot."""
+
+    court: str
+    date: Optional[str]
+    start: datetime.time
+    end: datetime.time
+    status: str
+    price: Optional[float]
+
+
+class Selector:
+    """
+    A precompiled tag/class/attribute selector, e.g. "td.slot[data-court]".
+
+    Only the subset of CSS needed for slot cells is supported: an optional tag,
+    any number of .classes and [attribute] presence checks.
+    """
+
+    _PATTERN = re.compile(r"^(?P<tag>[a-zA-Z0-9]*)(?P<rest>(?:\.[\w-]+|\[[\w-]+\])*)$")
+
+    def __init__(self, selector: str):
+        match = self._PATTERN.match(selector.strip())
+        if match is None:
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        self.text = selector
+        self.tag = match.group("tag").lower() or None
+        rest = match.group("rest")
+        self.classes = frozenset(re.findall(r"\.([\w-]+)", rest))
+        self.attrs = tuple(re.findall(r"\[([\w-]+)\]", rest))
+
+    def matches(self, tag: str, attrs: dict, classes: frozenset) -> bool:
+        if self.tag is not None and tag != self.tag:
+            return False
+        if not self.classes <= classes:
+            return False
+        for name in self.attrs:
+            if name not in attrs:
+                return False
+        return True
+
+
+class SelectorSet:
+    """
+    Selectors indexed by tag, so each start tag is only tested against the
+    selectors that could possibly match it.
+    """
+
+    def __init__(self, selectors: Sequence[Selector]):
+        self.selectors = tuple(selectors)
+        untagged = tuple(s for s in self.selectors if s.tag is None)
+        self._by_tag = {}
+        for selector in self.selectors:
+            if selector.tag is not None:
+                self._by_tag.setdefault(selector.tag, [])
+        for tag in self._by_tag:
+            self._by_tag[tag] = tuple(s for s in self.selectors if s.tag in (None, tag))
+        self._untagged = untagged
+
+    def match(self, tag: str, attrs: dict, classes: frozenset) -> Optional[Selector]:
+        """Return the first selector matching the element, or None."""
+        for selector in self._by_tag.get(tag, self._untagged):
+            if selector.matches(tag, attrs, classes):
+                return selector
+        return None
+
+
+# Elements that describe one slot. The first three cover the data-* markup the
+# booking grid uses; the class-based ones match the plain table rendering.
+SLOT_SELECTORS = SelectorSet([Selector(s) for s in (
+    "[data-court]",
+    "[data-courtname]",
+    "[data-fieldname]",
+    "td.slot",
+    "div.slot",
+    "li.slot",
+)])
+
+# Attribute aliases for each record field, checked in order
+ATTR_ALIASES = {
+    "court": ("data-court", "data-courtname", "data-fieldname", "data-field"),
+    "date": ("data-date", "data-day"),
+    "time": ("data-time", "data-period"),
+    "start": ("data-start", "data-begintime", "data-starttime"),
+    "end": ("data-end", "data-endtime"),
+    "status": ("data-status", "data-state"),
+    "price": ("data-price", "data-money", "data-fee"),
+}
+
+# JSON key aliases, matched case-insensitively
+JSON_ALIASES = {
+    "court": ("court", "courtname", "fieldname", "field", "venue", "cdmc", "changdi"),
+    "date": ("date", "day", "bookdate", "rq"),
+    "time": ("time", "period", "timespan", "sjd"),
+    "start": ("start", "starttime", "begintime", "kssj"),
+    "end": ("end", "endtime", "jssj"),
+    "status": ("status", "state", "zt"),
+    "price": ("price", "money", "fee", "jg"),
+}
+
+# Status words and CSS classes, mapped to normalized statuses
+STATUS_WORDS = {
+    FREE: ("free", "available", "open", "idle", "kx", "可预约", "可预订", "空闲"),
+    BOOKED: ("booked", "full", "reserved", "taken", "yd", "已预约", "已预订", "已满"),
+    CLOSED: ("closed", "disabled", "locked", "past", "不可预约", "关闭", "已过期"),
+}
+_STATUS_LOOKUP = {word: status for status, words in STATUS_WORDS.items() for word in words}
+
+# Numeric status codes; only trusted in a status field, never in free text where numbers are counts or courts
+STATUS_CODES = {"0": FREE, "1": BOOKED, "2": CLOSED}
+
+_TIME_RANGE = re.compile(r"(\d{1,2})[:：](\d{2})\s*[-~至到]\s*(\d{1,2})[:：](\d{2})")
+_TIME = re.compile(r"(\d{1,2})(?:[:：](\d{2}))?")
+_PRICE = re.compile(r"(?:¥|￥|元|price)?\s*(\d+(?:\.\d+)?)\s*(?:元)?")
+_PRICE_TEXT = re.compile(r"[¥￥]\s*(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*元")
+_DATE = re.compile(r"(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})")
+_DATE_COMPACT = re.compile(r"(?<!\d)(\d{4})(\d{2})(\d{2})(?!\d)")
+_DATE_DOTNET = re.compile(r"/Date\((-?\d+)(?:([+-])(\d{2})(\d{2}))?")  # ASP.NET JSON: /Date(1760889600000+0800)/
+
+# Tag scanner; comments are matched whole so tags inside them are skipped
+_TAG = re.compile(r"<(?:!--.*?-->|!.*?>|(/?)([a-zA-Z][\w:-]*)([^>]*)>)", re.S)
+_ATTR = re.compile(r"([^\s=/>\"']+)(?:\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>\"']+)))?")
+_RAW_TEXT_TAGS = frozenset(("script", "style", "textarea", "title"))
+_RAW_TEXT_END = {tag: re.compile(r"</%s\s*>" % tag, re.I) for tag in _RAW_TEXT_TAGS}
+_VOID_TAGS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input",
+                        "link", "meta", "source", "track", "wbr"))
+
+# Markers of the known non-grid pages
+PAGE_MARKERS = (
+    ("wechat_block", "请在微信客户端打开链接"),
+    ("browser_error", "ERR_BLOCKED_BY_CLIENT"),
+    ("browser_error", 'id="main-frame-error"'),
+    ("user_choose", "用户类型选择"),
+)
+
+
+@lru_cache(maxsize=4096, typed=True)
+def _parse_time(value) -> Optional[datetime.time]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.time(int(value) % 24)
+    match = _TIME.search(str(value))
+    if match is None:
+        return None
+    return datetime.time(int(match.group(1)) % 24, int(match.group(2) or 0))
+
+
+@lru_cache(maxsize=4096)
+def _parse_time_range(value: str):
+    match = _TIME_RANGE.search(value)
+    if match is None:
+        return None
+    h1, m1, h2, m2 = (int(g) for g in match.groups())
+    return datetime.time(h1 % 24, m1), datetime.time(h2 % 24, m2)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(value) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value)
+    match = _DATE_DOTNET.search(text)
+    if match is not None:
+        # The date is the one at the stated offset, not in the local time zone; no offset means UTC
+        ms, sign, hh, mm = match.groups()
+        offset = datetime.timedelta(hours=int(hh or 0), minutes=int(mm or 0)) * (-1 if sign == "-" else 1)
+        return datetime.datetime.fromtimestamp(int(ms) / 1000, datetime.timezone(offset)).date().isoformat()
+    match = _DATE.search(text) or _DATE_COMPACT.search(text)
+    if match is None:
+        return None
+    try:
+        return datetime.date(*(int(g) for g in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096, typed=True)
+def _parse_price(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _PRICE.search(str(value))
+    return float(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=4096, typed=True)
+def _parse_status(field, *texts) -> str:
+    if isinstance(field, bool):
+        return FREE if field else BOOKED
+    if field is not None:
+        code = STATUS_CODES.get(str(field).strip())
+        if code is not None:
+            return code
+    for value in (field,) + texts:
+        if value is None:
+            continue
+        for word in re.split(r"\s+", str(value).strip().lower()):
+            status = _STATUS_LOOKUP.get(word)
+            if status is not None:
+                return status
+    return UNKNOWN
+
+
+def _build_record(fields: dict, text: str = "", classes: Iterable[str] = (),
+                  default_date: Optional[str] = None) -> Optional[SlotRecord]:
+    start = _parse_time(fields.get("start"))
+    end = _parse_time(fields.get("end"))
+    if start is None or end is None:
+        time_range = _parse_time_range(str(fields.get("time") or text))
+        if time_range is None:
+            return None
+        start, end = time_range
+    court = fields.get("court")
+    if court is None:
+        return None
+    status = _parse_status(fields.get("status"), " ".join(sorted(classes)), text)
+    date = fields.get("date") or default_date
+    if date is not None:
+        # A row whose date cannot be read would be filed under the wrong day; drop it
+        date = _parse_date(date)
+        if date is None:
+            return None
+    price = _parse_price(fields.get("price"))
+    if price is None and text:
+        match = _PRICE_TEXT.search(text)
+        if match is not None:
+            price = float(match.group(1) or match.group(2))
+    return SlotRecord(str(court).strip(), date, start, end, status, price)
+
+
+def _parse_attrs(raw: str) -> dict:
+    attrs = {}
+    for name, dq, sq, bare in _ATTR.findall(raw):
+        value = dq or sq or bare
+        attrs[name.lower()] = html.unescape(value) if "&" in value else value
+    return attrs
+
+
+def _scan_slots(text: str, selectors: SelectorSet,
+                default_date: Optional[str]) -> List[SlotRecord]:
+    """Single-pass tag scan collecting slot elements and their text."""
+    records: List[SlotRecord] = []
+    # Open slot elements as [tag, fields, classes, text parts, nesting depth, has child slots]
+    open_slots = []
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = _TAG.search(text, pos)
+        if match is None:
+            break
+        if open_slots and match.start() > pos:
+            open_slots[-1][3].append(text[pos:match.start()])
+        pos = match.end()
+        closing, tag, raw = match.group(1, 2, 3)
+        if tag is None:
+            continue
+        tag = tag.lower()
+
+        if closing:
+            if not open_slots or tag != open_slots[-1][0]:
+                continue
+            entry = open_slots[-1]
+            if entry[4]:
+                entry[4] -= 1
+                continue
+            open_slots.pop()
+            _, fields, classes, parts, _, has_children = entry
+            content = " ".join(html.unescape("".join(parts)).split())
+            if open_slots:
+                open_slots[-1][3].append(" " + content + " ")
+            # A row that contained slot cells is a container, not a slot itself
+            if not has_children:
+                record = _build_record(fields, content, classes, default_date)
+                if record is not None:
+                    records.append(record)
+            continue
+
+        if tag in _RAW_TEXT_TAGS:
+            end = _RAW_TEXT_END[tag].search(text, pos)
+            pos = end.end() if end else length
+            continue
+        if tag in _VOID_TAGS or raw.endswith("/"):
+            continue
+        if open_slots and tag == open_slots[-1][0]:
+            open_slots[-1][4] += 1
+
+        attrs = _parse_attrs(raw) if raw else {}
+        classes = frozenset(attrs.get("class", "").split())
+        if selectors.match(tag, attrs, classes) is None:
+            continue
+        fields = {}
+        for field, names in ATTR_ALIASES.items():
+            for name in names:
+                if name in attrs:
+                    fields[field] = attrs[name]
+                    break
+        if open_slots:
+            parent = open_slots[-1]
+            parent[4] -= tag == parent[0]
+            parent[5] = True
+            # Slots inside a court row inherit the row's court and date
+            for field in ("court", "date"):
+                if field not in fields and field in parent[1]:
+                    fields[field] = parent[1][field]
+        open_slots.append([tag, fields, classes, [], 0, False])
+    return records
+
+
+def classify_page(text: str) -> str:
+    """
+    Identify which kind of vfmc page a document is.
+
+    Args:
+        text: Page HTML or response body
+
+    Returns:
+        One of "wechat_block", "browser_error", "user_choose", "json" or "unknown"
+    """
+    head = text.lstrip()[:1]
+    if head in ("{", "["):
+        return "json"
+    for kind, marker in PAGE_MARKERS:
+        if marker in text:
+            return kind
+    return "unknown"
+
+
+def parse_html(text: str, default_date: Optional[str] = None,
+               selectors: SelectorSet = SLOT_SELECTORS) -> List[SlotRecord]:
+    """
+    Parse slot records out of an HTML page.
+
+    Args:
+        text: The page HTML
+        default_date: Date to use for slots that do not carry their own
+        selectors: Precompiled selectors matching slot elements
+
+    Returns:
+        List of SlotRecord in document order
+    """
+    return _scan_slots(text, selectors, default_date)
+
+
+def _json_rows(data):
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in ("data", "rows", "list", "items", "result", "Data", "Rows", "List"):
+            if key in data:
+                return _json_rows(data[key])
+    return []
+
+
+def parse_json(data, default_date: Optional[str] = None) -> List[SlotRecord]:
+    """
+    Parse slot records out of a JSON court list.
+
+    Args:
+        data: JSON text or an already decoded object
+        default_date: Date to use for rows that do not carry their own
+
+    Returns:
+        List of SlotRecord
+    """
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    records = []
+    for row in _json_rows(data):
+        if not isinstance(row, dict):
+            continue
+        lowered = {str(k).lower(): v for k, v in row.items()}
+        fields = {}
+        for field, names in JSON_ALIASES.items():
+            for name in names:
+                value = lowered.get(name)
+                if value is not None and not isinstance(value, (list, dict)):
+                    fields[field] = value
+                    break
+        record = _build_record(fields, default_date=default_date)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def parse_page(text: str, default_date: Optional[str] = None) -> List[SlotRecord]:
+    """
+    Parse slot records from either an HTML page or a JSON response body.
+
+    Args:
+        text: Page HTML or JSON text
+        default_date: Date to use for slots that do not carry their own
+
+    Returns:
+        List of SlotRecord; empty for pages without a court grid
+    """
+    kind = classify_page(text)
+    if kind == "json":
+        return parse_json(text, default_date)
+    if kind != "unknown":
+        return []
+    return parse_html(text, default_date)
+
+
+def free_cells(records: Iterable[SlotRecord]) -> List[tuple]:
+    """
+    Expand free slots into (date, court, hour) cells for the booking planner.
+
+    Args:
+        records: Slot records
+
+    Returns:
+        List of (date, court, hour) tuples, one per free hour
+    """
+    cells = []
+    for record in records:
+        if record.status != FREE:
+            continue
+        end_hour = record.end.hour if record.end.hour > record.start.hour else 24
+        for hour in range(record.start.hour, end_hour):
+            cells.append((record.date, record.court, hour))
+    return cells
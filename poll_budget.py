@@ -0,0 +1,403 @@
+"""
+History-Driven Polling Budget
+
+This module learns how often each (day offset, court, hour) slot frees up, and
+how long it stays free, from the changes recorded in the history store. It then
+spreads a fixed global polling budget over polling targets so that the expected
+number of detected cancellations is as high as possible, and re-balances the
+allocation incrementally as new observations arrive.
+
+The model treats free-ups of a slot as a Poisson process with rate lambda and
+the time until a freed slot is taken as exponential with mean mu. Polling a
+target every T seconds then detects a free-up with probability
+(mu / T) * (1 - exp(-T / mu)), which is concave in the polling rate, so a
+greedy unit-by-unit allocation is optimal.
+
+Usage:
+    python poll_budget.py --budget 60     # replay history.sqlite3 against uniform polling
+"""
+
+import argparse
+import datetime
+import heapq
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import config
+
+FREE = "free"
+
+Key = Tuple[int, str, int]
+
+
+def day_offset(date: str, observed_at: float) -> int:
+    """Days between the observation and the slot's date."""
+    observed = datetime.date.fromtimestamp(observed_at)
+    return (datetime.date.fromisoformat(date) - observed).days
+
+
+def detection_probability(mu: float, rate: float) -> float:
+    """
+    Probability that periodic polling catches a free-up before it is taken.
+
+    Args:
+        mu: Mean time a freed slot stays free, in seconds
+        rate: Polls per second
+
+    Returns:
+        Detection probability between 0 and 1
+    """
+    if rate <= 0:
+        return 0.0
+    period = 1.0 / rate
+    return (mu / period) * (1.0 - math.exp(-period / mu))
+
+
+class ChangeModel:
+    """
+    Per-(day offset, court, hour) free-up rates and free lifetimes.
+
+    Estimates are smoothed toward a weak prior, so targets that have never been
+    seen to change still get a small rate instead of zero.
+    """
+
+    def __init__(self, prior_rate: float = None, prior_lifetime: float = None,
+                 prior_exposure: float = None):
+        """
+        Initialize an empty model.
+
+        Args:
+            prior_rate: Free-ups per second assumed before any data. If None, uses config default
+            prior_lifetime: Seconds a free slot is assumed to stay free. If None, uses config default
+            prior_exposure: Seconds of observation the prior is worth. If None, uses config default
+        """
+        self.prior_rate = prior_rate if prior_rate is not None else config.POLL_PRIOR_RATE
+        self.prior_lifetime = prior_lifetime if prior_lifetime is not None else config.POLL_PRIOR_LIFETIME
+        self.prior_exposure = prior_exposure if prior_exposure is not None else config.POLL_PRIOR_EXPOSURE
+        self.freeups: Dict[Key, int] = defaultdict(int)
+        self.lifetime_sum: Dict[Key, float] = defaultdict(float)
+        self.lifetime_count: Dict[Key, int] = defaultdict(int)
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self._freed_at: Dict[tuple, Tuple[float, Key]] = {}
+
+    @property
+    def exposure(self) -> float:
+        """Seconds of history the model has seen."""
+        if self.first_seen is None:
+            return 0.0
+        return max(1.0, self.last_seen - self.first_seen)
+
+    def update(self, events: Iterable[tuple]) -> set:
+        """
+        Fold new history events into the model.
+
+        Args:
+            events: (observed_at, date, court, hour, status, previous) tuples in time order,
+                as returned by HistoryStore.events()
+
+        Returns:
+            Set of keys whose estimates changed
+        """
+        changed = set()
+        for observed_at, date, court, hour, status, previous in events:
+            if self.first_seen is None:
+                self.first_seen = observed_at
+            self.last_seen = observed_at
+            slot = (date, court, hour)
+            if status == FREE:
+                if previous is None:
+                    continue
+                key = (day_offset(date, observed_at), court, hour)
+                self.freeups[key] += 1
+                self._freed_at[slot] = (observed_at, key)
+                changed.add(key)
+            elif slot in self._freed_at:
+                freed_at, key = self._freed_at.pop(slot)
+                self.lifetime_sum[key] += observed_at - freed_at
+                self.lifetime_count[key] += 1
+                changed.add(key)
+        return changed
+
+    def rate(self, key: Optional[Key]) -> float:
+        """Estimated free-ups per second for a key; None gives the prior."""
+        return ((self.freeups.get(key, 0) + self.prior_rate * self.prior_exposure)
+                / (self.exposure + self.prior_exposure))
+
+    def lifetime(self, key: Optional[Key]) -> float:
+        """Estimated mean seconds a freed slot stays free for a key; None gives the prior."""
+        return ((self.lifetime_sum.get(key, 0.0) + self.prior_lifetime)
+                / (self.lifetime_count.get(key, 0) + 1))
+
+    def keys(self) -> List[Key]:
+        return list(self.freeups)
+
+
+class PollBudgetAllocator:
+    """
+    Splits a global polling budget over targets to maximise detected free-ups.
+
+    A target is whatever one poll fetches, e.g. one day's court list; `target_of`
+    maps each model key onto its target. The budget is handed out in equal units,
+    each going to the target where it adds the most expected detections.
+    """
+
+    def __init__(
+        self,
+        model: ChangeModel,
+        targets: Iterable[Hashable],
+        budget: float = None,
+        units: int = None,
+        target_of: Callable[[Key], Hashable] = lambda key: key,
+        min_units: int = 0
+    ):
+        """
+        Initialize the allocator.
+
+        Args:
+            model: The change model to allocate from
+            targets: All polling targets
+            budget: Total polls per minute. If None, uses config default
+            units: Number of equal slices the budget is split into. If None, uses config default
+            target_of: Maps a model key to the polling target that observes it
+            min_units: Units every target keeps regardless of its value, for exploration
+        """
+        self.model = model
+        self.targets = list(targets)
+        self.budget = budget or config.POLL_BUDGET
+        self.units = units or config.POLL_BUDGET_UNITS
+        self.target_of = target_of
+        self.min_units = min_units
+        self.unit_rate = self.budget / 60.0 / self.units
+        self._members: Dict[Hashable, List[Key]] = defaultdict(list)
+        self._params: Dict[Hashable, List[Tuple[float, float]]] = {}
+        self.allocation: Dict[Hashable, int] = {}
+        self._rebuild_members()
+        self.reallocate()
+
+    def _rebuild_members(self):
+        self._members = defaultdict(list)
+        for key in self.model.keys():
+            self._members[self.target_of(key)].append(key)
+        self._params = {target: self._target_params(target) for target in self.targets}
+
+    def _target_params(self, target) -> List[Tuple[float, float]]:
+        keys = self._members.get(target) or []
+        if not keys:
+            # Unseen targets still carry the prior, so they are not starved forever
+            return [(self.model.rate(None), self.model.lifetime(None))]
+        return [(self.model.rate(k), self.model.lifetime(k)) for k in keys]
+
+    def value(self, target, units: int) -> float:
+        """Expected detections per second for a target polled with `units` units."""
+        rate = units * self.unit_rate
+        return sum(lam * detection_probability(mu, rate) for lam, mu in self._params[target])
+
+    def _gain(self, target, units: int) -> float:
+        return self.value(target, units + 1) - self.value(target, units)
+
+    def reallocate(self) -> Dict[Hashable, int]:
+        """
+        Compute the allocation from scratch with greedy marginal gains.
+
+        Returns:
+            Dictionary mapping target to number of budget units
+        """
+        allocation = {target: self.min_units for target in self.targets}
+        remaining = self.units - self.min_units * len(self.targets)
+        heap = [(-self._gain(t, allocation[t]), i, t) for i, t in enumerate(self.targets)]
+        heapq.heapify(heap)
+        while remaining > 0 and heap:
+            _, i, target = heapq.heappop(heap)
+            allocation[target] += 1
+            remaining -= 1
+            heapq.heappush(heap, (-self._gain(target, allocation[target]), i, target))
+        self.allocation = allocation
+        return allocation
+
+    def observe(self, events: Iterable[tuple], max_moves: Optional[int] = None) -> int:
+        """
+        Update the model with new events and re-balance incrementally.
+
+        Every target is re-scored, since the exposure all rates share has moved;
+        units are then moved one at a time from the current allocation, from the
+        target that loses least to the one that gains most, until no move
+        improves the expected detections.
+
+        Args:
+            events: New history events, as for ChangeModel.update()
+            max_moves: Stop after this many unit moves. If None, runs to convergence
+
+        Returns:
+            Number of units moved
+        """
+        changed = self.model.update(events)
+        if not changed:
+            return 0
+        for key in changed:
+            target = self.target_of(key)
+            if key not in self._members[target]:
+                self._members[target].append(key)
+        # Unchanged keys keep their counts but not their rates: the exposure they are divided by grew
+        self._params = {target: self._target_params(target) for target in self.targets}
+
+        moves = 0
+        while max_moves is None or moves < max_moves:
+            best_gain, best = max(((self._gain(t, n), t) for t, n in self.allocation.items()),
+                                  key=lambda item: item[0])
+            donors = [(self.value(t, n) - self.value(t, n - 1), t)
+                      for t, n in self.allocation.items() if n > self.min_units and t != best]
+            if not donors:
+                break
+            loss, donor = min(donors, key=lambda item: item[0])
+            if best_gain <= loss + 1e-15:
+                break
+            self.allocation[donor] -= 1
+            self.allocation[best] += 1
+            moves += 1
+        return moves
+
+    def intervals(self) -> Dict[Hashable, Optional[float]]:
+        """
+        Get the polling interval of each target.
+
+        Returns:
+            Dictionary mapping target to seconds between polls, or None if it gets no budget
+        """
+        return {t: (1.0 / (n * self.unit_rate) if n else None) for t, n in self.allocation.items()}
+
+    def expected_detections(self) -> float:
+        """Expected detected free-ups per second under the current allocation."""
+        return sum(self.value(t, n) for t, n in self.allocation.items())
+
+
+def freeup_episodes(events: Iterable[tuple]) -> List[Tuple[float, float, Key]]:
+    """
+    Turn history events into free-up episodes.
+
+    Args:
+        events: (observed_at, date, court, hour, status, previous) tuples in time order
+
+    Returns:
+        List of (freed_at, taken_at, key); taken_at is inf if the slot was never taken
+    """
+    open_episodes = {}
+    episodes = []
+    for observed_at, date, court, hour, status, previous in events:
+        slot = (date, court, hour)
+        if status == FREE and previous is not None:
+            open_episodes[slot] = (observed_at, (day_offset(date, observed_at), court, hour))
+        elif status != FREE and slot in open_episodes:
+            freed_at, key = open_episodes.pop(slot)
+            episodes.append((freed_at, observed_at, key))
+    episodes.extend((freed_at, math.inf, key) for freed_at, key in open_episodes.values())
+    episodes.sort()
+    return episodes
+
+
+def replay(episodes: List[Tuple[float, float, Key]], intervals: Dict[Hashable, Optional[float]],
+           target_of: Callable[[Key], Hashable], seed: int = 0) -> dict:
+    """
+    Replay free-up episodes against a periodic polling schedule.
+
+    Each target is polled every `interval` seconds from a random phase. An
+    episode is detected by the first poll after it starts, if that poll comes
+    before the slot is taken.
+
+    Args:
+        episodes: Output of freeup_episodes()
+        intervals: Seconds between polls per target (None means never polled)
+        target_of: Maps an episode key to its polling target
+        seed: Seed for the polling phases
+
+    Returns:
+        Dictionary with episodes, detected, detection_rate and latency statistics
+    """
+    rng = random.Random(seed)
+    phases = {t: rng.uniform(0, i) for t, i in intervals.items() if i}
+    latencies = []
+    for freed_at, taken_at, key in episodes:
+        target = target_of(key)
+        interval = intervals.get(target)
+        if not interval:
+            continue
+        wait = (phases[target] - freed_at) % interval
+        if freed_at + wait < taken_at:
+            latencies.append(wait)
+    result = {"episodes": len(episodes), "detected": len(latencies),
+              "detection_rate": len(latencies) / len(episodes) if episodes else 0.0}
+    if latencies:
+        result["mean_latency"] = statistics.mean(latencies)
+        result["median_latency"] = statistics.median(latencies)
+    return result
+
+
+def evaluate(events: List[tuple], budget: float = None, units: int = None,
+             target_of: Callable[[Key], Hashable] = lambda key: key,
+             train_fraction: float = 0.5) -> dict:
+    """
+    Compare the learned allocation with uniform polling on recorded history.
+
+    The model is trained on the first part of the history and both policies
+    are replayed on the rest, so the comparison does not reward overfitting.
+    Both only poll targets seen in the training part; free-ups on targets
+    that first appear later count as missed.
+
+    Args:
+        events: Recorded history events in time order
+        budget: Total polls per minute. If None, uses config default
+        units: Number of budget units. If None, uses config default
+        target_of: Maps a model key to its polling target
+        train_fraction: Fraction of the time span used for training
+
+    Returns:
+        Dictionary with "learned" and "uniform" replay results
+    """
+    if not events:
+        raise ValueError("No history to evaluate")
+    start, end = events[0][0], events[-1][0]
+    split = start + (end - start) * train_fraction
+    train = [e for e in events if e[0] < split]
+    test_episodes = [ep for ep in freeup_episodes(events) if ep[0] >= split]
+
+    targets = sorted({target_of(ep[2]) for ep in freeup_episodes(train)}, key=str)
+    model = ChangeModel()
+    model.update(train)
+    allocator = PollBudgetAllocator(model, targets, budget=budget, units=units, target_of=target_of)
+
+    uniform_interval = len(targets) / (allocator.budget / 60.0) if targets else None
+    return {
+        "learned": replay(test_episodes, allocator.intervals(), target_of),
+        "uniform": replay(test_episodes, {t: uniform_interval for t in targets}, target_of),
+    }
+
+
+def main():
+    from history_store import HistoryStore
+
+    parser = argparse.ArgumentParser(description="Replay recorded history against polling policies")
+    parser.add_argument("--db", default=None, help="History database file")
+    parser.add_argument("--budget", type=float, default=None, help="Total polls per minute")
+    parser.add_argument("--per-day", action="store_true",
+                        help="Poll whole days (one fetch per date) instead of single slots")
+    args = parser.parse_args()
+
+    with HistoryStore(args.db) as store:
+        events = store.events()
+    target_of = (lambda key: key[0]) if args.per_day else (lambda key: key)
+    started = time.perf_counter()
+    results = evaluate(events, budget=args.budget, target_of=target_of)
+    print(f"Replayed {len(events)} events in {time.perf_counter() - started:.2f}s")
+    for policy, result in results.items():
+        latency = result.get("mean_latency")
+        print(f"{policy:<8} detected {result['detected']}/{result['episodes']} "
+              f"({result['detection_rate']:.1%}), mean latency "
+              f"{'n/a' if latency is None else f'{latency:.1f}s'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Host-Wide Rate Limiter
+
+This module implements token buckets shared by every process on the machine
+(the poller, booking workers, ad-hoc scripts), so that together they stay
+under the server's throttling limit. The buckets live in a small memory-mapped
+file guarded by an exclusive file lock (fcntl on POSIX, msvcrt on Windows);
+taking a token is a lock, a struct read and a struct write, a few microseconds.
+
+Budgets are configured per host or per host/path prefix in config.RATE_LIMITS;
+URLs on other hosts are not limited. Booking traffic preempts polling: polling
+never spends the last RATE_LIMIT_BOOKING_RESERVE tokens of a bucket, and while
+a booking request waits for a token no polling request may take one.
+
+The file outlives the processes (and, on Windows, reboots), so it stores
+wall-clock times, and state read back from it is clamped: an update time in
+the future refills nothing and counts as now, and a booking hold never
+reaches further ahead than one full refill of the bucket.
+
+Usage:
+    limiter = shared_limiter()
+    limiter.acquire("http://vfmc.tju.edu.cn/...", PRIORITY_BOOKING)
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+PRIORITY_BOOKING = 0
+PRIORITY_POLLING = 1
+
+_MAGIC = b"TBRL"
+_HEADER = struct.Struct("<4sI")  # magic, number of slots
+_SLOT = struct.Struct("<Qddd")  # bucket hash, tokens, updated at, booking hold-until (time.time())
+_SLOTS = 64
+
+Budget = Tuple[str, float, float]
+
+
+class RateLimiter:
+    """
+    Token buckets in a lock-protected shared file, one bucket per configured endpoint.
+    """
+
+    def __init__(self, path: Optional[str] = None, limits: Optional[Dict[str, tuple]] = None,
+                 booking_reserve: float = None):
+        """
+        Open (or create) the shared limiter state.
+
+        Args:
+            path: Shared state file. If None, uses config default
+            limits: Mapping of "host[/path-prefix]" to (requests per second, burst).
+                If None, uses config default
+            booking_reserve: Tokens polling leaves for booking. If None, uses config default
+        """
+        self.path = path or config.RATE_LIMIT_FILE or os.path.join(tempfile.gettempdir(), "tju_badminton_ratelimit")
+        self.limits = dict(config.RATE_LIMITS if limits is None else limits)
+        self.booking_reserve = (booking_reserve if booking_reserve is not None
+                                else config.RATE_LIMIT_BOOKING_RESERVE)
+        self._lock = threading.Lock()
+        self._offsets: Dict[int, int] = {}
+        self._keys: Dict[str, int] = {}
+        self._budgets: Dict[str, Optional[Budget]] = {}
+        size = _HEADER.size + _SLOTS * _SLOT.size
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        self._lock_file()
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _HEADER.pack(_MAGIC, _SLOTS))
+        finally:
+            self._unlock_file()
+        self._map = mmap.mmap(self._fd, size)
+        magic, slots = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or slots != _SLOTS:
+            raise RuntimeError(f"{self.path} is not a rate limiter state file")
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def budget_for(self, url: str) -> Optional[Budget]:
+        """
+        Find the budget a URL counts against: the longest matching host/path prefix.
+
+        Args:
+            url: Request URL, or a bare "host/path" bucket name
+
+        Returns:
+            (bucket name, rate, burst), or None if the URL is not limited
+        """
+        budget = self._budgets.get(url, False)
+        if budget is not False:
+            return budget
+        parts = urlsplit(url if "://" in url else "//" + url)
+        target = f"{parts.hostname or ''}{parts.path}"
+        budget = None
+        for name in sorted(self.limits, key=len, reverse=True):
+            if target == name or target.startswith(name.rstrip("/") + "/"):
+                rate, burst = self.limits[name]
+                budget = (name, float(rate), float(burst))
+                break
+        if len(self._budgets) > 4096:
+            self._budgets.clear()
+        self._budgets[url] = budget
+        return budget
+
+    def _slot_offset(self, key: int) -> int:
+        # Open addressing over a fixed table; a bucket never moves once it has a slot
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        start = key % _SLOTS
+        for i in range(_SLOTS):
+            offset = _HEADER.size + ((start + i) % _SLOTS) * _SLOT.size
+            stored = _SLOT.unpack_from(self._map, offset)[0]
+            if stored in (0, key):
+                self._offsets[key] = offset
+                return offset
+        raise RuntimeError("Rate limiter state file is full")
+
+    def _take(self, budget: Budget, priority: int, tokens: float) -> Tuple[float, float]:
+        name, rate, burst = budget
+        key = self._keys.get(name)
+        if key is None:
+            key = self._keys[name] = int.from_bytes(
+                hashlib.blake2b(name.encode(), digest_size=8).digest(), "little") or 1
+        floor = 0.0 if priority == PRIORITY_BOOKING else max(0.0, min(self.booking_reserve, burst - tokens))
+
+        with self._lock:
+            self._lock_file()
+            try:
+                offset = self._slot_offset(key)
+                stored, level, updated, hold = _SLOT.unpack_from(self._map, offset)
+                now = time.time()
+                if stored == 0:
+                    level, updated, hold = burst, now, 0.0
+                # Guard against state written before a clock change: nothing may lie further ahead
+                # than the time the bucket takes to refill
+                updated = min(updated, now)
+                hold = min(hold, now + burst / rate)
+                level = min(burst, level + (now - updated) * rate)
+                if priority != PRIORITY_BOOKING and now < hold:
+                    wait = hold - now
+                elif level - tokens >= floor:
+                    level -= tokens
+                    wait = 0.0
+                else:
+                    wait = (floor + tokens - level) / rate
+                    if priority == PRIORITY_BOOKING:
+                        # Keep polling off the tokens this booking is waiting for
+                        hold = max(hold, now + wait)
+                _SLOT.pack_into(self._map, offset, key, level, now, hold)
+            finally:
+                self._unlock_file()
+        return wait, level
+
+    def try_acquire(self, url: str, priority: int = PRIORITY_POLLING, tokens: float = 1.0) -> float:
+        """
+        Take tokens if available, without waiting.
+
+        Args:
+            url: Request URL or bucket name
+            priority: PRIORITY_BOOKING or PRIORITY_POLLING
+            tokens: Tokens the request costs
+
+        Returns:
+            0.0 if the tokens were taken, otherwise seconds until they may be
+        """
+        budget = self.budget_for(url)
+        if budget is None:
+            return 0.0
+        return self._take(budget, priority, tokens)[0]
+
+    def acquire(self, url: str, priority: int = PRIORITY_POLLING, timeout: Optional[float] = None,
+                tokens: float = 1.0) -> bool:
+        """
+        Take tokens, waiting for them if needed.
+
+        Args:
+            url: Request URL or bucket name
+            priority: PRIORITY_BOOKING or PRIORITY_POLLING
+            timeout: Longest time to wait in seconds. If None, waits as long as needed
+            tokens: Tokens the request costs
+
+        Returns:
+            True if the tokens were taken, False if the timeout ran out first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(url, priority, tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def level(self, url: str) -> Optional[float]:
+        """
+        Get the tokens currently left in a URL's bucket.
+
+        Args:
+            url: Request URL or bucket name
+
+        Returns:
+            Token count, or None if the URL is not limited
+        """
+        budget = self.budget_for(url)
+        if budget is None:
+            return None
+        return self._take(budget, PRIORITY_BOOKING, 0.0)[1]
+
+    def close(self):
+        """Unmap and close the shared file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            os.close(self._fd)
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter() -> RateLimiter:
+    """Get this process's limiter on the host-wide state file, opening it on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
@@ -0,0 +1,491 @@
+"""
+Resilient HTTP Layer
+
+This module wraps a requests.Session with the protections needed when the vfmc
+server is overloaded at release time: hedged duplicate requests once a request
+runs past the rolling p90 latency, per-endpoint circuit breakers, jittered
+retries bounded by a hard deadline, and idempotency keys so a booking is never
+submitted twice under different identities.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import config
+from rate_limiter import PRIORITY_BOOKING, PRIORITY_POLLING, RateLimiter, shared_limiter
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a request is refused because its endpoint's circuit is open."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when no attempt succeeded before the request's hard deadline."""
+
+
+class LatencyTracker:
+    """
+    Rolling latency estimate over the last N successful responses.
+    """
+
+    def __init__(self, window: int = None, quantile: float = None, default: float = None):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Number of samples to keep. If None, uses config default
+            quantile: Quantile used as the hedge trigger. If None, uses config default
+            default: Estimate returned until enough samples are collected
+        """
+        self.quantile = quantile if quantile is not None else config.HTTP_HEDGE_QUANTILE
+        self.default = default if default is not None else config.HTTP_HEDGE_DEFAULT_DELAY
+        self._samples = deque(maxlen=window or config.HTTP_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Add a latency sample in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def estimate(self) -> float:
+        """
+        Get the current quantile estimate.
+
+        Returns:
+            The latency, in seconds, below which `quantile` of samples fall
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 5:
+            return self.default
+        index = min(len(samples) - 1, int(self.quantile * len(samples)))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open circuit breaker for one endpoint.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before allowing a trial request
+            clock: Monotonic clock, injectable for tests
+        """
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else config.CIRCUIT_RESET_TIMEOUT
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent through this breaker."""
+        return self.state != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class ResilientSession:
+    """
+    A requests.Session wrapper with hedging, circuit breaking and bounded retries.
+
+    Every logical request is given a hard deadline. Each attempt sends a primary
+    request and, if it has not answered within the endpoint's rolling p90, a
+    hedged duplicate; whichever succeeds first wins. Failed attempts are retried
+    with full-jitter backoff until the deadline runs out.
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        user_agent: Optional[str] = None,
+        deadline: float = None,
+        max_attempts: int = None,
+        max_workers: int = 8,
+        limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Initialize the resilient session.
+
+        Args:
+            session: Underlying requests.Session. If None, a new one is created
+            user_agent: User-Agent header. If None, uses default WeChat User-Agent
+            deadline: Default hard deadline per logical request in seconds
+            max_attempts: Maximum attempts (each possibly hedged) per request
+            max_workers: Size of the thread pool used for hedged requests
+            limiter: Rate limiter consulted before every request. If None, uses the
+                host-wide shared limiter
+        """
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("Accept-Language", "zh-CN,zh;q=0.9")
+        self.session.headers["User-Agent"] = user_agent or config.DEFAULT_USER_AGENT
+        self.deadline = deadline or config.HTTP_DEADLINE
+        self.max_attempts = max_attempts or config.HTTP_MAX_ATTEMPTS
+        self.limiter = limiter or shared_limiter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Idempotency key -> (shared result, monotonic time the entry expires; None while in flight)
+        self._idempotent: Dict[str, list] = {}
+        self._stats = {"requests": 0, "attempts": 0, "hedges": 0, "hedge_wins": 0,
+                       "retries": 0, "failures": 0, "circuit_rejections": 0}
+
+    @staticmethod
+    def endpoint_key(method: str, url: str) -> str:
+        """Get the key that latency tracking and circuit breaking are grouped by."""
+        parts = urlsplit(url)
+        return f"{method.upper()} {parts.netloc}{parts.path}"
+
+    def tracker(self, endpoint: str) -> LatencyTracker:
+        with self._lock:
+            if endpoint not in self._trackers:
+                self._trackers[endpoint] = LatencyTracker()
+            return self._trackers[endpoint]
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker()
+            return self._breakers[endpoint]
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def _never_sent(error: Exception) -> bool:
+        """Tell whether a request failed before any of it reached the server."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+            # Refused or unresolvable connections; a dropped connection may have carried the request
+            return isinstance(getattr(error.args[0], "reason", error.args[0]), NewConnectionError)
+        return False
+
+    @staticmethod
+    def _is_failure(response: requests.Response) -> bool:
+        return response.status_code >= 500 or response.status_code == 429
+
+    def _send(self, method: str, url: str, endpoint: str, timeout: float, priority: int, kwargs: dict):
+        started = time.monotonic()
+        if not self.limiter.acquire(url, priority, timeout=timeout):
+            raise DeadlineExceededError(f"No rate limit token for {endpoint} before the deadline")
+        timeout -= time.monotonic() - started
+        started = time.monotonic()
+        response = self.session.request(method, url, timeout=timeout, **kwargs)
+        if self._is_failure(response):
+            raise requests.HTTPError(f"{response.status_code} from {endpoint}", response=response)
+        self.tracker(endpoint).record(time.monotonic() - started)
+        return response
+
+    def _attempt(self, method: str, url: str, endpoint: str, deadline_at: float,
+                 hedge: bool, priority: int, kwargs: dict) -> requests.Response:
+        """
+        Run one attempt: a primary request plus at most one hedged duplicate.
+        """
+        remaining = deadline_at - time.monotonic()
+        primary = self._executor.submit(self._send, method, url, endpoint, remaining, priority, kwargs)
+        pending = {primary}
+        hedged = None
+        if hedge:
+            delay = max(config.HTTP_MIN_HEDGE_DELAY, self.tracker(endpoint).estimate())
+            done, _ = wait(pending, timeout=min(delay, max(0.0, remaining)))
+            if not done and deadline_at - time.monotonic() > 0:
+                self._count("hedges")
+                hedged = self._executor.submit(self._send, method, url, endpoint,
+                                               deadline_at - time.monotonic(), priority, kwargs)
+                pending.add(hedged)
+
+        last_error = None
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future is hedged:
+                    self._count("hedge_wins")
+                return response
+        raise last_error or DeadlineExceededError(f"{endpoint} did not answer before the deadline")
+
+    def request(self, method: str, url: str, deadline: Optional[float] = None,
+                hedge: bool = True, priority: int = PRIORITY_POLLING, retry_sent: bool = True,
+                **kwargs) -> requests.Response:
+        """
+        Send a request with hedging, circuit breaking and retries.
+
+        Args:
+            method: HTTP method
+            url: The URL to request
+            deadline: Hard deadline in seconds for all attempts. If None, uses default
+            hedge: Whether a duplicate may be sent when the primary is slow
+            priority: Rate limiter priority class (PRIORITY_BOOKING or PRIORITY_POLLING)
+            retry_sent: Whether to retry failures after the request may have reached the server
+                (timeouts, dropped connections, 5xx and 429 replies); False for requests that
+                must not reach the server twice, which then only retry failed connection attempts
+            **kwargs: Passed through to requests.Session.request
+
+        Returns:
+            The first successful response
+        """
+        endpoint = self.endpoint_key(method, url)
+        breaker = self.breaker(endpoint)
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        self._count("requests")
+
+        last_error = None
+        for attempt in range(self.max_attempts):
+            if not breaker.allow():
+                self._count("circuit_rejections")
+                raise CircuitOpenError(f"Circuit open for {endpoint}")
+            if attempt:
+                self._count("retries")
+            self._count("attempts")
+            try:
+                response = self._attempt(method, url, endpoint, deadline_at, hedge, priority, kwargs)
+            except DeadlineExceededError:
+                breaker.record_failure()
+                self._count("failures")
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                last_error = e
+                # The server may have acted on the request even if the reply was an error or never came
+                if not retry_sent and not self._never_sent(e):
+                    break
+            else:
+                breaker.record_success()
+                return response
+
+            # Full-jitter exponential backoff, never sleeping past the deadline
+            backoff = random.uniform(0, min(config.HTTP_RETRY_MAX_DELAY,
+                                            config.HTTP_RETRY_BASE_DELAY * (2 ** attempt)))
+            if time.monotonic() + backoff >= deadline_at:
+                break
+            time.sleep(backoff)
+
+        self._count("failures")
+        raise last_error or DeadlineExceededError(f"{endpoint} did not answer before the deadline")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def book(self, url: str, idempotency_key: Optional[str] = None,
+             confirmed: Optional[Callable[[requests.Response], bool]] = None, **kwargs) -> requests.Response:
+        """
+        Submit a booking at most once per idempotency key.
+
+        Concurrent calls with the same key share a single submission, and a
+        response that confirms the booking is remembered for
+        HTTP_IDEMPOTENCY_TTL seconds so repeated calls return it instead of
+        booking again. Any other reply (4xx, "slot taken") is not remembered:
+        the next call asks the server again. Nothing shows the server honours
+        the Idempotency-Key header, so bookings are never hedged and only
+        retried when the connection could not be opened; a POST that may have
+        been sent (timeout, dropped connection, 5xx or 429) is not sent again.
+
+        Args:
+            url: The booking endpoint
+            idempotency_key: Key identifying this booking. If None, a new one is generated
+            confirmed: Returns True if a response confirms the booking. If None, any 2xx does
+            **kwargs: Passed through to request()
+
+        Returns:
+            The booking response
+        """
+        key = idempotency_key or uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            entry = self._idempotent.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= now:
+                entry = None
+            owner = entry is None
+            if owner:
+                entry = self._idempotent[key] = [_Result(), None]
+        future = entry[0]
+        if not owner:
+            return future.get()
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Idempotency-Key"] = key
+        kwargs.setdefault("priority", PRIORITY_BOOKING)
+        kwargs["hedge"] = False
+        kwargs["retry_sent"] = False
+        try:
+            response = self.request("POST", url, headers=headers, **kwargs)
+        except Exception as e:
+            # Failed bookings are not remembered, so the caller may try again
+            with self._lock:
+                self._idempotent.pop(key, None)
+            future.set_error(e)
+            raise
+        ok = confirmed(response) if confirmed else 200 <= response.status_code < 300
+        with self._lock:
+            if ok:
+                entry[1] = time.monotonic() + config.HTTP_IDEMPOTENCY_TTL
+            else:
+                self._idempotent.pop(key, None)
+            # Drop other expired entries so the table does not grow for the life of the daemon
+            for stale in [k for k, (_, expires) in self._idempotent.items() if expires is not None
+                          and expires <= time.monotonic()]:
+                del self._idempotent[stale]
+        future.set(response)
+        return response
+
+    def set_cookies(self, cookies: list):
+        """
+        Replace the session's cookies with a Selenium-style cookie list.
+
+        Args:
+            cookies: List of cookie dictionaries, as returned by get_cookies()
+        """
+        jar = requests.cookies.RequestsCookieJar()
+        for cookie in cookies:
+            jar.set(cookie["name"], cookie.get("value", ""), domain=cookie.get("domain", ""),
+                    path=cookie.get("path", "/"), expires=cookie.get("expiry"))
+        # Swap the whole jar in one assignment so in-flight requests see old or new, never a mix
+        self.session.cookies = jar
+
+    def get_cookies(self) -> list:
+        """
+        Get the session's cookies as a Selenium-style cookie list.
+
+        Returns:
+            List of cookie dictionaries
+        """
+        cookies = []
+        for c in self.session.cookies:
+            cookie = {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+            # Session cookies have no expiry; Selenium rejects "expiry": None
+            if c.expires is not None:
+                cookie["expiry"] = c.expires
+            cookies.append(cookie)
+        return cookies
+
+    def save_cookies(self, path: str):
+        """
+        Save the session's cookies to a JSON file.
+
+        Args:
+            path: The file to write
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.get_cookies(), f)
+        os.replace(tmp_path, path)
+
+    def load_cookies(self, path: str) -> bool:
+        """
+        Load cookies previously written by save_cookies().
+
+        Args:
+            path: The file to read
+
+        Returns:
+            True if cookies were loaded, False if the file does not exist
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, encoding="utf-8") as f:
+            self.set_cookies(json.load(f))
+        return True
+
+    def stats(self) -> dict:
+        """
+        Get counters for tuning the hedge and retry policy.
+
+        Returns:
+            Dictionary of raw counters plus hedge_rate (hedges per attempt) and
+            hedge_win_rate (fraction of hedges that beat the primary)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["p90"] = {endpoint: tracker.estimate() for endpoint, tracker in self._trackers.items()}
+            stats["circuits"] = {endpoint: breaker.state for endpoint, breaker in self._breakers.items()}
+        stats["hedge_rate"] = stats["hedges"] / stats["attempts"] if stats["attempts"] else 0.0
+        stats["hedge_win_rate"] = stats["hedge_wins"] / stats["hedges"] if stats["hedges"] else 0.0
+        return stats
+
+    def close(self):
+        """Shut down the hedge pool and the underlying session."""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+
+class _Result:
+    """A minimal one-shot result shared between concurrent idempotent callers."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def set(self, value):
+        self._value = value
+        self._event.set()
+
+    def set_error(self, error: Exception):
+        self._error = error
+        self._event.set()
+
+    def get(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
@@ -0,0 +1,340 @@
+"""
+Session Keep-Alive and Token Refresh
+
+This module keeps a vfmc login session usable for as long as the helper runs.
+It tracks when the session cookies expire and when the server last confirmed
+the session, sends cheap heartbeat requests to keep the server-side session
+warm, and re-runs the browser login in a background thread well before the
+session is due to expire. Fresh cookies are swapped into every attached HTTP
+client at once, so booking calls keep going on the old cookies until the new
+ones are ready and never wait for a login. A new session only counts as
+confirmed once a heartbeat succeeds with its cookies, and failed logins are
+retried with exponential backoff instead of on every tick.
+
+Usage:
+    client = ResilientSession()
+    manager = SessionManager(browser_login, clients=[client, stager],
+                             heartbeat=http_heartbeat(client, url))
+    manager.start()
+    ...
+    manager.refresh_async()  # e.g. after a LoginRequiredError; returns immediately
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+import config
+
+
+def http_heartbeat(client, url: str) -> Callable[[], bool]:
+    """
+    Build a heartbeat that fetches an authenticated page.
+
+    Args:
+        client: ResilientSession carrying the session cookies
+        url: A cheap page that needs a login
+
+    Returns:
+        Function returning True while the server still accepts the session
+    """
+    def heartbeat() -> bool:
+        response = client.get(url, allow_redirects=True, hedge=False)
+        return response.status_code not in (401, 403) and "UserChoose" not in response.url
+    return heartbeat
+
+
+class SessionManager:
+    """
+    Keeps session cookies fresh and shares them with every HTTP client.
+
+    The session is considered valid until the earlier of the first cookie
+    expiry and the server's idle timeout after the last confirmation. Logins
+    run on a background thread; at most one runs at a time, and after a
+    failure the next waits SESSION_LOGIN_BACKOFF seconds, doubling up to
+    SESSION_LOGIN_BACKOFF_MAX.
+    """
+
+    def __init__(
+        self,
+        login: Callable[[], list],
+        clients: Optional[list] = None,
+        heartbeat: Optional[Callable[[], bool]] = None,
+        cookie_file: Optional[str] = None,
+        refresh_margin: float = None,
+        heartbeat_interval: float = None,
+        idle_timeout: float = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            login: Runs the (browser) login and returns the new cookie list
+            clients: Objects with a set_cookies(list) method that share the session,
+                e.g. ResilientSession and BookingStager
+            heartbeat: Returns True if the server still accepts the session. If None,
+                only cookie expiry and the idle timeout are tracked
+            cookie_file: Where fresh cookies are saved. If None, uses config default
+            refresh_margin: Seconds before expiry to start a background login. If None, uses config default
+            heartbeat_interval: Seconds between heartbeats. If None, uses config default
+            idle_timeout: Server-side session idle timeout in seconds. If None, uses config default
+            clock: Time source, replaceable in tests
+        """
+        self.login = login
+        self.clients: List = list(clients or [])
+        self.heartbeat = heartbeat
+        self.cookie_file = cookie_file or config.COOKIE_FILE
+        self.refresh_margin = refresh_margin if refresh_margin is not None else config.SESSION_REFRESH_MARGIN
+        self.heartbeat_interval = (heartbeat_interval if heartbeat_interval is not None
+                                   else config.SESSION_HEARTBEAT_INTERVAL)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else config.SESSION_IDLE_TIMEOUT
+        self.clock = clock
+        self._cookies: list = []
+        self._confirmed_at = None
+        self._last_heartbeat = None
+        self._invalid = True
+        self._lock = threading.Lock()
+        self._login_thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"logins": 0, "login_failures": 0, "heartbeats": 0, "heartbeat_failures": 0}
+        self._last_error = None
+        self._failed_logins = 0
+        self._retry_at: Optional[float] = None
+
+    def attach(self, client):
+        """
+        Share the session with another client, giving it the current cookies.
+
+        Args:
+            client: Object with a set_cookies(list) method
+        """
+        with self._lock:
+            self.clients.append(client)
+            cookies = list(self._cookies)
+        if cookies:
+            client.set_cookies(cookies)
+
+    def load(self) -> bool:
+        """
+        Load cookies saved by an earlier run and hand them to every client.
+
+        Returns:
+            True if cookies were loaded
+        """
+        if not os.path.exists(self.cookie_file):
+            return False
+        with open(self.cookie_file, encoding="utf-8") as f:
+            cookies = json.load(f)
+        # Saved cookies are unconfirmed; the first heartbeat decides whether they still work
+        self.swap(cookies, confirmed=False)
+        return True
+
+    def swap(self, cookies: list, confirmed: bool = True):
+        """
+        Install new cookies in every attached client and save them.
+
+        Args:
+            cookies: The new cookie list
+            confirmed: Whether the cookies are known to be accepted by the server
+        """
+        with self._lock:
+            self._cookies = list(cookies)
+            self._invalid = False
+            self._confirmed_at = self.clock() if confirmed else None
+            clients = list(self.clients)
+        for client in clients:
+            client.set_cookies(cookies)
+        tmp_path = self.cookie_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cookies, f)
+        os.replace(tmp_path, self.cookie_file)
+
+    def cookies(self) -> list:
+        """Get the current cookie list without waiting for any login."""
+        with self._lock:
+            return list(self._cookies)
+
+    def expires_at(self) -> Optional[float]:
+        """
+        Get when the session is expected to stop working.
+
+        Returns:
+            Unix timestamp, or None if there is no usable session
+        """
+        with self._lock:
+            if self._invalid or not self._cookies:
+                return None
+            session = [c for c in self._cookies if c["name"] in config.SESSION_COOKIES]
+            if session:
+                limits = [c["expiry"] for c in session if c.get("expiry")]
+            else:
+                # No known session cookie: an already expired (e.g. tracking) cookie cannot be what ends the session
+                now = self.clock()
+                limits = [c["expiry"] for c in self._cookies if c.get("expiry") and c["expiry"] > now]
+            if self._confirmed_at is not None:
+                limits.append(self._confirmed_at + self.idle_timeout)
+        return min(limits) if limits else float("inf")
+
+    def needs_refresh(self) -> bool:
+        """Whether a new login should be started now."""
+        expires_at = self.expires_at()
+        return expires_at is None or self.clock() >= expires_at - self.refresh_margin
+
+    def invalidate(self, reason: str = "session rejected"):
+        """
+        Mark the session as rejected by the server and start a background login.
+
+        Args:
+            reason: Recorded in status()
+        """
+        with self._lock:
+            self._invalid = True
+            self._last_error = reason
+        self.refresh_async()
+
+    @property
+    def refreshing(self) -> bool:
+        """Whether a background login is running."""
+        thread = self._login_thread
+        return thread is not None and thread.is_alive()
+
+    def refresh_async(self) -> bool:
+        """
+        Start a background login unless one is already running or a failed one is backing off.
+
+        Returns:
+            True if a new login was started
+        """
+        with self._lock:
+            if self.refreshing or (self._retry_at is not None and self.clock() < self._retry_at):
+                return False
+            self._login_thread = threading.Thread(target=self._run_login, name="session-login", daemon=True)
+            self._login_thread.start()
+        return True
+
+    def _login_failed(self, error: str):
+        with self._lock:
+            self._counters["login_failures"] += 1
+            self._last_error = error
+            self._failed_logins += 1
+            backoff = min(config.SESSION_LOGIN_BACKOFF_MAX,
+                          config.SESSION_LOGIN_BACKOFF * 2 ** (self._failed_logins - 1))
+            self._retry_at = self.clock() + backoff
+        print(f"Background login failed: {error}; next try in {backoff:.0f}s")
+
+    def _run_login(self):
+        try:
+            cookies = self.login()
+        except Exception as e:
+            self._login_failed(f"login: {e}")
+            return
+        with self._lock:
+            previous = (list(self._cookies), self._invalid, self._confirmed_at)
+        # A login that was never completed still returns cookies; only the server can tell
+        self.swap(cookies, confirmed=False)
+        # None (no heartbeat, or it could not run) leaves the new session unconfirmed
+        if self.send_heartbeat() is False:
+            # Put the old cookies back: they may still work until their own expiry
+            self.swap(previous[0], confirmed=False)
+            with self._lock:
+                self._invalid, self._confirmed_at = previous[1], previous[2]
+            self._login_failed("login: the server rejected the new session")
+            return
+        with self._lock:
+            self._counters["logins"] += 1
+            self._failed_logins = 0
+            self._retry_at = None
+        print("Session refreshed")
+
+    def send_heartbeat(self) -> Optional[bool]:
+        """
+        Ask the server whether the session is still accepted.
+
+        Returns:
+            The heartbeat result, or None if no heartbeat is configured or it failed to run
+        """
+        if self.heartbeat is None:
+            return None
+        self._last_heartbeat = self.clock()
+        self._counters["heartbeats"] += 1
+        try:
+            ok = self.heartbeat()
+        except Exception as e:
+            # A network error says nothing about the session; try again next interval
+            self._counters["heartbeat_failures"] += 1
+            self._last_error = f"heartbeat: {e}"
+            return None
+        if ok:
+            with self._lock:
+                self._confirmed_at = self.clock()
+                self._invalid = False
+        else:
+            self.invalidate("heartbeat rejected")
+        return ok
+
+    def tick(self):
+        """
+        Run one maintenance step: heartbeat if due, then refresh if close to expiry.
+        """
+        now = self.clock()
+        if self._cookies and (self._last_heartbeat is None
+                              or now - self._last_heartbeat >= self.heartbeat_interval):
+            self.send_heartbeat()
+        if self.needs_refresh():
+            self.refresh_async()
+
+    def _loop(self, period: float):
+        while not self._stopping.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                self._last_error = str(e)
+            self._stopping.wait(period)
+
+    def start(self, period: float = 1.0):
+        """
+        Run tick() on a background thread every `period` seconds.
+
+        Args:
+            period: Seconds between maintenance steps
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, args=(period,), name="session-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the maintenance thread. A running login is left to finish on its own."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def status(self) -> dict:
+        """
+        Get the session state.
+
+        Returns:
+            JSON-serializable status dictionary
+        """
+        expires_at = self.expires_at()
+        return {
+            "valid": expires_at is not None and self.clock() < expires_at,
+            "expires_in": None if expires_at in (None, float("inf")) else round(expires_at - self.clock(), 1),
+            "refreshing": self.refreshing,
+            "last_error": self._last_error,
+            **self._counters,
+        }
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.stop()
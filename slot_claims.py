@@ -0,0 +1,528 @@
+"""
+Multi-Node Slot Claiming
+
+This module lets several helper instances, on one machine or many, share the
+booking work without attempting the same slot twice. Before attempting a
+booking a node claims every (account, date, court, hour) target it covers,
+all or nothing, so overlapping multi-hour blocks exclude each other; a lease
+lasts CLAIM_TTL seconds and is renewed while the node is alive, so the
+targets of a node that dies are free again within one TTL.
+
+Leases live in a pluggable store: SQLiteClaimStore for nodes on one machine
+and ClaimServer/TCPClaimStore, a tiny JSON-over-TCP stand-in, for nodes on
+several machines. Node liveness is itself a lease ("node/<id>"), and
+assign() splits a target list across live nodes by rendezvous hashing so that
+each target has exactly one preferred owner.
+
+Usage:
+    python slot_claims.py serve --port 8766          # on one machine
+    CLAIM_STORE = "tcp://10.0.0.5:8766"              # in config.py on every node
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import config
+
+NODE_PREFIX = "node/"
+
+
+class Lease(NamedTuple):
+    """A claim on one target; `token` increases on every change of owner (a fencing token)."""
+    target: str
+    node: str
+    expires_at: float
+    token: int
+
+
+def target_key(attempt, hour: Optional[int] = None) -> str:
+    """
+    Get the claim key of one hour of a booking attempt.
+
+    Args:
+        attempt: BookingAttempt (or anything with account, date, court and start_hour)
+        hour: The hour. If None, the attempt's start hour
+
+    Returns:
+        Key string such as "alice|2026-10-20|3号场|19"
+    """
+    hour = attempt.start_hour if hour is None else hour
+    return f"{attempt.account or ''}|{attempt.date}|{attempt.court}|{hour}"
+
+
+def target_keys(attempt) -> List[str]:
+    """
+    Get the claim keys of every hour a booking attempt covers.
+
+    Args:
+        attempt: BookingAttempt (or anything with account, date, court, start_hour and end_hour)
+
+    Returns:
+        One key per hour, e.g. 18-20 gives the keys of 18 and 19
+    """
+    end = getattr(attempt, "end_hour", None) or attempt.start_hour + 1
+    return [target_key(attempt, hour) for hour in range(attempt.start_hour, max(end, attempt.start_hour + 1))]
+
+
+def default_node_id() -> str:
+    """Get this process's node id: config.CLAIM_NODE_ID or hostname-pid."""
+    return config.CLAIM_NODE_ID or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class MemoryClaimStore:
+    """
+    Lease store in a dictionary; the backing store of ClaimServer.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._leases: Dict[str, Lease] = {}
+        self._tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, target: str, node: str, ttl: float) -> Optional[Lease]:
+        """
+        Take or extend a lease unless another node holds an unexpired one.
+
+        Args:
+            target: Target key
+            node: Claiming node id
+            ttl: Lease duration in seconds
+
+        Returns:
+            The lease, or None if another node holds the target
+        """
+        with self._lock:
+            now = self.clock()
+            current = self._leases.get(target)
+            if current is not None and current.node != node and current.expires_at > now:
+                return None
+            if current is None or current.node != node or current.expires_at <= now:
+                self._tokens[target] = self._tokens.get(target, 0) + 1
+            lease = Lease(target, node, now + ttl, self._tokens[target])
+            self._leases[target] = lease
+            return lease
+
+    def release(self, target: str, node: str) -> bool:
+        """
+        Give up a lease held by `node`.
+
+        Returns:
+            True if the node held the lease
+        """
+        with self._lock:
+            current = self._leases.get(target)
+            if current is None or current.node != node:
+                return False
+            del self._leases[target]
+            return True
+
+    def leases(self, prefix: str = "") -> List[Lease]:
+        """
+        Get the unexpired leases whose target starts with `prefix`.
+        """
+        with self._lock:
+            now = self.clock()
+            return [lease for target, lease in self._leases.items()
+                    if target.startswith(prefix) and lease.expires_at > now]
+
+    def close(self):
+        pass
+
+
+class SQLiteClaimStore:
+    """
+    Lease store in a SQLite file, shared by processes on one machine.
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        """
+        Open (or create) the store.
+
+        Args:
+            path: SQLite database file
+            clock: Time source; all nodes must share it
+        """
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS claims (target TEXT PRIMARY KEY, node TEXT NOT NULL, "
+                         "expires_at REAL NOT NULL, token INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def acquire(self, target: str, node: str, ttl: float) -> Optional[Lease]:
+        """Take or extend a lease unless another node holds an unexpired one."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = conn.execute("SELECT node, expires_at, token FROM claims WHERE target = ?", (target,)).fetchone()
+            if row is not None and row[0] != node and row[1] > now:
+                conn.execute("ROLLBACK")
+                return None
+            token = 1 if row is None else row[2] + (row[0] != node or row[1] <= now)
+            conn.execute("INSERT OR REPLACE INTO claims (target, node, expires_at, token) VALUES (?, ?, ?, ?)",
+                         (target, node, now + ttl, token))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Lease(target, node, now + ttl, token)
+
+    def release(self, target: str, node: str) -> bool:
+        """Give up a lease held by `node`."""
+        # Expire rather than delete, so the fencing token keeps counting up
+        cursor = self._connect().execute("UPDATE claims SET expires_at = 0 WHERE target = ? AND node = ?",
+                                         (target, node))
+        return cursor.rowcount > 0
+
+    def leases(self, prefix: str = "") -> List[Lease]:
+        """Get the unexpired leases whose target starts with `prefix`."""
+        rows = self._connect().execute(
+            "SELECT target, node, expires_at, token FROM claims WHERE expires_at > ? AND substr(target, 1, ?) = ?",
+            (self.clock(), len(prefix), prefix))
+        return [Lease(*row) for row in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _ClaimHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.pop("op")
+                if op == "acquire":
+                    lease = store.acquire(**request)
+                    result = lease._asdict() if lease else None
+                elif op == "release":
+                    result = store.release(**request)
+                elif op == "leases":
+                    result = [lease._asdict() for lease in store.leases(**request)]
+                else:
+                    raise ValueError(f"Unknown op {op!r}")
+                reply = {"ok": True, "result": result}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class ClaimServer(socketserver.ThreadingTCPServer):
+    """
+    Serves a MemoryClaimStore as newline-delimited JSON over TCP.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, store: Optional[MemoryClaimStore] = None):
+        """
+        Bind the server; call serve_forever() (or start()) to run it.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+            store: Backing store. If None, a new MemoryClaimStore is used
+        """
+        super().__init__((host, port), _ClaimHandler)
+        self.store = store or MemoryClaimStore()
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"tcp://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        """Serve on a background thread."""
+        thread = threading.Thread(target=self.serve_forever, name="claim-server", daemon=True)
+        thread.start()
+        return thread
+
+
+class TCPClaimStore:
+    """
+    Client of a ClaimServer with the same interface as the local stores.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = None):
+        self.address = (host, port)
+        self.timeout = timeout or config.DEFAULT_TIMEOUT
+        self._local = threading.local()
+
+    def _call(self, op: str, **params):
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    sock = socket.create_connection(self.address, timeout=self.timeout)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    conn = self._local.conn = (sock, sock.makefile("rb"))
+                conn[0].sendall(json.dumps({"op": op, **params}).encode("utf-8") + b"\n")
+                line = conn[1].readline()
+                if not line:
+                    raise ConnectionError("Claim server closed the connection")
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+                continue
+            reply = json.loads(line)
+            if not reply["ok"]:
+                raise RuntimeError(reply["error"])
+            return reply["result"]
+
+    def acquire(self, target: str, node: str, ttl: float) -> Optional[Lease]:
+        """Take or extend a lease unless another node holds an unexpired one."""
+        result = self._call("acquire", target=target, node=node, ttl=ttl)
+        return Lease(**result) if result else None
+
+    def release(self, target: str, node: str) -> bool:
+        """Give up a lease held by `node`."""
+        return self._call("release", target=target, node=node)
+
+    def leases(self, prefix: str = "") -> List[Lease]:
+        """Get the unexpired leases whose target starts with `prefix`."""
+        return [Lease(**lease) for lease in self._call("leases", prefix=prefix)]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+            self._local.conn = None
+
+
+def open_store(spec: Optional[str] = None):
+    """
+    Open the store named by a spec: "tcp://host:port" or a SQLite file path.
+
+    Args:
+        spec: Store spec. If None, uses config.CLAIM_STORE
+
+    Returns:
+        SQLiteClaimStore or TCPClaimStore
+    """
+    spec = spec or config.CLAIM_STORE
+    if not spec:
+        raise ValueError("No claim store configured; set CLAIM_STORE in config.py")
+    if spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        return TCPClaimStore(host, int(port))
+    return SQLiteClaimStore(spec)
+
+
+class ClaimCoordinator:
+    """
+    One node's view of the shared claims: liveness, leases held and work assignment.
+    """
+
+    def __init__(self, store=None, node_id: Optional[str] = None, ttl: float = None):
+        """
+        Initialize the coordinator.
+
+        Args:
+            store: Lease store. If None, opens config.CLAIM_STORE
+            node_id: This node's id. If None, uses default_node_id()
+            ttl: Lease duration in seconds. If None, uses config default
+        """
+        self.store = store or open_store()
+        self.node_id = node_id or default_node_id()
+        self.ttl = ttl or config.CLAIM_TTL
+        self.held: Dict[str, Lease] = {}
+        self._lock = threading.Lock()
+
+    def heartbeat(self):
+        """Announce that this node is alive for another TTL."""
+        self.store.acquire(NODE_PREFIX + self.node_id, self.node_id, self.ttl)
+
+    def live_nodes(self) -> List[str]:
+        """Get the ids of nodes whose liveness lease has not expired, sorted."""
+        return sorted(lease.node for lease in self.store.leases(NODE_PREFIX))
+
+    @staticmethod
+    def owner(target: str, nodes: Iterable[str]) -> Optional[str]:
+        """
+        Pick the preferred owner of a target by rendezvous hashing.
+
+        Every node computes the same owner from the same node list, and when a
+        node leaves only its own targets move.
+        """
+        def weight(node):
+            return hashlib.blake2b(f"{node}\0{target}".encode(), digest_size=8).digest()
+        return max(nodes, key=weight, default=None)
+
+    def claim(self, target: str) -> bool:
+        """
+        Claim a target for this node, or keep a claim it already holds.
+
+        Args:
+            target: Target key, e.g. from target_key()
+
+        Returns:
+            True if this node holds the target
+        """
+        lease = self.store.acquire(target, self.node_id, self.ttl)
+        with self._lock:
+            if lease is None:
+                self.held.pop(target, None)
+                return False
+            self.held[target] = lease
+        return True
+
+    def claim_all(self, targets: Iterable[str]) -> bool:
+        """
+        Claim several targets, all or nothing.
+
+        Args:
+            targets: Target keys, e.g. from target_keys()
+
+        Returns:
+            True if this node now holds every target; otherwise it holds none it did not hold before
+        """
+        taken = []
+        for target in targets:
+            with self._lock:
+                had = target in self.held
+            if not self.claim(target):
+                for newly in taken:
+                    self.release(newly)
+                return False
+            if not had:
+                taken.append(target)
+        return True
+
+    def verify(self, targets: Iterable[str]) -> bool:
+        """
+        Check, right before acting on them, that this node still holds the targets.
+
+        Extends each lease and compares its fencing token with the one held: a
+        changed token means the lease lapsed and another node may have held
+        the target in between.
+
+        Args:
+            targets: Target keys claimed earlier
+
+        Returns:
+            True if every lease is still the one this node claimed
+        """
+        for target in targets:
+            with self._lock:
+                held = self.held.get(target)
+            if held is None:
+                return False
+            lease = self.store.acquire(target, self.node_id, self.ttl)
+            if lease is None or lease.token != held.token:
+                with self._lock:
+                    self.held.pop(target, None)
+                return False
+            with self._lock:
+                self.held[target] = lease
+        return True
+
+    def release(self, target: str):
+        """Give a target back, e.g. after booking it or giving up."""
+        with self._lock:
+            self.held.pop(target, None)
+        self.store.release(target, self.node_id)
+
+    def renew(self) -> List[str]:
+        """
+        Extend every lease this node holds and its liveness lease.
+
+        Only attempts still in progress should hold leases: release a target
+        once its booking is confirmed or given up, or it is renewed forever.
+
+        Returns:
+            Targets whose leases were lost to another node
+        """
+        self.heartbeat()
+        with self._lock:
+            targets = list(self.held)
+        return [target for target in targets if not self.claim(target)]
+
+    def assign(self, targets: Iterable[str]) -> List[str]:
+        """
+        Claim this node's share of the targets.
+
+        A target is claimed by its rendezvous owner among the live nodes, so
+        live nodes split the list without overlap. Targets of a node that has
+        died are reassigned as soon as its liveness lease expires, and become
+        claimable once its target leases expire too.
+
+        Args:
+            targets: Target keys, in any order
+
+        Returns:
+            The targets this node now holds
+        """
+        self.heartbeat()
+        nodes = self.live_nodes()
+        return [target for target in targets
+                if self.owner(target, nodes) == self.node_id and self.claim(target)]
+
+    def release_all(self):
+        """Give back every lease, including liveness, e.g. on shutdown."""
+        with self._lock:
+            targets = list(self.held)
+        for target in targets:
+            self.release(target)
+        self.store.release(NODE_PREFIX + self.node_id, self.node_id)
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.release_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slot claim store tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Run the TCP claim server")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=config.CLAIM_SERVER_PORT)
+    show = sub.add_parser("list", help="Show unexpired leases")
+    show.add_argument("--store", default=None, help="Store spec; default config.CLAIM_STORE")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = ClaimServer(args.host, args.port)
+        print(f"Claim server on {server.address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    else:
+        store = open_store(args.store)
+        for lease in sorted(store.leases(), key=lambda l: l.target):
+            print(f"{lease.target:40} {lease.node:24} {lease.expires_at - time.time():6.1f}s  #{lease.token}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Concurrent Startup Orchestrator
+
+This module starts a WeChatBrowserScraper with its independent startup work
+running side by side instead of one step after another. ChromeDriver
+resolution, building the Chrome options, loading the saved session cookies
+from disk and resolving the site's host name all start at once; Chrome
+launches as soon as its driver and options are ready, without waiting for the
+lookup, which only warms the system resolver cache. Then the saved cookies go
+in through CDP and the browser preconnects to the site. Everything joins at
+the first navigation, which then finds the cookies set, the name resolved and
+a warm connection waiting.
+
+Every phase is timed. StartupTimeline.report() prints when each phase ran and
+marks the critical path, the chain of phases that decided when the first page
+was open, so it is visible what a change shortened and a regression shows up
+as a longer total. Run with concurrent=False to time the same phases
+sequentially for comparison.
+
+Usage:
+    scraper = WeChatBrowserScraper()
+    startup = StartupOrchestrator(scraper)
+    startup.start()                          # returns immediately
+    ...                                      # other setup, e.g. an HTTP client
+    startup.open(config.VFMC_ENTRY_URL)      # joins and navigates
+    print(startup.timeline.report())
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import config
+
+PRECONNECT_SCRIPT = """
+var origin = arguments[0];
+['dns-prefetch', 'preconnect'].forEach(function (rel) {
+  var link = document.createElement('link');
+  link.rel = rel; link.href = origin;
+  (document.head || document.documentElement).appendChild(link);
+});
+"""
+
+
+class PhaseTiming(NamedTuple):
+    """When one startup phase ran, in seconds since the startup began."""
+
+    name: str
+    start: float
+    end: float
+    after: Tuple[str, ...]
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class StartupTimeline:
+    """
+    Thread-safe record of the startup phases and what each one waited for.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """
+        Initialize the timeline; times are measured from now.
+
+        Args:
+            clock: Time source, replaceable in tests
+        """
+        self.clock = clock
+        self.started = clock()
+        self.phases: Dict[str, PhaseTiming] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, after: Tuple[str, ...] = ()):
+        """
+        Time the block as a phase.
+
+        Args:
+            name: Phase name
+            after: Phases this one waited for
+        """
+        start = self.clock() - self.started
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            with self._lock:
+                self.phases[name] = PhaseTiming(name, start, self.clock() - self.started, tuple(after), error)
+
+    @property
+    def total(self) -> float:
+        """Seconds from the start to the end of the last phase."""
+        return max((p.end for p in self.phases.values()), default=0.0)
+
+    def critical_path(self) -> List[PhaseTiming]:
+        """
+        Get the chain of phases that decided when startup finished.
+
+        Starting from the phase that ended last, follows whichever of its
+        dependencies ended last.
+
+        Returns:
+            The phases in the order they ran
+        """
+        if not self.phases:
+            return []
+        node = max(self.phases.values(), key=lambda p: p.end)
+        path = [node]
+        while True:
+            waited = [self.phases[name] for name in node.after if name in self.phases]
+            if not waited:
+                break
+            node = max(waited, key=lambda p: p.end)
+            path.append(node)
+        return path[::-1]
+
+    def breakdown(self) -> Dict[str, float]:
+        """
+        Get each phase's duration in milliseconds, plus the total.
+
+        Returns:
+            Dictionary of phase name to milliseconds, in start order, ending with "total"
+        """
+        phases = sorted(self.phases.values(), key=lambda p: p.start)
+        result = {p.name: round(p.duration * 1000, 1) for p in phases}
+        result["total"] = round(self.total * 1000, 1)
+        return result
+
+    def report(self) -> str:
+        """
+        Format the phases as a table, critical path marked with *.
+
+        Returns:
+            The table as a string
+        """
+        critical = {p.name for p in self.critical_path()}
+        lines = [f"{'phase':<12}{'start':>10}{'end':>10}{'took':>10}  waited for", "-" * 60]
+        for p in sorted(self.phases.values(), key=lambda p: p.start):
+            mark = "*" if p.name in critical else " "
+            lines.append(f"{mark}{p.name:<11}{p.start * 1000:>8.1f}ms{p.end * 1000:>8.1f}ms"
+                         f"{p.duration * 1000:>8.1f}ms  {', '.join(p.after) or '-'}"
+                         + (f"  [{p.error}]" if p.error else ""))
+        lines.append(f"total {self.total * 1000:.1f}ms; * = critical path")
+        return "\n".join(lines)
+
+
+def load_saved_cookies(path: str) -> list:
+    """
+    Read cookies saved by ResilientSession.save_cookies() or SessionManager.
+
+    Args:
+        path: JSON cookie file
+
+    Returns:
+        The cookies, or an empty list if the file does not exist
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StartupOrchestrator:
+    """
+    Runs a scraper's startup phases concurrently and joins them at the first navigation.
+
+    Phases and what they wait for:
+        driver    resolve ChromeDriver (webdriver_manager)
+        options   build the Chrome options
+        session   load the saved cookies from disk
+        dns       resolve the site's host name
+        launch    start Chrome                            after driver, options
+        cookies   set the saved cookies through CDP       after launch, session
+        prewarm   preconnect the browser to the site      after launch
+        navigate  the first navigation                    after everything
+
+    Failures of session, dns, cookies and prewarm are only reported: the
+    navigation still works without them, just slower or logged out. Chrome
+    always resolves the name itself; dns only makes that lookup a cache hit.
+    """
+
+    OPTIONAL = ("session", "dns", "cookies", "prewarm")
+
+    def __init__(
+        self,
+        scraper,
+        url: Optional[str] = None,
+        cookie_file: Optional[str] = None,
+        concurrent: bool = True,
+        resolver: Callable = socket.getaddrinfo
+    ):
+        """
+        Initialize the orchestrator.
+
+        Args:
+            scraper: A WeChatBrowserScraper that has not been started
+            url: Page the first navigation opens; its origin is resolved and preconnected.
+                If None, uses config.VFMC_ENTRY_URL
+            cookie_file: Saved session cookies. If None, uses config default
+            concurrent: Run independent phases in parallel; False runs them one after another
+            resolver: getaddrinfo-compatible resolver, replaceable in tests
+        """
+        self.scraper = scraper
+        self.url = url or config.VFMC_ENTRY_URL
+        self.cookie_file = cookie_file or config.COOKIE_FILE
+        self.concurrent = concurrent
+        self.resolver = resolver
+        self.timeline = StartupTimeline()
+        self.cookies: list = []
+        self.addresses: list = []
+        self._futures: Dict[str, Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # Phases
+
+    def _options(self):
+        return None if self.scraper.backend == "fake" else self.scraper._setup_chrome_options()
+
+    def _session(self):
+        self.cookies = load_saved_cookies(self.cookie_file)
+        return len(self.cookies)
+
+    def _dns(self):
+        parts = urlsplit(self.url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.addresses = self.resolver(parts.hostname, port, type=socket.SOCK_STREAM)
+        return self.addresses
+
+    def _launch(self):
+        self.scraper.launch(self._result("driver"), self._result("options"))
+
+    def _cookies(self):
+        if self.cookies:
+            self.scraper.set_cookies(self.cookies, url=self.url)
+
+    def _prewarm(self):
+        parts = urlsplit(self.url)
+        # Link hints on the blank start page open the connection the first navigation will reuse
+        self.scraper.driver.execute_script(PRECONNECT_SCRIPT, f"{parts.scheme}://{parts.netloc}")
+
+    def _plan(self) -> List[Tuple[str, Callable, Tuple[str, ...]]]:
+        return [
+            ("driver", self.scraper.resolve_driver, ()),
+            ("options", self._options, ()),
+            ("session", self._session, ()),
+            ("dns", self._dns, ()),
+            # A slow lookup must not hold up Chrome; only the navigation waits for it
+            ("launch", self._launch, ("driver", "options")),
+            ("cookies", self._cookies, ("launch", "session")),
+            ("prewarm", self._prewarm, ("launch",)),
+        ]
+
+    def _result(self, name: str):
+        return self._futures[name].result()
+
+    def _run(self, name: str, work: Callable, after: Tuple[str, ...]):
+        for dependency in after:
+            try:
+                self._result(dependency)
+            except Exception:
+                if dependency not in self.OPTIONAL:
+                    raise
+        try:
+            with self.timeline.phase(name, after):
+                return work()
+        except Exception as e:
+            if name not in self.OPTIONAL:
+                raise
+            print(f"Startup phase {name} failed: {e}")
+            return None
+
+    # Public API
+
+    def start(self):
+        """
+        Begin startup. Returns at once when concurrent, after all phases otherwise.
+        """
+        if self._futures:
+            return
+        self.timeline = StartupTimeline()
+        plan = self._plan()
+        if self.concurrent:
+            # One thread per phase: a phase blocks its thread while it waits for its dependencies
+            self._executor = ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix="startup")
+            for name, work, after in plan:
+                self._futures[name] = self._executor.submit(self._run, name, work, after)
+        else:
+            for name, work, after in plan:
+                future = Future()
+                self._futures[name] = future
+                try:
+                    future.set_result(self._run(name, work, after))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def join(self):
+        """
+        Wait for every startup phase; raises the first failure of a required phase.
+        """
+        if not self._futures:
+            self.start()
+        try:
+            for future in self._futures.values():
+                future.result()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def open(self, url: Optional[str] = None) -> StartupTimeline:
+        """
+        Join the startup and make the first navigation.
+
+        Args:
+            url: Page to open. If None, the orchestrator's url
+
+        Returns:
+            The finished timeline
+        """
+        self.join()
+        with self.timeline.phase("navigate", tuple(self._futures)):
+            self.scraper.open_url(url or self.url)
+        return self.timeline
+
+    def close(self):
+        """Wait for any phase still running, then close the browser if it started."""
+        try:
+            self.join()
+        except Exception:
+            pass
+        self.scraper.close()
+
+    def __enter__(self):
+        """Context manager entry."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
@@ -0,0 +1,101 @@
+"""
+Tests for the Parallel Multi-Day Availability Prefetch
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from availability_prefetch import AvailabilityModel, AvailabilityPrefetcher, DayResult
+from fake_driver import FakeDriver, FakeSite
+from page_parser import parse_page
+
+DATES = [f"2026-10-{day}" for day in range(20, 27)]
+TEMPLATE = "http://vfmc/court?date={date}"
+
+
+def day_page(date: str, hour: int) -> str:
+    return (f'<table><tr data-court="3号场" data-date="{date}">'
+            f'<td class="slot free" data-time="{hour}:00-{hour + 1}:00">{hour}:00-{hour + 1}:00</td>'
+            f'</tr></table>')
+
+
+class TestAvailabilityModel(unittest.TestCase):
+    """Test cases for AvailabilityModel"""
+
+    def test_merge_and_failed_day_keeps_records(self):
+        model = AvailabilityModel()
+        model.update(DayResult("2026-10-21", parse_page(day_page("2026-10-21", 19)), None, 0.1))
+        model.update(DayResult("2026-10-20", parse_page(day_page("2026-10-20", 18)), None, 0.1))
+        model.update(DayResult("2026-10-20", [], OSError("down"), 0.1))
+        self.assertEqual(model.free_cells(), [("2026-10-20", "3号场", 18), ("2026-10-21", "3号场", 19)])
+        self.assertIn("2026-10-20", model.errors)
+
+
+class TestHTTPPrefetch(unittest.TestCase):
+    """Test cases for the concurrent HTTP path"""
+
+    def test_week_costs_about_one_fetch(self):
+        def fetch_day(date):
+            time.sleep(0.1 if date != DATES[0] else 0.2)
+            if date == DATES[3]:
+                raise OSError("reset")
+            return parse_page(day_page(date, 18))
+
+        with AvailabilityPrefetcher(fetch_day=fetch_day, max_workers=7) as prefetcher:
+            started = time.monotonic()
+            order = [day.date for day in prefetcher.stream(DATES)]
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual(sorted(order), DATES)
+        # Days stream as they finish, so the slowest one comes last
+        self.assertEqual(order[-1], DATES[0])
+        self.assertEqual(len(prefetcher.model.free_cells()), 6)
+        self.assertEqual(list(prefetcher.model.errors), [DATES[3]])
+
+
+class TestTabPrefetch(unittest.TestCase):
+    """Test cases for the browser tab path"""
+
+    def test_tabs_load_side_by_side(self):
+        site = FakeSite({TEMPLATE.format(date=d): day_page(d, 18) for d in DATES})
+        driver = FakeDriver(site, latency=0.1)
+        scraper = SimpleNamespace(driver=driver, backend="fake")
+        prefetcher = AvailabilityPrefetcher(scraper=scraper, url_template=TEMPLATE)
+
+        started = time.monotonic()
+        model = prefetcher.fetch(DATES)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(sorted(model.days), DATES)
+        self.assertEqual(len(model.free_cells()), 7)
+        self.assertEqual(driver.window_handles, ["tab-1"])
+        self.assertEqual(driver.current_window_handle, "tab-1")
+
+    def test_day_without_rate_limit_token_is_skipped(self):
+        site = FakeSite({TEMPLATE.format(date=d): day_page(d, 18) for d in DATES})
+        driver = FakeDriver(site)
+        scraper = SimpleNamespace(driver=driver, backend="selenium")
+        prefetcher = AvailabilityPrefetcher(scraper=scraper, url_template=TEMPLATE, tab_timeout=0.5)
+        waits = []
+
+        def acquire(url, priority, timeout=None):
+            waits.append(timeout)
+            return DATES[2] not in url
+
+        with patch("availability_prefetch.shared_limiter", return_value=SimpleNamespace(acquire=acquire)):
+            model = prefetcher.fetch(DATES)
+        self.assertEqual(waits, [0.5] * len(DATES))
+        self.assertEqual(list(model.errors), [DATES[2]])
+        self.assertEqual(len(model.days), len(DATES) - 1)
+
+    def test_requires_a_source(self):
+        with self.assertRaises(ValueError):
+            AvailabilityPrefetcher()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for the Booking Candidate Planner
+"""
+
+import unittest
+
+from booking_planner import PlanSolver, PreferenceSpec, plan_attempts
+
+
+def free_day(date, courts, hours):
+    return [(date, court, hour) for court in courts for hour in hours]
+
+
+class TestPlanSolver(unittest.TestCase):
+    """Test cases for PlanSolver"""
+
+    def test_court_preference_dominates(self):
+        cells = free_day("d1", ["A", "B"], range(8, 22))
+        spec = PreferenceSpec(courts=["B", "A"], time_windows=[(18, 20), (8, 12)])
+        plan = plan_attempts(cells, spec)
+
+        self.assertEqual((plan[0].court, plan[0].start_hour), ("B", 18))
+        self.assertEqual(plan[0].rank, 1)
+        self.assertTrue(all(a.court == "B" for a in plan[:6]))
+
+    def test_contiguous_hours_required(self):
+        cells = [("d1", "A", 18), ("d1", "A", 20), ("d1", "A", 21)]
+        spec = PreferenceSpec(courts=["A"], time_windows=[(18, 22)], hours=2)
+        plan = plan_attempts(cells, spec)
+
+        self.assertEqual([(a.start_hour, a.end_hour) for a in plan], [(20, 22)])
+
+    def test_blocks_on_one_court_do_not_overlap(self):
+        cells = free_day("d1", ["A", "B"], range(18, 22))
+        spec = PreferenceSpec(courts=["A", "B"], time_windows=[(18, 22)], hours=2)
+        plan = plan_attempts(cells, spec)
+
+        self.assertEqual([(a.court, a.start_hour) for a in plan], [("A", 18), ("A", 20), ("B", 18), ("B", 20)])
+
+    def test_window_weights_cannot_outrank_courts(self):
+        cells = free_day("d1", ["A", "B"], [8, 18]) + free_day("d2", ["A"], [8])
+        spec = PreferenceSpec(courts=["A", "B"], time_windows=[(18, 19), (8, 9, 5000.0)], dates=["d2", "d1"])
+        plan = plan_attempts(cells, spec)
+
+        self.assertEqual([(a.date, a.court, a.start_hour) for a in plan],
+                         [("d2", "A", 8), ("d1", "A", 8), ("d1", "A", 18), ("d1", "B", 8), ("d1", "B", 18)])
+
+    def test_other_courts_and_dates_filtered(self):
+        cells = free_day("d1", ["A", "Z"], [19]) + free_day("d2", ["A"], [19])
+        spec = PreferenceSpec(courts=["A"], time_windows=[(19, 20)], dates=["d2", "d1"],
+                              allow_other_courts=False)
+        plan = plan_attempts(cells, spec)
+
+        self.assertEqual([(a.date, a.court) for a in plan], [("d2", "A"), ("d1", "A")])
+
+    def test_per_account_limits(self):
+        cells = free_day("d1", ["A", "B", "C"], range(18, 21))
+        spec = PreferenceSpec(courts=["A", "B", "C"], accounts=["u1", "u2"], max_per_account=2)
+        plan = plan_attempts(cells, spec)
+
+        self.assertEqual(len(plan), 4)
+        self.assertEqual([a.account for a in plan], ["u1", "u2", "u1", "u2"])
+
+    def test_replanning_reuses_the_index(self):
+        cells = free_day("d1", [f"c{i}" for i in range(12)], range(8, 22))
+        solver = PlanSolver(PreferenceSpec(courts=["c3", "c5"], time_windows=[(18, 21)],
+                                           hours=2, max_attempts=10))
+        grid = solver.index_grid(cells)
+
+        plan = solver.plan(grid)
+        self.assertEqual(len(plan), 10)
+        self.assertEqual(solver.plan(grid), plan)
+        self.assertEqual(solver.plan(cells), plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
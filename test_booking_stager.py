@@ -0,0 +1,186 @@
+"""
+Tests for Pre-Serialized Booking Requests
+
+Requests are fired at a local socket server that records the raw bytes it receives.
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from urllib.parse import parse_qs
+
+from booking_planner import BookingAttempt
+from booking_stager import BookingStager, scrape_csrf_token
+from rate_limiter import RateLimiter
+
+
+class RecordingServer:
+    """Accepts connections and answers each request with 200 OK, keeping the raw bytes"""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.received = []
+        self.accepted = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.accepted += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = conn.recv(65536)
+            if not chunk:
+                conn.close()
+                return
+            data += chunk
+        head, _, body = data.partition(b"\r\n\r\n")
+        length = int([line.split(b":")[1] for line in head.split(b"\r\n")
+                      if line.lower().startswith(b"content-length")][0])
+        while len(body) < length:
+            body += conn.recv(65536)
+        with self._lock:
+            self.received.append((head.decode("latin-1"), body))
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        conn.close()
+
+    def wait_accepted(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while self.accepted < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return self.accepted
+
+    def close(self):
+        self.sock.close()
+
+
+class TestBookingStager(unittest.TestCase):
+    """Test cases for BookingStager"""
+
+    def setUp(self):
+        self.server = RecordingServer()
+        self.url = f"http://127.0.0.1:{self.server.port}/Book/Submit?x=1"
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_scrape_csrf_token(self):
+        html = '<form><input type="hidden" name="__RequestVerificationToken" value="tok123" /></form>'
+        self.assertEqual(scrape_csrf_token(html), "tok123")
+        self.assertEqual(scrape_csrf_token('<meta name="csrf-token" content="abc">'), "abc")
+        self.assertIsNone(scrape_csrf_token("<html></html>"))
+
+    def test_serialized_request(self):
+        stager = BookingStager(cookies=[{"name": "sid", "value": "s1"}])
+        stager.set_csrf_token("tok")
+        request = stager.stage(self.url, form={"court": "3号场", "date": "2026-10-20"}, key="k1")
+        head, _, body = request.payload.partition(b"\r\n\r\n")
+        head = head.decode("latin-1")
+        self.assertTrue(head.startswith("POST /Book/Submit?x=1 HTTP/1.1\r\n"))
+        self.assertIn("Cookie: sid=s1", head)
+        self.assertIn("RequestVerificationToken: tok", head)
+        self.assertIn("Idempotency-Key: k1", head)
+        self.assertIn(f"Content-Length: {len(body)}", head)
+        form = parse_qs(body.decode("utf-8"))
+        self.assertEqual(form["court"], ["3号场"])
+        self.assertEqual(form["__RequestVerificationToken"], ["tok"])
+
+    def test_cookie_swap_restages(self):
+        stager = BookingStager(cookies=[{"name": "sid", "value": "old"}])
+        request = stager.stage(self.url, json_body={"court": 3})
+        stager.set_cookies([{"name": "sid", "value": "new"}])
+        self.assertIn(b"Cookie: sid=new", request.payload)
+        self.assertNotIn(b"sid=old", request.payload)
+
+    def test_fire_on_prewarmed_connections(self):
+        attempts = [BookingAttempt(i, None, "2026-10-20", c, 19, 20, 0.0)
+                    for i, c in enumerate(["3", "5"])]
+        with BookingStager() as stager:
+            stager.stage_attempts(self.url, attempts, lambda a: {"court": a.court, "start": a.start_hour})
+            stager.prewarm()
+            self.assertEqual(self.server.wait_accepted(2), 2)
+            fired = stager.fire()
+            stager.collect(timeout=5)
+
+        self.assertEqual([r.response[0] for r in fired], [200, 200])
+        self.assertEqual(self.server.accepted, 2)  # no new connections at fire time
+        bodies = sorted(parse_qs(body.decode())["court"][0] for _, body in self.server.received)
+        self.assertEqual(bodies, ["3", "5"])
+        report = stager.timing_report()
+        self.assertEqual(len(report["requests"]), 2)
+        self.assertGreaterEqual(report["min_us"], 0)
+
+    def test_fire_reconnects_lost_connection(self):
+        with BookingStager() as stager:
+            request = stager.stage(self.url, form={"court": "3"})
+            stale, peer = socket.socketpair()
+            peer.close()
+            request.sock = stale
+            fired = stager.fire()
+            stager.collect(timeout=5)
+        self.assertIsNone(fired[0].error)
+        self.assertEqual(request.response[2], b"ok")
+        self.assertEqual(stale.fileno(), -1)  # the dead socket was closed, not leaked
+
+    def test_connection_alive_peeks_instead_of_trusting_readability(self):
+        ours, server = socket.socketpair()
+        try:
+            self.assertTrue(BookingStager._connection_alive(ours))
+            # Unsolicited bytes, like a TLS 1.3 session ticket, leave the connection usable
+            server.sendall(b"\x17\x03\x03")
+            time.sleep(0.01)
+            self.assertTrue(BookingStager._connection_alive(ours))
+            self.assertEqual(ours.recv(3), b"\x17\x03\x03")
+            server.close()
+            time.sleep(0.01)
+            self.assertFalse(BookingStager._connection_alive(ours))
+        finally:
+            ours.close()
+
+    def test_prewarm_reserves_tokens_so_fire_never_waits(self):
+        tmp_dir = tempfile.mkdtemp()
+        limiter = RateLimiter(path=os.path.join(tmp_dir, "limits"), limits={"127.0.0.1": (50.0, 1)})
+        try:
+            with BookingStager(limiter=limiter) as stager:
+                for court in ("3", "5", "7"):
+                    stager.stage(self.url, form={"court": court})
+                stager.prewarm()
+                self.assertTrue(all(r.reserved for r in stager.staged))
+                # The bucket is empty now; staging more than the burst must still go out at once
+                fired = stager.fire()
+                stager.collect(timeout=5)
+            self.assertEqual([r.error for r in fired], [None, None, None])
+
+            with BookingStager(limiter=limiter) as stager:
+                stager.stage(self.url, form={"court": "9"})
+                self.assertIsInstance(stager.fire()[0].error, BlockingIOError)
+        finally:
+            limiter.close()
+            shutil.rmtree(tmp_dir)
+
+    def test_fire_at_waits_for_instant(self):
+        with BookingStager() as stager:
+            stager.stage(self.url, form={"court": "3"})
+            stager.prewarm()
+            when = time.time() + 0.05
+            stager.fire_at(when)
+            self.assertGreaterEqual(time.time(), when)
+
+
+if __name__ == '__main__':
+    unittest.main()
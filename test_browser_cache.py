@@ -0,0 +1,162 @@
+"""
+Tests for the Persistent Browser Cache
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import browser_cache
+from browser_cache import CacheStats, cache_arguments, warmup, warmup_in_background
+
+
+def network_events(request_id, url, size, from_cache=False):
+    return [
+        ("Network.responseReceived", {"requestId": request_id, "response": {
+            "url": url, "status": 200, "fromDiskCache": from_cache}}),
+        ("Network.loadingFinished", {"requestId": request_id, "encodedDataLength": 0 if from_cache else size}),
+    ]
+
+
+class FakeDriver:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get_log(self, kind):
+        entries, self.entries = self.entries, []
+        return entries
+
+
+class FakeScraper:
+    """Selenium-like scraper whose page loads produce performance-log entries"""
+
+    def __init__(self, assets, from_cache=False):
+        self.assets = assets
+        self.from_cache = from_cache
+        self.driver = FakeDriver([])
+        self.visited = []
+
+    def open_url(self, url):
+        self.visited.append(url)
+        if url == "about:blank":
+            return
+        for i, (asset, size) in enumerate(self.assets.items()):
+            for method, params in network_events(f"{url}-{i}", asset, size, self.from_cache):
+                self.driver.entries.append(
+                    {"message": json.dumps({"message": {"method": method, "params": params}})})
+
+
+class FakeTabScraper(FakeScraper):
+    """CDP-like scraper whose tabs record their own page loads and thread"""
+
+    def __init__(self, assets):
+        super().__init__(assets)
+        self.tabs = []
+        self.threads = set()
+        self.closed = False
+
+    def open_url(self, url):
+        self.threads.add(threading.current_thread())
+        super().open_url(url)
+
+    def open_tab(self):
+        tab = FakeTabScraper(self.assets)
+        self.tabs.append(tab)
+        return tab
+
+    def close(self):
+        self.closed = True
+
+
+class TestBrowserCache(unittest.TestCase):
+    """Test cases for the browser cache helpers"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for base in [base for base in browser_cache._claimed if base.startswith(self.tmp_dir)]:
+            browser_cache._claimed.pop(base)[1].close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_arguments(self):
+        args = cache_arguments(self.tmp_dir, size=1024)
+        slot = os.path.join(os.path.abspath(self.tmp_dir), "0")
+        self.assertIn(f"--disk-cache-dir={slot}", args)
+        self.assertIn("--disk-cache-size=1024", args)
+        # Every browser of this process reuses its slot; Chrome creates the slot directory itself
+        self.assertIn(f"--disk-cache-dir={slot}", cache_arguments(self.tmp_dir))
+        self.assertFalse(os.path.exists(slot))
+
+    def test_concurrent_processes_get_separate_slots(self):
+        base = os.path.join(self.tmp_dir, "shared")
+        os.makedirs(base)
+        # Stand in for another running process that holds slot 0
+        with open(os.path.join(base, "0.lock"), "a+") as other:
+            self.assertTrue(browser_cache._try_lock(other))
+            self.assertEqual(browser_cache.process_cache_dir(base), os.path.join(base, "1"))
+
+    def test_performance_log_only_for_cache_stats(self):
+        from wechat_scraper import WeChatBrowserScraper
+        with patch("config.BROWSER_CACHE_DIR", self.tmp_dir):
+            plain = WeChatBrowserScraper()._setup_chrome_options().to_capabilities()
+            stats = WeChatBrowserScraper(cache_stats=True)._setup_chrome_options().to_capabilities()
+        self.assertNotIn("goog:loggingPrefs", plain)
+        self.assertEqual(stats["goog:loggingPrefs"], {"performance": "ALL"})
+
+    def test_hits_credited_with_saved_bytes(self):
+        first = CacheStats(self.tmp_dir)
+        for method, params in network_events("1", "http://x/app.js", 5000):
+            first.feed(method, params)
+        first.save()
+        self.assertEqual(first.report()["bytes_downloaded"], 5000)
+        self.assertEqual(first.report()["hit_ratio"], 0.0)
+
+        second = CacheStats(self.tmp_dir)
+        for method, params in network_events("1", "http://x/app.js", 5000, from_cache=True):
+            second.feed(method, params)
+        second.feed("Network.responseReceived", {"requestId": "2", "response": {"url": "http://x/new.css",
+                                                                               "status": 200}})
+        second.feed("Network.requestServedFromCache", {"requestId": "2"})
+        second.feed("Network.loadingFinished", {"requestId": "2", "encodedDataLength": 0})
+        report = second.report()
+        self.assertEqual(report["hits"], 2)
+        self.assertEqual(report["hit_ratio"], 1.0)
+        self.assertEqual(report["bytes_saved"], 5000)
+
+    def test_ignores_data_urls(self):
+        stats = CacheStats(self.tmp_dir)
+        for method, params in network_events("1", "data:image/png;base64,xx", 10):
+            stats.feed(method, params)
+        self.assertEqual(stats.report()["requests"], 0)
+
+    def test_warmup_then_cached_run(self):
+        assets = {"http://x/app.js": 4000, "http://x/site.css": 1000}
+        stats = warmup(FakeScraper(assets), urls=["http://x/"], stats=CacheStats(self.tmp_dir))
+        self.assertEqual(stats.report()["bytes_downloaded"], 5000)
+
+        scraper = FakeScraper(assets, from_cache=True)
+        stats = warmup(scraper, urls=["http://x/"], stats=CacheStats(self.tmp_dir))
+        self.assertEqual(scraper.visited, ["http://x/", "about:blank"])
+        self.assertEqual(stats.report()["hit_ratio"], 1.0)
+        self.assertEqual(stats.report()["bytes_saved"], 5000)
+
+    def test_background_warmup_uses_its_own_tab(self):
+        scraper = FakeTabScraper({"http://x/app.js": 4000})
+        with patch("config.BROWSER_CACHE_DIR", self.tmp_dir):
+            warmup_in_background(scraper, urls=["http://x/"]).join(5)
+        tab = scraper.tabs[0]
+        self.assertEqual(scraper.visited, [])
+        self.assertEqual(tab.visited, ["http://x/", "about:blank"])
+        self.assertNotIn(threading.main_thread(), tab.threads)
+        self.assertTrue(tab.closed)
+        with self.assertRaises(TypeError):
+            warmup_in_background(FakeScraper({}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Tests for the Direct CDP Browser Scraper
+
+The CDP connection is exercised against a fake websocket, so no Chrome is needed.
+"""
+
+import json
+import queue
+import unittest
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest.mock import patch
+
+from selenium.common.exceptions import TimeoutException
+
+from cdp_scraper import CDPBrowserScraper, CDPConnection, CDPError
+
+
+class FakeWebSocket:
+    """Answers commands through a handler; replies can be delivered out of order"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.sent = []
+        self.inbox = queue.Queue()
+
+    def send(self, payload):
+        message = json.loads(payload)
+        self.sent.append(message)
+        for reply in self.handler(message):
+            self.inbox.put(json.dumps(reply))
+
+    def recv(self):
+        item = self.inbox.get()
+        if item is None:
+            raise ConnectionError("closed")
+        return item
+
+    def push(self, message):
+        self.inbox.put(json.dumps(message))
+
+    def close(self):
+        self.inbox.put(None)
+
+
+class TestCDPConnection(unittest.TestCase):
+    """Test cases for CDPConnection"""
+
+    def test_pipelined_replies_matched_by_id(self):
+        held = []
+
+        def handler(message):
+            held.append(message)
+            if len(held) < 3:
+                return []
+            # Answer all three at once, in reverse order
+            return [{"id": m["id"], "result": {"echo": m["params"]["n"]}} for m in reversed(held)]
+
+        conn = CDPConnection(FakeWebSocket(handler))
+        results = conn.batch([("Runtime.evaluate", {"n": i}) for i in range(3)], timeout=2)
+        conn.close()
+
+        self.assertEqual([r["echo"] for r in results], [0, 1, 2])
+
+    def test_error_reply_raises(self):
+        conn = CDPConnection(FakeWebSocket(
+            lambda m: [{"id": m["id"], "error": {"code": -32000, "message": "boom"}}]))
+        with self.assertRaises(CDPError):
+            conn.call("Page.navigate", {"url": "x"}, timeout=2)
+        conn.close()
+
+    def test_events_and_expect(self):
+        ws = FakeWebSocket(lambda m: [])
+        conn = CDPConnection(ws)
+        seen = []
+        conn.on("Network.requestWillBeSent", seen.append)
+        loaded = conn.expect("Page.loadEventFired", lambda p: p["timestamp"] > 1)
+
+        ws.push({"method": "Network.requestWillBeSent", "params": {"requestId": "1"}})
+        ws.push({"method": "Page.loadEventFired", "params": {"timestamp": 1}})
+        ws.push({"method": "Page.loadEventFired", "params": {"timestamp": 2}})
+
+        self.assertEqual(loaded.result(2), {"timestamp": 2})
+        self.assertEqual(seen, [{"requestId": "1"}])
+        conn.close()
+
+    def test_timed_out_commands_are_forgotten(self):
+        conn = CDPConnection(FakeWebSocket(lambda m: []))
+        with self.assertRaises(FutureTimeoutError):
+            conn.call("Page.navigate", {"url": "x"}, timeout=0.05)
+        with self.assertRaises(FutureTimeoutError):
+            conn.batch([("Page.enable", {}), ("Network.enable", {})], timeout=0.05)
+        self.assertEqual(conn._pending, {})
+        conn.close()
+
+    def test_pending_fail_when_connection_drops(self):
+        ws = FakeWebSocket(lambda m: [])
+        conn = CDPConnection(ws)
+        future = conn.send("Page.enable")
+        ws.close()
+        with self.assertRaises(ConnectionError):
+            future.result(2)
+
+
+class TestCDPBrowserScraper(unittest.TestCase):
+    """Test cases for CDPBrowserScraper"""
+
+    def attach(self, handler):
+        scraper = CDPBrowserScraper(timeout=2)
+        scraper.connection = CDPConnection(FakeWebSocket(handler))
+        self.addCleanup(scraper.connection.close)
+        return scraper
+
+    def test_runtime_error_before_start(self):
+        scraper = CDPBrowserScraper()
+        with self.assertRaises(RuntimeError):
+            scraper.open_url("https://example.com")
+        with self.assertRaises(RuntimeError):
+            scraper.get_page_source()
+
+    def test_execute_script_uses_selenium_convention(self):
+        def handler(m):
+            return [{"id": m["id"], "result": {"result": {"type": "number", "value": 3}}}]
+        scraper = self.attach(handler)
+
+        self.assertEqual(scraper.execute_script("return arguments[0] + arguments[1]", 1, 2), 3)
+        expression = scraper.connection.ws.sent[-1]["params"]["expression"]
+        self.assertIn("return arguments[0] + arguments[1]", expression)
+        self.assertIn("[1, 2]", expression)
+
+    def test_get_cookies_in_selenium_format(self):
+        cookie = {"name": "sid", "value": "v", "domain": "vfmc.tju.edu.cn", "path": "/",
+                  "expires": 1900000000.5, "session": False, "httpOnly": True}
+        scraper = self.attach(lambda m: [{"id": m["id"], "result": {"cookies": [cookie]}}])
+
+        cookies = scraper.get_cookies()
+        self.assertEqual(cookies[0]["expiry"], 1900000000)
+        self.assertTrue(cookies[0]["httpOnly"])
+
+    def test_open_url_same_document_and_failed_navigation(self):
+        def handler(m):
+            if m["method"] != "Page.navigate":
+                return []
+            if m["params"]["url"].endswith("#grid"):
+                # Same-document navigations carry no loaderId and fire no load event
+                return [{"id": m["id"], "result": {"frameId": "F"}}]
+            return [{"id": m["id"], "result": {"frameId": "F", "loaderId": "L", "errorText": "net::ERR_FAILED"}}]
+        scraper = self.attach(handler)
+
+        scraper.open_url("http://vfmc.test/page#grid")
+        with self.assertRaises(CDPError):
+            scraper.open_url("http://vfmc.test/down")
+        self.assertEqual(scraper.connection._listeners.get("Page.loadEventFired"), [])
+
+    def test_wait_releases_unmatched_elements_and_times_out(self):
+        def handler(m):
+            if m["method"] == "Runtime.evaluate":
+                return [{"id": m["id"], "result": {"result": {"type": "object", "objectId": f"obj-{m['id']}"}}}]
+            if m["method"] == "Runtime.callFunctionOn":
+                return [{"id": m["id"], "result": {"result": {"type": "boolean", "value": False}}}]
+            return [{"id": m["id"], "result": {}}]
+        scraper = self.attach(handler)
+
+        with self.assertRaises(TimeoutException):
+            scraper.wait_for_element_clickable("id", "submit", timeout=0.2)
+        sent = scraper.connection.ws.sent
+        found = [m["id"] for m in sent if m["method"] == "Runtime.evaluate"]
+        released = [m["params"]["objectId"] for m in sent if m["method"] == "Runtime.releaseObject"]
+        self.assertEqual(released, [f"obj-{i}" for i in found])
+
+    def test_tab_closes_only_itself(self):
+        scraper = self.attach(lambda m: [{"id": m["id"], "result": {"targetId": "T2"}}])
+        scraper._port = 9222
+        tab_ws = FakeWebSocket(lambda m: [{"id": m["id"], "result": {}}])
+        opened = []
+
+        def connect(url, timeout=10):
+            opened.append(url)
+            return CDPConnection(tab_ws)
+
+        with patch.object(CDPConnection, "connect", side_effect=connect):
+            tab = scraper.open_tab()
+        self.assertEqual(opened, ["ws://127.0.0.1:9222/devtools/page/T2"])
+        self.assertIn("Network.enable", [m["method"] for m in tab_ws.sent])
+        tab.close()
+        self.assertEqual(tab_ws.sent[-1]["method"], "Page.close")
+        self.assertIsNotNone(scraper.connection)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+"""
+Tests for the DOM Change Journal
+"""
+
+import json
+import re
+import time
+import unittest
+from unittest.mock import patch
+
+from selenium.webdriver.common.by import By
+
+from dom_journal import install_script
+from fake_driver import FakeDriver, FakeSite
+from wechat_scraper import WeChatBrowserScraper
+
+BASE = "http://vfmc.test"
+ROWS = "".join(f"<tr><td class='court'>{c}号场</td>"
+               + "".join(f"<td class='slot' data-hour='{h}'>可预约</td>" for h in range(8, 22)) + "</tr>"
+               for c in range(1, 13))
+GRID = f"<html><body><div id='status'>ok</div><table id='grid'>{ROWS}</table></body></html>"
+INSTALL = "/* dom-journal install */"
+
+
+class JournalDriver(FakeDriver):
+    """FakeDriver that runs the journal's install and drain scripts against its own DOM changes"""
+
+    _TAB_STATE = FakeDriver._TAB_STATE + ("dom_journal",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # State the install script keeps in window.__domJournal of the current document
+        self.dom_journal = None
+        self.add_script_stub(r"^(?:return\s+)?/\* dom-journal install", self._install)
+        self.add_script_stub(r"^/\* dom-journal drain", self._drain)
+
+    @staticmethod
+    def _journal_for(source: str) -> dict:
+        # The limits are the install script's arguments
+        limit, max_html = re.search(r"\}\)\((\d+), (\d+)\);\s*$", source).groups()
+        return {"doc": f"doc-{time.monotonic_ns():x}", "entries": [], "keys": {}, "overflow": False,
+                "limit": int(limit), "max_html": int(max_html)}
+
+    @staticmethod
+    def _path(element) -> str:
+        # Same addressing as the install script: nearest id, then child indexes
+        parts = []
+        node = element
+        while node is not None and node.tag_name not in ("html", "#document"):
+            if node.attrs.get("id"):
+                parts.insert(0, "#" + node.attrs["id"])
+                break
+            parts.insert(0, str(node.parent.elements().index(node)))
+            node = node.parent
+        return "/".join(parts)
+
+    def _install(self, driver, *args):
+        fresh = self._journal_for(self.executed_scripts[-1])
+        if self.dom_journal is None:
+            self.dom_journal = fresh
+        else:
+            self.dom_journal.update(limit=fresh["limit"], max_html=fresh["max_html"])
+        return self.dom_journal["doc"]
+
+    def _drain(self, driver, *args):
+        journal = self.dom_journal
+        if journal is None:
+            return None
+        out = {"doc": journal["doc"], "changes": journal["entries"], "overflow": journal["overflow"]}
+        journal.update(entries=[], keys={}, overflow=False)
+        return out
+
+    def get(self, url: str):
+        super().get(url)
+        installs = [s for s in self.new_document_scripts if s.startswith(INSTALL)]
+        # Every registration runs; the first installs the observer, the last one's limits apply
+        self.dom_journal = self._journal_for(installs[-1]) if installs else None
+
+    def on_mutation(self, kind, element, name=None, value=None):
+        journal = self.dom_journal
+        if journal is None:
+            return
+        path = self._path(element)
+        if kind == "a":
+            key, entry = f"a{path} {name}", ["a", path, name, value]
+        elif kind == "t":
+            key, entry = f"t{path}", ["t", path, element.get_attribute("textContent")]
+        else:
+            html = element.get_attribute("innerHTML")
+            key, entry = f"c{path}", ["c", path, html if len(html) <= journal["max_html"] else None]
+        if key in journal["keys"]:
+            old = journal["keys"].pop(key)
+            del journal["entries"][old]
+            journal["keys"] = {k: i - 1 if i > old else i for k, i in journal["keys"].items()}
+        elif len(journal["entries"]) >= journal["limit"]:
+            journal["overflow"] = True
+            return
+        journal["keys"][key] = len(journal["entries"])
+        journal["entries"].append(entry)
+
+
+class TestDomJournal(unittest.TestCase):
+    """Test cases for start_change_journal and drain_changes"""
+
+    def setUp(self):
+        # Recycled browsers are fake-backend drivers too, so patch the class rather than one instance
+        patcher = patch("fake_driver.FakeDriver", JournalDriver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scraper = WeChatBrowserScraper(backend="fake")
+        self.scraper.start()
+        self.scraper.driver.site = FakeSite({BASE + "/grid": GRID, BASE + "/other": GRID})
+        self.scraper.start_change_journal()
+        self.scraper.open_url(BASE + "/grid")
+        self.assertTrue(self.scraper.drain_changes()["reset"])
+
+    def tearDown(self):
+        self.scraper.close()
+
+    def cell(self, court, hour):
+        return self.scraper.driver.find_element(
+            By.XPATH, f"//table[@id='grid']/tr[{court}]/td[@data-hour='{hour}']")
+
+    def test_drain_returns_only_new_changes(self):
+        self.assertEqual(self.scraper.drain_changes(), {"changes": [], "overflow": False, "reset": False})
+        self.cell(3, 18).set_attribute("class", "slot booked")
+        self.scraper.driver.find_element(By.ID, "status").set_text("刷新中")
+        delta = self.scraper.drain_changes()
+        self.assertFalse(delta["reset"])
+        self.assertEqual(delta["changes"], [["a", "#grid/2/11", "class", "slot booked"], ["t", "#status", "刷新中"]])
+        self.assertEqual(self.scraper.drain_changes()["changes"], [])
+        # The delta is a small fraction of what re-reading the page transfers
+        self.assertLess(len(json.dumps(delta, ensure_ascii=False)) * 20, len(self.scraper.get_page_source()))
+
+    def test_changes_to_the_same_cell_are_coalesced(self):
+        cell = self.cell(1, 8)
+        for state in ("slot held", "slot booked", "slot"):
+            cell.set_attribute("class", state)
+        cell.set_text("已预约")
+        cell.set_attribute("title", None)
+        self.assertEqual(self.scraper.drain_changes()["changes"],
+                         [["a", "#grid/0/1", "class", "slot"], ["t", "#grid/0/1", "已预约"],
+                          ["a", "#grid/0/1", "title", None]])
+
+    def test_coalesced_entry_moves_after_later_changes(self):
+        self.cell(1, 8).set_attribute("class", "v1")
+        self.scraper.driver.find_element(By.ID, "grid").set_attribute("data-rendered", "1")
+        self.cell(1, 8).set_attribute("class", "v2")
+        # Replaying in order must end on v2, after whatever changed in between
+        self.assertEqual(self.scraper.drain_changes()["changes"],
+                         [["a", "#grid", "data-rendered", "1"], ["a", "#grid/0/1", "class", "v2"]])
+
+    def test_restart_replaces_the_registration(self):
+        self.scraper.start_change_journal(limit=5)
+        self.scraper.start_change_journal(limit=6)
+        journal_scripts = [s for s in self.scraper.driver.new_document_scripts if s.startswith(INSTALL)]
+        self.assertEqual(len(journal_scripts), 1)
+        self.assertIn("(6, ", journal_scripts[0])
+
+    def test_overflow_and_large_children(self):
+        self.scraper.start_change_journal(limit=5)
+        self.scraper.open_url(BASE + "/other")
+        self.scraper.drain_changes()
+        for hour in range(8, 15):
+            self.cell(1, hour).set_attribute("class", "slot booked")
+        delta = self.scraper.drain_changes()
+        self.assertTrue(delta["overflow"])
+        self.assertEqual(len(delta["changes"]), 5)
+        self.assertFalse(self.scraper.drain_changes()["overflow"])
+        self.scraper.driver.find_element(By.ID, "grid").set_text("x" * 3000)
+        self.assertEqual(self.scraper.drain_changes()["changes"], [["c", "#grid", None]])
+
+    def test_navigation_and_recycle_reset(self):
+        self.cell(1, 8).set_attribute("class", "slot booked")
+        self.scraper.open_url(BASE + "/other")
+        self.assertEqual(self.scraper.drain_changes(), {"changes": [], "overflow": False, "reset": True})
+        site = self.scraper.driver.site
+        self.scraper.recycle()
+        # The new browser has no journal registered until the next drain puts it back
+        self.scraper.driver.site = site
+        self.scraper.open_url(BASE + "/other")
+        self.assertTrue(self.scraper.drain_changes()["reset"])
+        self.cell(2, 9).set_attribute("class", "slot booked")
+        delta = self.scraper.drain_changes()
+        self.assertFalse(delta["reset"])
+        self.assertEqual(delta["changes"], [["a", "#grid/1/2", "class", "slot booked"]])
+
+    def test_install_script_limits(self):
+        self.assertTrue(install_script(7, 99).rstrip().endswith("})(7, 99);"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for the Fake In-Memory Driver
+"""
+
+import time
+import unittest
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+import config
+from fake_driver import FakeDriver, FakeSite
+from page_parser import classify_page
+from wechat_scraper import WeChatBrowserScraper
+
+PAGE = """<html><head><title>场地预订</title></head><body>
+<div id="main">
+  <ul class="courts">
+    <li class="court free" data-court="3">3号场 <a href="/book?court=3">预订</a></li>
+    <li class="court booked" data-court="5">5号场</li>
+    <li class="court free" style="display:none" data-court="7">7号场</li>
+  </ul>
+  <form><input name="phone" type="text"><input name="token" type="hidden" value="t1">
+  <button id="go" disabled>提交</button></form>
+</div>
+</body></html>"""
+
+
+class TestFakeDriver(unittest.TestCase):
+    """Test cases for FakeDriver"""
+
+    def setUp(self):
+        self.site = FakeSite({"http://site/": PAGE, "/book": "<html><body><p id='ok'>已预订</p></body></html>"})
+        self.driver = FakeDriver(self.site)
+        self.driver.get("http://site/")
+
+    def test_locators(self):
+        d = self.driver
+        self.assertEqual(d.title, "场地预订")
+        self.assertEqual(d.find_element(By.ID, "main").tag_name, "div")
+        self.assertEqual(len(d.find_elements(By.CLASS_NAME, "court")), 3)
+        self.assertEqual(d.find_element(By.NAME, "token").get_attribute("value"), "t1")
+        self.assertEqual([e.get_attribute("data-court") for e in d.find_elements(By.CSS_SELECTOR, "ul.courts > li.free")],
+                         ["3", "7"])
+        self.assertEqual(d.find_element(By.CSS_SELECTOR, "li[data-court='5']").text, "5号场")
+        self.assertEqual(d.find_element(By.XPATH, "/html/body/div/ul/li[2]").get_attribute("data-court"), "5")
+        self.assertEqual(d.find_element(By.XPATH, "//li[contains(@class,'booked')]").text, "5号场")
+        self.assertEqual(d.find_element(By.XPATH, "//a[text()='预订']/..").get_attribute("data-court"), "3")
+        self.assertEqual(d.find_element(By.LINK_TEXT, "预订").get_attribute("href"), "/book?court=3")
+        li = d.find_element(By.CSS_SELECTOR, "li.court")
+        self.assertEqual(li.find_element(By.XPATH, ".//a").text, "预订")
+        with self.assertRaises(NoSuchElementException):
+            d.find_element(By.ID, "missing")
+
+    def test_state_and_interaction(self):
+        d = self.driver
+        self.assertFalse(d.find_elements(By.CLASS_NAME, "court")[2].is_displayed())
+        self.assertFalse(d.find_element(By.NAME, "token").is_displayed())
+        self.assertFalse(d.find_element(By.ID, "go").is_enabled())
+        phone = d.find_element(By.NAME, "phone")
+        phone.send_keys("138", "0000")
+        self.assertEqual(phone.get_attribute("value"), "1380000")
+        self.assertIn('value="1380000"', d.page_source)
+        phone.clear()
+        self.assertEqual(phone.get_attribute("value"), "")
+
+        d.find_element(By.LINK_TEXT, "预订").click()
+        self.assertEqual(d.current_url, "http://site/book?court=3")
+        self.assertEqual(d.find_element(By.ID, "ok").text, "已预订")
+
+    def test_click_handlers_and_cookies(self):
+        def login(driver, element):
+            driver.add_cookie({"name": "sid", "value": "abc"})
+            driver.get("/book")
+
+        self.site.on_click(By.ID, "go", login)
+        self.driver.find_element(By.ID, "go").click()
+        self.assertEqual(self.driver.get_cookie("sid")["domain"], "site")
+        self.assertEqual(self.driver.current_url, "http://site/book")
+        self.driver.delete_all_cookies()
+        self.assertEqual(self.driver.get_cookies(), [])
+
+    def test_script_stubs(self):
+        d = self.driver
+        self.assertEqual(d.execute_script("return document.readyState"), "complete")
+        self.assertIn("MicroMessenger", d.execute_script("return navigator.userAgent"))
+        self.assertIsNone(d.execute_script("window.foo = 1"))
+        d.add_script_stub(r"window\.foo", lambda driver, *args: 42)
+        self.assertEqual(d.execute_script("return window.foo"), 42)
+        self.assertEqual(d.executed_scripts[-1], "return window.foo")
+
+    def test_scraper_flow_on_captures(self):
+        started = time.perf_counter()
+        with WeChatBrowserScraper(backend="fake") as scraper:
+            scraper.open_url(config.VFMC_ENTRY_URL)
+            self.assertEqual(classify_page(scraper.get_page_source()), "user_choose")
+            scraper.wait_for_element_clickable(By.XPATH, config.VFMC_LOGIN_XPATH).click()
+            self.assertTrue(scraper.driver.current_url.endswith("/User/UserChoose?LoginType=1"))
+            self.assertEqual(classify_page(scraper.get_page_source()), "wechat_block")
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
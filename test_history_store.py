@@ -0,0 +1,90 @@
+"""
+Tests for the Availability History Store
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from history_store import FREE, TAKEN, HistoryStore
+
+T0 = time.mktime((2026, 10, 1, 12, 0, 0, 0, 0, -1))
+
+
+class TestHistoryStore(unittest.TestCase):
+    """Test cases for HistoryStore"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "history.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_only_changes_are_recorded(self):
+        with HistoryStore(self.path, flush_interval=0) as store:
+            self.assertEqual(store.observe({("d1", "A", 18): TAKEN}, T0), 1)
+            self.assertEqual(store.observe({("d1", "A", 18): TAKEN}, T0 + 60), 0)
+            self.assertEqual(store.observe({("d1", "A", 18): FREE}, T0 + 120), 1)
+            store.flush()
+
+            events = store.events(court="A")
+        self.assertEqual([(e[0], e[4], e[5]) for e in events],
+                         [(T0, TAKEN, None), (T0 + 120, FREE, TAKEN)])
+
+    def test_observe_free_marks_missing_slots_taken(self):
+        with HistoryStore(self.path, flush_interval=0) as store:
+            store.observe_free([("d1", "A", 18), ("d2", "A", 18)], ["d1", "d2"], T0)
+            store.observe_free([], ["d1"], T0 + 30)
+            store.flush()
+
+            self.assertEqual(store.events(date="d1")[-1][4], TAKEN)
+            self.assertEqual(store.events(date="d2")[-1][4], FREE)
+            self.assertEqual(store.free_durations(court="A")[0][4], 30)
+
+    def test_state_survives_reopen(self):
+        with HistoryStore(self.path, flush_interval=0) as store:
+            store.observe({("d1", "A", 18): FREE}, T0)
+        with HistoryStore(self.path, flush_interval=0) as store:
+            self.assertEqual(store.observe({("d1", "A", 18): FREE}, T0 + 5), 0)
+
+    def test_freeups_by_hour_over_many_events(self):
+        with HistoryStore(self.path, flush_interval=0) as store:
+            for i in range(20000):
+                status = FREE if i % 2 else TAKEN
+                store.observe({("d1", "A", 18): status, ("d1", "B", 18): TAKEN}, T0 + i * 180)
+            store.flush()
+            by_hour = store.freeups_by_hour(court="A")
+
+        self.assertEqual(sum(by_hour.values()), 10000)
+        self.assertEqual(len(by_hour), 24)
+
+    def test_released_slots_are_not_freeups(self):
+        with HistoryStore(self.path, flush_interval=0) as store:
+            store.observe({("d1", "A", 18): "closed", ("d1", "A", 19): TAKEN}, T0)
+            store.observe({("d1", "A", 18): FREE, ("d1", "A", 19): FREE}, T0 + 60)
+            store.flush()
+            by_hour = store.freeups_by_hour(court="A")
+
+        self.assertEqual(sum(by_hour.values()), 1)
+
+    def test_close_closes_every_thread_connection(self):
+        store = HistoryStore(self.path, flush_interval=0)
+        worker = threading.Thread(target=store.freeups_by_hour)
+        worker.start()
+        worker.join()
+        connections = list(store._connections)
+        store.close()
+
+        self.assertEqual(len(connections), 2)
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Tests for the Browser Memory Governor
+"""
+
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import config
+from fake_driver import FakeDriver
+from memory_governor import MemoryGovernor, process_tree_rss
+from wechat_scraper import WeChatBrowserScraper
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MetricsDriver(FakeDriver):
+    """FakeDriver that answers Performance.getMetrics; Nodes is counted from the DOM"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = {"JSHeapUsedSize": 0, "JSHeapTotalSize": 0}
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        result = super().execute_cdp_cmd(cmd, params)
+        if cmd == "Performance.getMetrics":
+            metrics = {"Nodes": sum(1 for _ in self.document.iter()) - 1, "Documents": 1, **self.metrics}
+            return {"metrics": [{"name": k, "value": v} for k, v in metrics.items()]}
+        return result
+
+
+class TestProcessTreeRSS(unittest.TestCase):
+    """Test cases for process_tree_rss"""
+
+    @unittest.skipUnless(os.path.isdir("/proc"), "needs /proc")
+    def test_own_process(self):
+        rss = process_tree_rss(os.getpid())
+        self.assertGreater(rss, 1 * MB)
+
+    def test_missing_process(self):
+        self.assertIsNone(process_tree_rss(2 ** 22 + 12345))
+
+
+class TestMemoryGovernor(unittest.TestCase):
+    """Test cases for MemoryGovernor"""
+
+    def setUp(self):
+        # Recycled browsers are fake-backend drivers too, so patch the class rather than one instance
+        patcher = patch("fake_driver.FakeDriver", MetricsDriver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scraper = WeChatBrowserScraper(backend="fake")
+        self.scraper.start()
+        self.addCleanup(self.scraper.close)
+        self.scraper.open_url(config.VFMC_ENTRY_URL)
+        self.scraper.add_cookie({"name": "ASP.NET_SessionId", "value": "abc"})
+        self.clock = FakeClock()
+        self.governor = MemoryGovernor(self.scraper, heap_trim=100 * MB, heap_limit=300 * MB,
+                                       idle_grace=5, clock=self.clock)
+
+    def set_heap(self, size):
+        self.scraper.driver.metrics["JSHeapUsedSize"] = size
+
+    def test_sample_reads_performance_metrics(self):
+        self.set_heap(42 * MB)
+        sample = self.governor.sample()
+        self.assertEqual(sample["js_heap"], 42 * MB)
+        self.assertGreater(sample["nodes"], 0)
+        self.assertIsNone(sample["rss"])
+
+    def test_trim_above_threshold(self):
+        self.set_heap(50 * MB)
+        self.assertEqual(self.governor.check(), "ok")
+        self.set_heap(150 * MB)
+        self.assertEqual(self.governor.check(), "trimmed")
+        sent = [cmd for cmd, _ in self.scraper.driver.cdp_commands]
+        self.assertIn("HeapProfiler.collectGarbage", sent)
+
+    def test_recycle_preserves_cookies_and_url(self):
+        old_driver = self.scraper.driver
+        url = old_driver.current_url
+        self.set_heap(500 * MB)
+        self.assertEqual(self.governor.check(), "recycled")
+        self.assertIsNot(self.scraper.driver, old_driver)
+        self.assertEqual(self.scraper.driver.current_url, url)
+        self.assertEqual(self.scraper.driver.get_cookie("ASP.NET_SessionId")["value"], "abc")
+        self.assertEqual(self.governor.status()["recycles"], 1)
+
+    def test_never_recycles_while_busy(self):
+        old_driver = self.scraper.driver
+        self.set_heap(500 * MB)
+        with self.governor.busy():
+            self.assertEqual(self.governor.check(), "deferred")
+        self.assertIs(self.scraper.driver, old_driver)
+
+        # Still inside the grace period after the booking finished
+        self.clock.now += 1
+        self.assertEqual(self.governor.check(), "deferred")
+        self.assertTrue(self.governor.recycle_pending)
+
+        # Once idle, the pending recycle runs even if memory has dropped meanwhile
+        self.set_heap(0)
+        self.clock.now += 5
+        self.assertEqual(self.governor.check(), "recycled")
+        self.assertFalse(self.governor.recycle_pending)
+
+    def test_busy_waits_for_running_recycle(self):
+        entered = threading.Event()
+        release = threading.Event()
+        scraper = self.scraper
+        original = scraper.recycle
+
+        def slow_recycle():
+            entered.set()
+            release.wait(2)
+            original()
+
+        scraper.recycle = slow_recycle
+        worker = threading.Thread(target=self.governor.recycle)
+        worker.start()
+        entered.wait(2)
+        drivers = []
+
+        def book():
+            with self.governor.busy():
+                drivers.append(scraper.driver)
+
+        booking = threading.Thread(target=book)
+        booking.start()
+        booking.join(0.05)
+        self.assertEqual(drivers, [])
+        release.set()
+        worker.join()
+        booking.join()
+        self.assertIs(drivers[0], scraper.driver)
+
+
+if __name__ == '__main__':
+    unittest.main()
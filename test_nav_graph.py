@@ -0,0 +1,142 @@
+"""
+Tests for the Learned Navigation Graph
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from selenium.webdriver.common.by import By
+
+from fake_driver import FakeSite
+from nav_graph import NavigationError, NavigationGraph, Navigator, NavRecorder, url_template
+from wechat_scraper import WeChatBrowserScraper
+
+BASE = "http://vfmc.test"
+ENTRY = f"{BASE}/Views/User/UserChoose.html"
+CHOOSE = '<html><head><title>用户类型选择</title></head><body><div id="student">学生</div></body></html>'
+HOME = '<html><body><a id="courts" href="/Views/Court/List.html?type=1&date=2026-10-20">场地</a></body></html>'
+
+
+def court_list(driver, url):
+    # Without the login cookie the server sends the browser back to the user-type page
+    if driver.get_cookie("ASP.NET_SessionId") is None:
+        return CHOOSE
+    return f"<html><body><table id='grid' data-url='{url}'></table></body></html>"
+
+
+def login(driver, element):
+    driver.add_cookie({"name": "ASP.NET_SessionId", "value": "s1"})
+    driver.get(BASE + "/Views/Home/Index.html")
+
+
+class TestURLTemplate(unittest.TestCase):
+    """Test cases for url_template"""
+
+    def test_template(self):
+        self.assertEqual(url_template("http://h/a/List.html?type=1&date=2026-10-20#top", {"date": "2026-10-20"}),
+                         "http://h/a/List.html?date={date}&type=1")
+        self.assertEqual(url_template("http://h/day/2026-10-20", {"date": "2026-10-20"}), "http://h/day/{date}")
+
+
+class TestNavigator(unittest.TestCase):
+    """Test cases for NavRecorder and Navigator"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.scraper = WeChatBrowserScraper(backend="fake")
+        self.scraper.start()
+        site = FakeSite({ENTRY: CHOOSE, "/Views/Home/Index.html": HOME, "/Views/Court/List.html": court_list})
+        site.on_click(By.ID, "student", login)
+        self.scraper.driver.site = site
+        self.scraper.driver.latency = 0.01
+        self.graph = NavigationGraph(os.path.join(self.tmp_dir, "nav.json"))
+
+    def tearDown(self):
+        self.scraper.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def navigator(self) -> Navigator:
+        return Navigator(self.scraper, self.graph, cookie_file=os.path.join(self.tmp_dir, "cookies.json"))
+
+    def record(self):
+        recorder = NavRecorder(self.scraper, self.graph)
+        recorder.open_url(ENTRY)
+        recorder.click(By.ID, "student")
+        recorder.click(By.ID, "courts")
+        recorder.mark("court_list", date="2026-10-20")
+        return recorder
+
+    def test_record_learns_templates_cookies_and_path(self):
+        recorder = self.record()
+        self.assertEqual([s["cookies"] for s in recorder.steps], [[], ["ASP.NET_SessionId"], []])
+        self.graph.save()
+        graph = NavigationGraph.load(self.graph.path)
+        self.assertEqual(graph.goals["court_list"]["template"], BASE + "/Views/Court/List.html?date={date}&type=1")
+        path = graph.path_to("court_list")
+        self.assertEqual([e["action"] for e in path], ["get", "click", "click"])
+        self.assertEqual(graph.cookies_along(path), {"ASP.NET_SessionId"})
+
+    def test_direct_jump_saves_navigations(self):
+        self.record()
+        navigator = self.navigator()
+        report = navigator.goto("court_list", date="2026-10-21")
+        self.assertTrue(report.direct)
+        self.assertEqual(report.navigations, 1)
+        self.assertEqual(report.saved_navigations, 2)
+        self.assertGreater(report.saved_seconds, 0)
+        self.assertIn("date=2026-10-21", self.scraper.driver.current_url)
+        self.assertEqual(navigator.summary()["direct"], 1)
+
+    def test_falls_back_to_click_path_without_session(self):
+        self.record()
+        self.scraper.driver.delete_all_cookies()
+        report = self.navigator().goto("court_list", date="2026-10-21")
+        self.assertFalse(report.direct)
+        # The learned clicks lead to the recorded date, one more hop switches to the requested one
+        self.assertEqual(report.navigations, 4)
+        self.assertIn("date=2026-10-21", self.scraper.driver.current_url)
+
+    def test_fresh_browser_restores_saved_session(self):
+        self.record()
+        saved = self.scraper.driver.get_cookies()
+        with open(os.path.join(self.tmp_dir, "cookies.json"), "w", encoding="utf-8") as f:
+            json.dump(saved, f)
+        self.scraper.driver.delete_all_cookies()
+        report = self.navigator().goto("court_list", date="2026-10-21")
+        self.assertTrue(report.direct)
+        self.assertEqual(report.navigations, 1)
+
+    def test_falls_back_when_direct_link_fails(self):
+        self.record()
+        self.scraper.driver.add_cookie({"name": "ASP.NET_SessionId", "value": "stale"})
+        site = self.scraper.driver.site
+        site.route("/Views/Court/List.html", lambda d, url: CHOOSE if d.get_cookie("ASP.NET_SessionId")["value"]
+                   == "stale" else court_list(d, url))
+        report = self.navigator().goto("court_list", date="2026-10-20")
+        self.assertFalse(report.direct)
+        self.assertEqual(report.navigations, 4)
+        self.assertEqual(report.saved_navigations, -1)
+
+    def test_click_path_failure_is_saved(self):
+        self.record()
+        self.scraper.driver.delete_all_cookies()
+
+        def unreachable(url, *args):
+            raise ConnectionError("site down")
+
+        self.scraper.open_url = unreachable
+        with self.assertRaises(ConnectionError):
+            self.navigator().goto("court_list", date="2026-10-21")
+        graph = NavigationGraph.load(self.graph.path)
+        self.assertEqual(graph.path_to("court_list")[0]["failures"], 1)
+
+    def test_unknown_goal(self):
+        with self.assertRaises(NavigationError):
+            self.navigator().goto("booking")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for Network Condition Emulation
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fake_driver import FakeDriver, FakeSite
+from network_conditions import (NetworkProfile, ThrottlingProxy, apply_browser_profile, get_profile,
+                                load_profiles, parse_profile)
+
+BODY = b"x" * 50000
+
+
+class ThrottledDriver(FakeDriver):
+    """FakeDriver that slows navigations as Network.emulateNetworkConditions would"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.network_conditions = {}
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        if cmd == "Network.emulateNetworkConditions":
+            self.network_conditions = dict(params)
+        return super().execute_cdp_cmd(cmd, params)
+
+    def load_delay(self, url: str, html: str) -> float:
+        delay = super().load_delay(url, html)
+        if self.network_conditions and url != "about:blank":
+            # One round trip plus the transfer time
+            throughput = self.network_conditions.get("downloadThroughput", -1)
+            delay += self.network_conditions.get("latency", 0) / 1000
+            delay += len(html.encode("utf-8")) / throughput if throughput > 0 else 0
+        return delay
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = BODY if self.path.endswith("/big") else b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestProfiles(unittest.TestCase):
+    """Test cases for profile parsing and loading"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_and_load(self):
+        self.assertEqual(parse_profile("dorm:120:2000:500:0.01"), NetworkProfile("dorm", 120, 2000, 500, 0.01))
+        self.assertEqual(parse_profile("x:1:2:3").loss, 0.0)
+        with self.assertRaises(ValueError):
+            parse_profile("x:1")
+        path = os.path.join(self.tmp_dir, "recorded.json")
+        with open(path, "w") as f:
+            json.dump({"release_night": {"latency": 650, "down_kbps": 400, "up_kbps": 200, "loss": 0.03}}, f)
+        profiles = load_profiles(path)
+        self.assertIn("lan", profiles)
+        self.assertEqual(profiles["release_night"].latency, 650)
+        self.assertEqual(get_profile("release_night", path).loss, 0.03)
+        with self.assertRaises(ValueError):
+            get_profile("nowhere")
+
+    def test_browser_profile_slows_navigation(self):
+        driver = ThrottledDriver(FakeSite({"http://site/": "<html><body>" + "y" * 10000 + "</body></html>"}))
+        apply_browser_profile(driver, NetworkProfile("slow", 100, 800, 800))
+        params = dict(driver.cdp_commands)["Network.emulateNetworkConditions"]
+        self.assertEqual(params["downloadThroughput"], 100000)
+        started = time.monotonic()
+        driver.get("http://site/")
+        # 100 ms round trip plus 10 kB at 100 kB/s
+        self.assertGreater(time.monotonic() - started, 0.19)
+        apply_browser_profile(driver, None)
+        params = dict(driver.cdp_commands)["Network.emulateNetworkConditions"]
+        self.assertEqual((params["latency"], params["downloadThroughput"]), (0, -1))
+
+
+class TestThrottlingProxy(unittest.TestCase):
+    """Test cases for ThrottlingProxy"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def timed_get(self, path):
+        started = time.monotonic()
+        response = self.session.get(self.base + path, timeout=10)
+        return response, time.monotonic() - started
+
+    def test_latency_and_bandwidth(self):
+        with ThrottlingProxy(NetworkProfile("t", 100, 2000, 2000)) as proxy:
+            self.session.proxies = proxy.proxies
+            response, elapsed = self.timed_get("/small")
+            self.assertEqual(response.text, "ok")
+            self.assertGreater(elapsed, 0.09)
+            # 50 kB at 250 kB/s adds about 200 ms, on the reused connection as well
+            response, elapsed = self.timed_get("/big")
+            self.assertEqual(len(response.content), len(BODY))
+            self.assertGreater(elapsed, 0.28)
+
+    def test_loss_charges_retransmission_timeout(self):
+        with ThrottlingProxy(NetworkProfile("lossy", 10, 100000, 100000, loss=1.0)) as proxy:
+            self.session.proxies = proxy.proxies
+            _, elapsed = self.timed_get("/small")
+        # Request and response chunks each wait one 200 ms RTO
+        self.assertGreater(elapsed, 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
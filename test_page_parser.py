@@ -0,0 +1,104 @@
+"""
+Tests for the Offline vfmc Page Parser
+"""
+
+import datetime
+import glob
+import os
+import unittest
+
+from page_parser import (
+    BOOKED,
+    FREE,
+    UNKNOWN,
+    Selector,
+    SelectorSet,
+    classify_page,
+    free_cells,
+    parse_html,
+    parse_json,
+    parse_page,
+)
+
+CAPTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug_wechat")
+
+GRID_HTML = """
+<table>
+  <!-- <td class="slot" data-court="ghost">07:00-08:00</td> -->
+  <tr data-court="3号场" data-date="2026/10/20">
+    <td class="slot free" data-time="18:00-19:00" data-price="20">18:00-19:00</td>
+    <td class="slot"><span>19:00-20:00</span> <span>已预约</span> &yen;25</td>
+  </tr>
+</table>
+<div data-courtname="5" data-start="20:00" data-end="22:00" data-status="0"><div>inner</div></div>
+"""
+
+
+class TestPageParser(unittest.TestCase):
+    """Test cases for the page parser"""
+
+    def test_parse_html_grid(self):
+        records = parse_html(GRID_HTML, default_date="2026-10-21")
+
+        self.assertEqual(len(records), 3)
+        first, second, third = records
+        self.assertEqual((first.court, first.date, first.status, first.price),
+                         ("3号场", "2026-10-20", FREE, 20.0))
+        self.assertEqual((first.start, first.end), (datetime.time(18), datetime.time(19)))
+        self.assertEqual((second.status, second.price), (BOOKED, 25.0))
+        self.assertEqual((third.court, third.date, third.end), ("5", "2026-10-21", datetime.time(22)))
+
+    def test_parse_json(self):
+        body = ('{"data": [{"CourtName": "1", "StartTime": "08:00", "EndTime": "09:00",'
+                ' "Status": 0, "Price": 15}, {"CourtName": "2", "Time": "09:00-10:00", "Status": "x"}]}')
+        records = parse_json(body, default_date="2026-10-20")
+
+        self.assertEqual([(r.court, r.status, r.price) for r in records],
+                         [("1", FREE, 15.0), ("2", UNKNOWN, None)])
+        self.assertEqual(records[1].date, "2026-10-20")
+
+    def test_dates_normalised_or_row_dropped(self):
+        # Midnight 2026-10-20 in Beijing is still 2026-10-19 in UTC and west of it
+        rows = [{"CourtName": str(i), "Time": "18:00-19:00", "Status": 0, "Date": date}
+                for i, date in enumerate(["2026年10月20日", "20261020", "/Date(1792425600000+0800)/",
+                                          "10月20日", "2026-02-30"])]
+        records = parse_json({"data": rows})
+
+        self.assertEqual([(r.court, r.date) for r in records],
+                         [("0", "2026-10-20"), ("1", "2026-10-20"), ("2", "2026-10-20")])
+        self.assertEqual(parse_json({"data": rows[3:]}, default_date="2026-10-21"), [])
+
+    def test_numeric_codes_only_in_status_field(self):
+        page = ('<table><tr data-court="1"><td class="slot" data-time="08:00-09:00">剩余 1 可预约</td>'
+                '<td class="slot" data-time="09:00-10:00" data-status="1">2号场</td></tr></table>')
+        records = parse_html(page, default_date="2026-10-20")
+
+        self.assertEqual([r.status for r in records], [FREE, BOOKED])
+
+    def test_free_cells(self):
+        cells = free_cells(parse_html(GRID_HTML, default_date="2026-10-21"))
+
+        self.assertEqual(cells, [("2026-10-20", "3号场", 18),
+                                 ("2026-10-21", "5", 20), ("2026-10-21", "5", 21)])
+
+    def test_custom_selectors(self):
+        selectors = SelectorSet([Selector("span.cell[data-court]")])
+        html = '<span class="cell" data-court="7">10:00-11:00 free</span><span data-court="8">x</span>'
+
+        self.assertEqual([r.court for r in parse_html(html, selectors=selectors)], ["7"])
+
+    def test_saved_captures_have_no_grid(self):
+        kinds = {}
+        for path in glob.glob(os.path.join(CAPTURE_DIR, "*.html")):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            kinds[os.path.basename(path)] = classify_page(text)
+            self.assertEqual(parse_page(text), [])
+
+        self.assertEqual(kinds["page_source.html"], "user_choose")
+        self.assertEqual(kinds["page_2_fallback.html"], "wechat_block")
+        self.assertEqual(kinds["page_source_2.html"], "browser_error")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for the History-Driven Polling Budget
+"""
+
+import datetime
+import random
+import time
+import unittest
+
+from poll_budget import (
+    ChangeModel,
+    PollBudgetAllocator,
+    detection_probability,
+    evaluate,
+    freeup_episodes,
+)
+
+T0 = time.mktime((2026, 10, 1, 8, 0, 0, 0, 0, -1))
+
+
+def synthetic_history(days=14, hot_courts=("A",), cold_courts=("B", "C", "D"), seed=1, cold_gap=86400 * 7):
+    """Hot courts free up every ~20 minutes, cold ones every `cold_gap` seconds; all are retaken within ~2 minutes"""
+    rng = random.Random(seed)
+    events = []
+    for day in range(days):
+        date = (datetime.date.fromtimestamp(T0) + datetime.timedelta(days=day + 1)).isoformat()
+        for court in hot_courts + cold_courts:
+            events.append((T0 + day * 86400, date, court, 19, "taken", None))
+            mean_gap = 1200 if court in hot_courts else cold_gap
+            t = T0 + day * 86400 + rng.expovariate(1 / mean_gap)
+            while t < T0 + day * 86400 + 43200:
+                events.append((t, date, court, 19, "free", "taken"))
+                t += rng.expovariate(1 / 120)
+                events.append((t, date, court, 19, "taken", "free"))
+                t += rng.expovariate(1 / mean_gap)
+    events.sort()
+    return events
+
+
+class TestPollBudget(unittest.TestCase):
+    """Test cases for the polling budget allocator"""
+
+    def test_detection_probability(self):
+        self.assertEqual(detection_probability(60, 0), 0.0)
+        self.assertGreater(detection_probability(60, 1), 0.99)
+        self.assertLess(detection_probability(60, 1 / 600), 0.11)
+
+    def test_budget_goes_to_hot_targets(self):
+        model = ChangeModel()
+        model.update(synthetic_history(days=3))
+        targets = [(1, c, 19) for c in "ABCD"]
+        allocator = PollBudgetAllocator(model, targets, budget=12, units=40)
+
+        self.assertEqual(sum(allocator.allocation.values()), 40)
+        self.assertGreater(allocator.allocation[(1, "A", 19)], allocator.allocation[(1, "B", 19)])
+
+    def test_incremental_rebalance(self):
+        model = ChangeModel()
+        targets = [(1, c, 19) for c in "ABCD"]
+        allocator = PollBudgetAllocator(model, targets, budget=12, units=40)
+        even = dict(allocator.allocation)
+
+        moved = allocator.observe(synthetic_history(days=2))
+        self.assertGreater(moved, 0)
+        self.assertEqual(sum(allocator.allocation.values()), 40)
+        self.assertGreater(allocator.allocation[(1, "A", 19)], even[(1, "A", 19)])
+
+    def test_observe_matches_full_reallocation(self):
+        model = ChangeModel()
+        targets = [(1, c, 19) for c in "ABCD"]
+        allocator = PollBudgetAllocator(model, targets, budget=12, units=40)
+        history = synthetic_history(days=11, hot_courts=("A", "C"), cold_courts=())
+        allocator.observe([e for e in history if e[2] == "A" and e[0] < T0 + 86400])
+        # Only C changes from here on, but ten more days of exposure lower A's rate as well
+        allocator.observe([e for e in history if e[2] == "C" and e[0] >= T0 + 86400])
+        incremental = dict(allocator.allocation)
+
+        self.assertEqual(incremental, allocator.reallocate())
+        self.assertGreater(incremental[(1, "C", 19)], incremental[(1, "A", 19)])
+
+    def test_replay_beats_uniform(self):
+        # Cold courts free up every few hours, so training sees every target
+        events = synthetic_history(cold_gap=4 * 3600)
+        results = evaluate(events, budget=4, units=40)
+
+        self.assertEqual(results["learned"]["episodes"], results["uniform"]["episodes"])
+        self.assertGreater(results["learned"]["detected"], results["uniform"]["detected"])
+        self.assertLess(results["learned"]["mean_latency"], results["uniform"]["mean_latency"])
+
+    def test_evaluate_only_polls_targets_seen_in_training(self):
+        events = synthetic_history(days=4)
+        late = [(t + 2 * 86400, date, "Z", 19, status, previous)
+                for t, date, court, hour, status, previous in synthetic_history(days=2, hot_courts=("A",),
+                                                                                  cold_courts=())]
+        results = evaluate(sorted(events + late), budget=4, units=40)
+        baseline = evaluate(events, budget=4, units=40)
+
+        # Z's free-ups all fall in the replay half, so neither policy was allowed to poll it
+        self.assertGreater(results["learned"]["episodes"], baseline["learned"]["episodes"])
+        self.assertEqual(results["learned"]["detected"], baseline["learned"]["detected"])
+        self.assertEqual(results["uniform"]["detected"], baseline["uniform"]["detected"])
+
+    def test_freeup_episodes(self):
+        events = [(0, "2026-10-02", "A", 19, "taken", None),
+                  (10, "2026-10-02", "A", 19, "free", "taken"),
+                  (25, "2026-10-02", "A", 19, "taken", "free")]
+        episodes = freeup_episodes(events)
+
+        self.assertEqual([(e[0], e[1]) for e in episodes], [(10, 25)])
+
+
+if __name__ == '__main__':
+    unittest.main()
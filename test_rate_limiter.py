@@ -0,0 +1,112 @@
+"""
+Tests for the Host-Wide Rate Limiter
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from rate_limiter import _SLOT, PRIORITY_BOOKING, PRIORITY_POLLING, RateLimiter
+
+LIMITS = {"vfmc.example": (10.0, 5), "vfmc.example/Book": (1.0, 3)}
+
+
+def _drain(path, results):
+    with RateLimiter(path, limits=LIMITS, booking_reserve=0) as limiter:
+        results.put(sum(limiter.try_acquire("http://vfmc.example/list") == 0 for _ in range(50)))
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for RateLimiter"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "ratelimit")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_limiter(self, reserve=0):
+        limiter = RateLimiter(self.path, limits=LIMITS, booking_reserve=reserve)
+        self.addCleanup(limiter.close)
+        return limiter
+
+    def test_budget_lookup(self):
+        limiter = self.make_limiter()
+        self.assertEqual(limiter.budget_for("http://vfmc.example/Views/a.html")[0], "vfmc.example")
+        self.assertEqual(limiter.budget_for("http://vfmc.example/Book/Submit?x=1")[0], "vfmc.example/Book")
+        self.assertIsNone(limiter.budget_for("http://other.example/"))
+        self.assertIsNone(limiter.budget_for("http://vfmc.example.org/"))
+        self.assertEqual(limiter.try_acquire("http://other.example/"), 0.0)
+
+    def test_burst_then_wait(self):
+        limiter = self.make_limiter()
+        url = "http://vfmc.example/list"
+        self.assertTrue(all(limiter.try_acquire(url) == 0 for _ in range(5)))
+        wait = limiter.try_acquire(url)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.1 + 1e-6)
+        started = time.monotonic()
+        self.assertTrue(limiter.acquire(url, timeout=1))
+        self.assertGreater(time.monotonic() - started, 0.05)
+
+    def test_endpoint_buckets_are_separate(self):
+        limiter = self.make_limiter()
+        for _ in range(3):
+            self.assertEqual(limiter.try_acquire("http://vfmc.example/Book/Submit"), 0)
+        self.assertGreater(limiter.try_acquire("http://vfmc.example/Book/Submit"), 0)
+        self.assertEqual(limiter.try_acquire("http://vfmc.example/list"), 0)
+
+    def test_polling_leaves_reserve_for_booking(self):
+        limiter = self.make_limiter(reserve=2)
+        url = "http://vfmc.example/list"
+        polled = sum(limiter.try_acquire(url, PRIORITY_POLLING) == 0 for _ in range(5))
+        self.assertEqual(polled, 3)
+        self.assertEqual(limiter.try_acquire(url, PRIORITY_BOOKING), 0)
+        self.assertEqual(limiter.try_acquire(url, PRIORITY_BOOKING), 0)
+
+    def test_waiting_booking_blocks_polling(self):
+        limiter = self.make_limiter()
+        url = "http://vfmc.example/Book/Submit"
+        for _ in range(3):
+            limiter.try_acquire(url, PRIORITY_BOOKING)
+        booking_wait = limiter.try_acquire(url, PRIORITY_BOOKING)
+        self.assertGreater(booking_wait, 0)
+        time.sleep(booking_wait * 0.5)
+        self.assertGreater(limiter.try_acquire(url, PRIORITY_POLLING), 0)
+
+    def test_state_from_the_future_is_clamped(self):
+        limiter = self.make_limiter()
+        url = "http://vfmc.example/Book/Submit"
+        limiter.try_acquire(url, PRIORITY_BOOKING)
+        # As left by a clock that ran a day ahead, e.g. before a reboot
+        offset = next(iter(limiter._offsets.values()))
+        key = _SLOT.unpack_from(limiter._map, offset)[0]
+        _SLOT.pack_into(limiter._map, offset, key, 0.0, time.time() + 86400, time.time() + 86400)
+
+        # The hold is cut to one refill of the bucket (3 tokens at 1/s), and refilling resumes
+        self.assertLessEqual(limiter.try_acquire(url, PRIORITY_POLLING), 3.0)
+        time.sleep(0.2)
+        self.assertGreater(limiter.level(url), 0.1)
+
+    def test_shared_between_processes(self):
+        ctx = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_drain, args=(self.path, results)) for _ in range(3)]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        taken = sum(results.get() for _ in workers)
+        # Burst of 5 plus whatever refilled at 10/s while the workers ran
+        self.assertGreaterEqual(taken, 5)
+        self.assertLessEqual(taken, 5 + int(elapsed * 10) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
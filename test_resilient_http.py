@@ -0,0 +1,190 @@
+"""
+Tests for the Resilient HTTP Layer
+
+Drive ResilientSession with a scripted fake session instead of the network.
+"""
+
+import threading
+import time
+import unittest
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from resilient_http import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    ResilientSession,
+)
+
+
+def make_response(status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+class FakeSession:
+    """Returns scripted (delay, status) results in call order"""
+
+    def __init__(self, script):
+        self.headers = {}
+        self.script = list(script)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, **kwargs):
+        with self._lock:
+            self.calls.append((method, url, kwargs))
+            delay, status = self.script.pop(0) if self.script else (0, 200)
+        time.sleep(delay)
+        if isinstance(status, Exception):
+            raise status
+        return make_response(status)
+
+    def close(self):
+        pass
+
+
+class TestLatencyTracker(unittest.TestCase):
+    """Test cases for LatencyTracker"""
+
+    def test_default_until_enough_samples(self):
+        tracker = LatencyTracker(default=0.3)
+        tracker.record(0.01)
+        self.assertEqual(tracker.estimate(), 0.3)
+
+    def test_quantile(self):
+        tracker = LatencyTracker(window=100, quantile=0.9)
+        for i in range(100):
+            tracker.record(i / 100)
+        self.assertAlmostEqual(tracker.estimate(), 0.9)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker"""
+
+    def test_opens_and_half_opens(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        now[0] = 6.0
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class TestResilientSession(unittest.TestCase):
+    """Test cases for ResilientSession"""
+
+    def test_hedge_wins_when_primary_is_slow(self):
+        fake = FakeSession([(0.5, 200), (0, 200)])
+        with ResilientSession(session=fake) as client:
+            client.tracker(client.endpoint_key("GET", "http://x/a")).default = 0.05
+            response = client.get("http://x/a", deadline=2)
+            stats = client.stats()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats["hedges"], 1)
+        self.assertEqual(stats["hedge_wins"], 1)
+        self.assertEqual(stats["hedge_win_rate"], 1.0)
+
+    def test_retries_server_errors(self):
+        fake = FakeSession([(0, 503), (0, 200)])
+        with ResilientSession(session=fake) as client:
+            response = client.get("http://x/a", hedge=False)
+            stats = client.stats()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats["retries"], 1)
+
+    def test_circuit_rejects_after_failures(self):
+        fake = FakeSession([(0, 500)] * 10)
+        with ResilientSession(session=fake, max_attempts=1) as client:
+            client.breaker(client.endpoint_key("GET", "http://x/a")).failure_threshold = 2
+            for _ in range(2):
+                with self.assertRaises(requests.HTTPError):
+                    client.get("http://x/a", hedge=False)
+            with self.assertRaises(CircuitOpenError):
+                client.get("http://x/a", hedge=False)
+
+    def test_book_is_idempotent(self):
+        fake = FakeSession([(0.1, 200)])
+        with ResilientSession(session=fake) as client:
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(client.book("http://x/book", "k1", hedge=False)))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            again = client.book("http://x/book", "k1")
+
+        self.assertEqual(len(fake.calls), 1)
+        self.assertEqual(fake.calls[0][2]["headers"]["Idempotency-Key"], "k1")
+        self.assertTrue(all(r is again for r in results))
+
+    def test_failed_booking_can_be_retried(self):
+        fake = FakeSession([(0, ConnectionError("down")), (0, 200)])
+        with ResilientSession(session=fake, max_attempts=1) as client:
+            with self.assertRaises(ConnectionError):
+                client.book("http://x/book", "k2", hedge=False)
+            self.assertEqual(client.book("http://x/book", "k2", hedge=False).status_code, 200)
+
+    def test_unconfirmed_booking_is_not_remembered(self):
+        fake = FakeSession([(0, 409), (0, 200)])
+        with ResilientSession(session=fake) as client:
+            self.assertEqual(client.book("http://x/book", "k3").status_code, 409)
+            # The slot may have freed up again: the server is asked, not the cache
+            self.assertEqual(client.book("http://x/book", "k3").status_code, 200)
+        self.assertEqual(len(fake.calls), 2)
+
+    def test_confirmed_booking_expires(self):
+        fake = FakeSession([(0, 200), (0, 200)])
+        with ResilientSession(session=fake) as client:
+            first = client.book("http://x/book", "k4")
+            self.assertIs(client.book("http://x/book", "k4"), first)
+            client._idempotent["k4"][1] = time.monotonic() - 1
+            self.assertIsNot(client.book("http://x/book", "k4"), first)
+        self.assertEqual(len(fake.calls), 2)
+
+    def test_booking_is_never_hedged_or_resent_after_timeout(self):
+        fake = FakeSession([(0.7, requests.exceptions.ReadTimeout("no reply")), (0, 200)])
+        with ResilientSession(session=fake, max_attempts=3) as client:
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                client.book("http://x/book", "k5", hedge=True)
+            self.assertEqual(client.stats()["hedges"], 0)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_session_cookies_have_no_expiry_key(self):
+        with ResilientSession(session=requests.Session()) as client:
+            client.session.cookies.set("ASP.NET_SessionId", "s1", domain="vfmc.test", path="/")
+            client.session.cookies.set("remember", "1", domain="vfmc.test", path="/", expires=1900000000)
+            cookies = {c["name"]: c for c in client.get_cookies()}
+        self.assertNotIn("expiry", cookies["ASP.NET_SessionId"])
+        self.assertEqual(cookies["remember"]["expiry"], 1900000000)
+
+    def test_booking_not_resent_after_server_error_or_dropped_connection(self):
+        for failure in (502, requests.exceptions.ConnectionError("RemoteDisconnected")):
+            fake = FakeSession([(0, failure), (0, 200)])
+            with ResilientSession(session=fake, max_attempts=3) as client:
+                with self.assertRaises(requests.exceptions.RequestException):
+                    client.book("http://x/book", f"k-{failure}")
+            self.assertEqual(len(fake.calls), 1)
+
+    def test_booking_retried_when_connection_failed(self):
+        refused = requests.exceptions.ConnectionError(NewConnectionError(None, "Connection refused"))
+        fake = FakeSession([(0, requests.exceptions.ConnectTimeout("connect")), (0, refused), (0, 200)])
+        with ResilientSession(session=fake, max_attempts=3) as client:
+            self.assertEqual(client.book("http://x/book", "k7").status_code, 200)
+        self.assertEqual(len(fake.calls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+Tests for Session Keep-Alive and Token Refresh
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+
+from session_manager import SessionManager
+
+
+class FakeClient:
+    """Records the cookies it is given"""
+
+    def __init__(self):
+        self.cookies = None
+
+    def set_cookies(self, cookies):
+        self.cookies = cookies
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionManager(unittest.TestCase):
+    """Test cases for SessionManager"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cookie_file = os.path.join(self.tmpdir.name, "cookies.json")
+        self.clock = FakeClock()
+        self.logins = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def login(self):
+        self.logins += 1
+        return [{"name": "sid", "value": f"s{self.logins}", "expiry": self.clock() + 3600}]
+
+    def make_manager(self, **kwargs):
+        kwargs.setdefault("login", self.login)
+        return SessionManager(cookie_file=self.cookie_file, clock=self.clock, refresh_margin=300,
+                              heartbeat_interval=60, idle_timeout=1200, **kwargs)
+
+    def wait_login(self, manager):
+        if manager._login_thread is not None:
+            manager._login_thread.join(timeout=5)
+
+    def test_swap_reaches_every_client_and_disk(self):
+        clients = [FakeClient(), FakeClient()]
+        manager = self.make_manager(clients=clients)
+        manager.swap([{"name": "sid", "value": "x"}])
+        self.assertEqual([c.cookies[0]["value"] for c in clients], ["x", "x"])
+        late = FakeClient()
+        manager.attach(late)
+        self.assertEqual(late.cookies[0]["value"], "x")
+
+        reloaded = self.make_manager(clients=[FakeClient()])
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.clients[0].cookies[0]["value"], "x")
+
+    def test_expiry_uses_cookie_and_idle_timeout(self):
+        manager = self.make_manager()
+        self.assertIsNone(manager.expires_at())
+        manager.swap([{"name": "sid", "value": "x", "expiry": self.clock() + 3600}])
+        self.assertEqual(manager.expires_at(), self.clock() + 1200)
+        self.assertFalse(manager.needs_refresh())
+        self.clock.now += 1000
+        self.assertTrue(manager.needs_refresh())
+
+    def test_expiry_ignores_tracking_cookies(self):
+        manager = self.make_manager()
+        manager.swap([{"name": "ASP.NET_SessionId", "value": "x", "expiry": self.clock() + 900},
+                      {"name": "_track", "value": "t", "expiry": self.clock() + 30}])
+        self.assertEqual(manager.expires_at(), self.clock() + 900)
+        manager.swap([{"name": "sid", "value": "x", "expiry": self.clock() + 900},
+                      {"name": "_track", "value": "t", "expiry": self.clock() - 30}])
+        self.assertEqual(manager.expires_at(), self.clock() + 900)
+        self.assertFalse(manager.needs_refresh())
+
+    def test_heartbeat_extends_session(self):
+        manager = self.make_manager(heartbeat=lambda: True)
+        manager.swap([{"name": "sid", "value": "x"}])
+        self.clock.now += 800
+        manager.tick()
+        self.assertEqual(manager.expires_at(), self.clock() + 1200)
+        self.assertEqual(self.logins, 0)
+
+    def test_proactive_refresh_runs_in_background(self):
+        client = FakeClient()
+        manager = self.make_manager(clients=[client])
+        manager.swap([{"name": "sid", "value": "old", "expiry": self.clock() + 200}])
+        manager.tick()
+        self.wait_login(manager)
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(client.cookies[0]["value"], "s1")
+        self.assertFalse(manager.needs_refresh())
+
+    def test_rejected_heartbeat_triggers_login(self):
+        manager = self.make_manager(heartbeat=lambda: False)
+        manager.swap([{"name": "sid", "value": "x"}])
+        self.assertFalse(manager.send_heartbeat())
+        self.wait_login(manager)
+        self.assertEqual(self.logins, 1)
+
+    def test_login_never_blocks_caller(self):
+        release = threading.Event()
+
+        def slow_login():
+            release.wait(5)
+            return [{"name": "sid", "value": "new"}]
+
+        client = FakeClient()
+        manager = self.make_manager(login=slow_login, clients=[client])
+        manager.swap([{"name": "sid", "value": "old"}])
+        self.assertTrue(manager.refresh_async())
+        self.assertFalse(manager.refresh_async())  # one login at a time
+        self.assertEqual(manager.cookies()[0]["value"], "old")
+        self.assertTrue(manager.status()["refreshing"])
+        release.set()
+        self.wait_login(manager)
+        self.assertEqual(client.cookies[0]["value"], "new")
+
+    def test_failed_login_keeps_old_cookies(self):
+        def failing_login():
+            raise RuntimeError("no browser")
+
+        manager = self.make_manager(login=failing_login)
+        manager.swap([{"name": "sid", "value": "old"}])
+        manager.refresh_async()
+        self.wait_login(manager)
+        self.assertEqual(manager.cookies()[0]["value"], "old")
+        self.assertEqual(manager.status()["login_failures"], 1)
+
+    def test_failed_login_backs_off(self):
+        def failing_login():
+            raise RuntimeError("no browser")
+
+        manager = self.make_manager(login=failing_login)
+        self.assertTrue(manager.refresh_async())
+        self.wait_login(manager)
+        self.assertFalse(manager.refresh_async())  # waiting out the first backoff
+        self.clock.now += 30
+        self.assertTrue(manager.refresh_async())
+        self.wait_login(manager)
+        self.clock.now += 30
+        self.assertFalse(manager.refresh_async())  # the second failure doubled the wait
+        self.clock.now += 30
+        self.assertTrue(manager.refresh_async())
+        self.wait_login(manager)
+        self.assertEqual(manager.status()["login_failures"], 3)
+
+    def test_new_session_confirmed_only_by_heartbeat(self):
+        accepted = {"s1": False, "s2": True}
+        client = FakeClient()
+        manager = self.make_manager(clients=[client], heartbeat=lambda: accepted[client.cookies[0]["value"]])
+        manager.swap([{"name": "sid", "value": "old", "expiry": self.clock() + 3600}])
+        manager.refresh_async()
+        self.wait_login(manager)
+        # The browser returned without a real login: the old session stays in place
+        self.assertEqual(client.cookies[0]["value"], "old")
+        self.assertEqual(manager.status()["login_failures"], 1)
+        self.clock.now += 30
+        manager.refresh_async()
+        self.wait_login(manager)
+        self.assertEqual(client.cookies[0]["value"], "s2")
+        self.assertEqual(manager.expires_at(), self.clock() + 1200)
+
+    def test_new_session_unconfirmed_without_heartbeat(self):
+        manager = self.make_manager()
+        manager.refresh_async()
+        self.wait_login(manager)
+        self.assertEqual(manager.cookies()[0]["value"], "s1")
+        self.assertEqual(manager.expires_at(), self.clock() + 3600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+"""
+Tests for Multi-Node Slot Claiming
+
+ContentionSimulator runs several local "nodes" on threads against one claim
+store. The nodes compete for the same freed slots the way redundant helpers
+do on release day.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+
+from booking_planner import BookingAttempt
+from slot_claims import (ClaimCoordinator, ClaimServer, MemoryClaimStore, SQLiteClaimStore,
+                         TCPClaimStore, target_key, target_keys)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ContentionSimulator:
+    """
+    Runs nodes that each see every free slot and book whatever they can claim.
+
+    Every booking attempt is counted per slot, so duplicated work shows up as
+    a count above one.
+    """
+
+    def __init__(self, make_store, nodes=3, ttl=0.3, tick=0.02):
+        self.make_store = make_store
+        self.ttl = ttl
+        self.tick = tick
+        self.free = set()
+        self.attempts = Counter()
+        self.attempted_by = {}
+        self.lock = threading.Lock()
+        self.stopped = {}
+        self.threads = {}
+        self.coordinators = {}
+        for i in range(nodes):
+            self.add_node(f"node{i}")
+
+    def add_node(self, node_id):
+        self.coordinators[node_id] = ClaimCoordinator(self.make_store(), node_id, ttl=self.ttl)
+        self.stopped[node_id] = threading.Event()
+
+    def _run(self, node_id):
+        coordinator = self.coordinators[node_id]
+        while not self.stopped[node_id].is_set():
+            coordinator.renew()
+            with self.lock:
+                free = sorted(self.free)
+            for slot in free:
+                # Every successful claim is a booking attempt; the slot stays claimed afterwards
+                if coordinator.claim(slot):
+                    with self.lock:
+                        self.free.discard(slot)
+                        self.attempts[slot] += 1
+                        self.attempted_by[slot] = node_id
+            time.sleep(self.tick)
+
+    def start(self):
+        for node_id in self.coordinators:
+            thread = threading.Thread(target=self._run, args=(node_id,), daemon=True)
+            self.threads[node_id] = thread
+            thread.start()
+
+    def release_slots(self, slots):
+        with self.lock:
+            self.free.update(slots)
+
+    def kill(self, node_id):
+        """Stop a node without releasing anything, as if its machine died."""
+        self.stopped[node_id].set()
+        self.threads[node_id].join()
+
+    def stop(self):
+        for node_id in self.threads:
+            self.stopped[node_id].set()
+        for thread in self.threads.values():
+            thread.join()
+
+    def wait_until(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if predicate():
+                    return True
+            time.sleep(0.01)
+        return False
+
+
+class StoreContractMixin:
+    """Lease semantics every store must provide"""
+
+    def make_store(self, clock):
+        raise NotImplementedError
+
+    def test_exclusive_lease_and_expiry(self):
+        clock = FakeClock()
+        store = self.make_store(clock)
+        first = store.acquire("t", "a", 10)
+        self.assertEqual(first.node, "a")
+        self.assertIsNone(store.acquire("t", "b", 10))
+        renewed = store.acquire("t", "a", 10)
+        self.assertEqual(renewed.token, first.token)
+        clock.now += 11
+        taken = store.acquire("t", "b", 10)
+        self.assertEqual(taken.node, "b")
+        self.assertGreater(taken.token, first.token)
+
+    def test_release_and_listing(self):
+        clock = FakeClock()
+        store = self.make_store(clock)
+        store.acquire("node/a", "a", 10)
+        store.acquire("x", "a", 10)
+        self.assertEqual([lease.target for lease in store.leases("node/")], ["node/a"])
+        self.assertFalse(store.release("x", "b"))
+        self.assertTrue(store.release("x", "a"))
+        self.assertEqual(store.acquire("x", "b", 10).node, "b")
+
+
+class TestMemoryClaimStore(StoreContractMixin, unittest.TestCase):
+    """Test cases for MemoryClaimStore"""
+
+    def make_store(self, clock):
+        return MemoryClaimStore(clock=clock)
+
+
+class TestSQLiteClaimStore(StoreContractMixin, unittest.TestCase):
+    """Test cases for SQLiteClaimStore"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_store(self, clock):
+        store = SQLiteClaimStore(os.path.join(self.tmp_dir, "claims.sqlite3"), clock=clock)
+        self.addCleanup(store.close)
+        return store
+
+
+class TestTCPClaimStore(StoreContractMixin, unittest.TestCase):
+    """Test cases for ClaimServer and TCPClaimStore"""
+
+    def make_store(self, clock):
+        server = ClaimServer(store=MemoryClaimStore(clock=clock))
+        server.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        store = TCPClaimStore(*server.server_address[:2])
+        self.addCleanup(store.close)
+        return store
+
+
+class TestClaimCoordinator(unittest.TestCase):
+    """Test cases for ClaimCoordinator"""
+
+    def test_assign_partitions_without_overlap(self):
+        store = MemoryClaimStore()
+        nodes = [ClaimCoordinator(store, f"n{i}", ttl=30) for i in range(3)]
+        for node in nodes:
+            node.heartbeat()
+        targets = [f"|2026-10-20|{court}|{hour}" for court in "ABCD" for hour in range(18, 22)]
+        shares = [node.assign(targets) for node in nodes]
+        claimed = [t for share in shares for t in share]
+        self.assertEqual(sorted(claimed), sorted(targets))
+        self.assertTrue(all(shares))
+
+    def test_target_key(self):
+        attempt = BookingAttempt(0, "alice", "2026-10-20", "3号场", 19, 20, 0.0)
+        self.assertEqual(target_key(attempt), "alice|2026-10-20|3号场|19")
+        block = BookingAttempt(0, "alice", "2026-10-20", "3号场", 18, 20, 0.0)
+        self.assertEqual(target_keys(block), ["alice|2026-10-20|3号场|18", "alice|2026-10-20|3号场|19"])
+
+    def test_overlapping_blocks_exclude_each_other(self):
+        store = MemoryClaimStore()
+        first, second = ClaimCoordinator(store, "n1", ttl=30), ClaimCoordinator(store, "n2", ttl=30)
+        early = target_keys(BookingAttempt(0, None, "d", "A", 18, 20, 0.0))
+        late = target_keys(BookingAttempt(0, None, "d", "A", 19, 21, 0.0))
+        self.assertTrue(first.claim_all(early))
+        self.assertFalse(second.claim_all(late))
+        # All or nothing: the free hour 20 was given back
+        self.assertEqual(list(second.held), [])
+        self.assertTrue(ClaimCoordinator(store, "n3", ttl=30).claim("|d|A|20"))
+
+    def test_verify_detects_lapsed_lease(self):
+        now = [0.0]
+        store = MemoryClaimStore(clock=lambda: now[0])
+        mine, other = ClaimCoordinator(store, "n1", ttl=10), ClaimCoordinator(store, "n2", ttl=10)
+        self.assertTrue(mine.claim_all(["t"]))
+        self.assertTrue(mine.verify(["t"]))
+        now[0] = 20
+        self.assertTrue(other.claim("t"))
+        other.release("t")
+        # The target is free again, but another node held it in between: the fencing token changed
+        self.assertFalse(mine.verify(["t"]))
+
+
+class TestContention(unittest.TestCase):
+    """Multi-node runs against the contention simulator"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def check_no_duplicates(self, make_store):
+        sim = ContentionSimulator(make_store)
+        sim.start()
+        try:
+            slots = {f"|2026-10-20|{court}|{hour}" for court in "ABC" for hour in range(8, 22)}
+            sim.release_slots(slots)
+            self.assertTrue(sim.wait_until(lambda: not sim.free))
+        finally:
+            sim.stop()
+        self.assertEqual(set(sim.attempts), slots)
+        self.assertEqual(max(sim.attempts.values()), 1)
+
+    def test_sqlite_nodes_never_duplicate(self):
+        path = os.path.join(self.tmp_dir, "claims.sqlite3")
+        self.check_no_duplicates(lambda: SQLiteClaimStore(path))
+
+    def test_tcp_nodes_never_duplicate(self):
+        server = ClaimServer()
+        server.start()
+        try:
+            self.check_no_duplicates(lambda: TCPClaimStore(*server.server_address[:2]))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_dead_node_leases_taken_over_within_ttl(self):
+        store = MemoryClaimStore()
+        sim = ContentionSimulator(lambda: store, nodes=2, ttl=0.3)
+        sim.start()
+        try:
+            dying = sim.coordinators["node0"]
+            self.assertTrue(dying.claim("stuck"))
+            sim.kill("node0")
+            killed_at = time.monotonic()
+            sim.release_slots({"stuck"})
+            self.assertTrue(sim.wait_until(lambda: not sim.free, timeout=2.0))
+            took_over = time.monotonic() - killed_at
+        finally:
+            sim.stop()
+        self.assertEqual(sim.attempted_by["stuck"], "node1")
+        self.assertLess(took_over, sim.ttl + 0.5)
+        self.assertEqual(sim.coordinators["node1"].live_nodes(), ["node1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
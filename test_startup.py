@@ -0,0 +1,139 @@
+"""
+Tests for the Concurrent Startup Orchestrator
+"""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+from fake_driver import FakeSite
+from startup import StartupOrchestrator, StartupTimeline
+from wechat_scraper import WeChatBrowserScraper
+
+URL = "http://vfmc.test/Views/User/UserChoose.html"
+
+
+def slow_resolver(host, port, type=0):
+    time.sleep(0.1)
+    return [(socket.AF_INET, type, 6, "", ("10.0.0.1", port))]
+
+
+class TestStartupTimeline(unittest.TestCase):
+    """Test cases for StartupTimeline"""
+
+    def test_critical_path_follows_latest_dependency(self):
+        now = [0.0]
+        timeline = StartupTimeline(clock=lambda: now[0])
+        for name, start, end, after in (("driver", 0, 3, ()), ("dns", 0, 1, ()), ("launch", 3, 5, ("driver",)),
+                                        ("prewarm", 5, 6, ("launch", "dns")), ("navigate", 6, 7, ("prewarm",))):
+            now[0] = start
+            with timeline.phase(name, after):
+                now[0] = end
+        self.assertEqual([p.name for p in timeline.critical_path()], ["driver", "launch", "prewarm", "navigate"])
+        self.assertEqual(timeline.breakdown()["total"], 7000.0)
+        self.assertIn("*launch", timeline.report())
+
+
+class TestStartupOrchestrator(unittest.TestCase):
+    """Test cases for StartupOrchestrator"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cookie_file = os.path.join(self.tmp_dir, "cookies.json")
+        with open(self.cookie_file, "w", encoding="utf-8") as f:
+            json.dump([{"name": "ASP.NET_SessionId", "value": "s1", "domain": "vfmc.test", "path": "/"}], f)
+        self.scraper = WeChatBrowserScraper(backend="fake")
+        launch = self.scraper.launch
+
+        def slow_resolve_driver():
+            time.sleep(0.1)
+            return None
+
+        def launch_on_site(driver_path, options=None):
+            launch(driver_path, options)
+            self.scraper.driver.site = FakeSite({URL: "<html><body>ok</body></html>"})
+
+        self.scraper.resolve_driver = slow_resolve_driver
+        self.scraper.launch = launch_on_site
+
+    def tearDown(self):
+        self.scraper.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def startup(self, **kwargs) -> StartupOrchestrator:
+        kwargs.setdefault("resolver", slow_resolver)
+        return StartupOrchestrator(self.scraper, URL, self.cookie_file, **kwargs)
+
+    def test_joins_at_first_navigation_with_session(self):
+        startup = self.startup()
+        startup.start()
+        timeline = startup.open()
+        driver = self.scraper.driver
+        self.assertEqual(driver.current_url, URL)
+        self.assertEqual(driver.get_cookie("ASP.NET_SessionId")["value"], "s1")
+        self.assertEqual(startup.addresses[0][4], ("10.0.0.1", 80))
+        # Cookies and the preconnect hint were in place before the first page load
+        self.assertEqual(driver.history, [URL])
+        self.assertIn("Network.setCookies", [cmd for cmd, _ in driver.cdp_commands])
+        self.assertEqual(set(timeline.breakdown()),
+                         {"driver", "options", "session", "dns", "launch", "cookies", "prewarm", "navigate", "total"})
+        self.assertEqual(timeline.critical_path()[-1].name, "navigate")
+
+    def test_concurrent_startup_overlaps_slow_phases(self):
+        concurrent = self.startup()
+        concurrent.start()
+        phases = concurrent.open().phases
+        self.scraper.close()
+        sequential = self.startup(concurrent=False)
+        sequential.start()
+        sequential_total = sequential.open().total
+        # Driver resolution and DNS take 100 ms each: in sequence they add up, concurrently they overlap
+        self.assertGreater(sequential_total, 0.2)
+        self.assertLess(phases["dns"].start, phases["driver"].end)
+        self.assertLess(phases["driver"].start, phases["dns"].end)
+        self.assertGreaterEqual(phases["launch"].start, phases["driver"].end)
+        self.assertGreaterEqual(phases["navigate"].start, max(phases["launch"].end, phases["dns"].end))
+        self.assertGreaterEqual(sequential.timeline.phases["dns"].start, sequential.timeline.phases["driver"].end)
+
+    def test_launch_does_not_wait_for_dns(self):
+        def slower_resolver(host, port, type=0):
+            time.sleep(0.4)
+            return slow_resolver(host, port, type)
+
+        startup = self.startup(resolver=slower_resolver)
+        startup.start()
+        phases = startup.open().phases
+        self.assertNotIn("dns", phases["launch"].after)
+        self.assertLess(phases["launch"].start, phases["dns"].end)
+        self.assertGreaterEqual(phases["navigate"].start, phases["dns"].end)
+
+    def test_optional_phase_failure_does_not_stop_startup(self):
+        def failing_resolver(host, port, type=0):
+            raise socket.gaierror("name resolution failed")
+
+        startup = self.startup(resolver=failing_resolver)
+        startup.start()
+        timeline = startup.open()
+        self.assertEqual(self.scraper.driver.current_url, URL)
+        self.assertIn("gaierror", timeline.phases["dns"].error)
+        self.assertEqual(startup.addresses, [])
+
+    def test_required_phase_failure_raises_at_join(self):
+        def broken_resolve_driver():
+            raise RuntimeError("no chromedriver")
+
+        self.scraper.resolve_driver = broken_resolve_driver
+        startup = self.startup()
+        startup.start()
+        with self.assertRaises(RuntimeError):
+            startup.open()
+        self.assertIsNone(self.scraper.driver)
+        self.assertNotIn("launch", startup.timeline.phases)
+
+
+if __name__ == '__main__':
+    unittest.main()
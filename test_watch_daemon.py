@@ -0,0 +1,148 @@
+"""
+Tests for the Availability Watch Daemon
+"""
+
+import asyncio
+import json
+import unittest
+
+import requests
+
+from booking_planner import PlanSolver, PreferenceSpec
+from slot_claims import ClaimCoordinator, MemoryClaimStore
+from watch_daemon import LoginRequiredError, WatchDaemon, booking_confirmed, login_required
+
+
+def make_response(status, body="", location=None, url="http://vfmc.test/Book/Submit"):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = body.encode("utf-8")
+    if location:
+        response.headers["Location"] = location
+    return response
+
+
+class TestWatchDaemon(unittest.TestCase):
+    """Test cases for WatchDaemon"""
+
+    def make_daemon(self, polls, book_result=True, relogin=None, claims=None, book_error=None):
+        self.polls = list(polls)
+        self.booked = []
+
+        def fetch(date):
+            result = self.polls.pop(0) if self.polls else []
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        def book(attempt):
+            self.booked.append(attempt)
+            if book_error is not None:
+                raise book_error
+            return book_result
+
+        solver = PlanSolver(PreferenceSpec(courts=["A"], time_windows=[(18, 21)]))
+        return WatchDaemon(fetch, solver, book, relogin=relogin, dates=lambda: ["d1"],
+                           interval=0, claims=claims, status_port=0)
+
+    def test_books_when_slot_frees_up(self):
+        daemon = self.make_daemon([[], [("d1", "B", 10)], [("d1", "A", 19)]])
+        asyncio.run(daemon.run())
+
+        self.assertEqual([(a.court, a.start_hour) for a in self.booked], [("A", 19)])
+        self.assertEqual(daemon.booked, self.booked)
+        self.assertEqual(daemon.status()["polls"], 3)
+
+    def test_failed_attempt_retried_while_slot_stays_free(self):
+        store = MemoryClaimStore()
+        daemon = self.make_daemon([[("d1", "A", 19)]] * 3, book_result=False,
+                                  claims=ClaimCoordinator(store, "me", ttl=30))
+
+        async def run():
+            for _ in range(3):
+                await daemon.poll_once()
+        asyncio.run(run())
+
+        self.assertEqual(len(self.booked), 3)
+        self.assertEqual(daemon.booked, [])
+        # Every failed attempt gave its lease back
+        self.assertEqual(store.leases("|"), [])
+
+    def test_login_required_while_booking_releases_claims(self):
+        store = MemoryClaimStore()
+        relogins = []
+        daemon = self.make_daemon([[("d1", "A", 19)]] * 2, book_error=LoginRequiredError("expired"),
+                                  relogin=lambda: relogins.append(1), claims=ClaimCoordinator(store, "me", ttl=30))
+
+        async def run():
+            for _ in range(2):
+                await daemon.poll_once()
+        asyncio.run(run())
+
+        self.assertEqual((len(self.booked), len(relogins)), (2, 2))
+        self.assertEqual(store.leases("|"), [])
+
+    def test_claimed_slot_not_attempted_by_other_node(self):
+        store = MemoryClaimStore()
+        other = ClaimCoordinator(store, "other", ttl=30)
+        self.assertTrue(other.claim("|d1|A|19"))
+        daemon = self.make_daemon([[("d1", "A", 19)]], claims=ClaimCoordinator(store, "me", ttl=30))
+        asyncio.run(daemon.poll_once())
+
+        self.assertEqual(self.booked, [])
+
+        other.release("|d1|A|19")
+        self.polls = [[("d1", "A", 19)]]
+        asyncio.run(daemon.poll_once())
+        self.assertEqual(len(self.booked), 1)
+        # The confirmed booking gave its lease back, so renewing holds nothing
+        self.assertEqual(store.leases("|"), [])
+        self.assertEqual(daemon.claims.held, {})
+
+    def test_relogin_on_login_required(self):
+        relogins = []
+        daemon = self.make_daemon([LoginRequiredError("expired")], relogin=lambda: relogins.append(1))
+        asyncio.run(daemon.poll_once())
+
+        self.assertEqual(relogins, [1])
+        self.assertEqual(daemon.status()["relogins"], 1)
+
+    def test_status_endpoint(self):
+        daemon = self.make_daemon([])
+
+        async def run():
+            server = await asyncio.start_server(daemon._handle_status, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET / HTTP/1.0\r\n\r\n")
+            data = await reader.read()
+            writer.close()
+            server.close()
+            return data
+        data = asyncio.run(run())
+
+        head, body = data.split(b"\r\n\r\n", 1)
+        self.assertIn(b"200 OK", head)
+        self.assertIn("free_cells", json.loads(body))
+
+
+class TestBookingResponses(unittest.TestCase):
+    """Test cases for login_required and booking_confirmed"""
+
+    def test_login_redirect_is_not_a_booking(self):
+        redirect = make_response(302, location="/Views/User/UserChoose.html")
+        self.assertTrue(login_required(redirect))
+        self.assertFalse(booking_confirmed(redirect))
+        followed = make_response(200, "<title>用户类型选择</title>",
+                                 url="http://vfmc.test/Views/User/UserChoose.html")
+        self.assertFalse(booking_confirmed(followed))
+        self.assertTrue(login_required(make_response(403)))
+
+    def test_plain_success_is_confirmed(self):
+        self.assertTrue(booking_confirmed(make_response(200, '{"success": true}')))
+        self.assertFalse(booking_confirmed(make_response(502)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests for the WeChat Environment Bootstrap
+"""
+
+import re
+import unittest
+from unittest.mock import patch
+
+import config
+from fake_driver import FakeDriver, FakeSite, capture_site
+from wechat_bootstrap import (BOOTSTRAP_VERSION, bootstrap_bundle, bootstrap_version,
+                              detection_self_test, install_bootstrap)
+from wechat_scraper import WeChatBrowserScraper
+
+ENTRY = '<html><body><div><div id="login">登录</div></div></body></html>'
+BLOCKED = "<html><body><p>请在微信客户端打开链接</p></body></html>"
+LOGIN = "<html><head><title>用户类型选择</title></head><body>用户类型选择</body></html>"
+
+
+class BootstrapDriver(FakeDriver):
+    """FakeDriver that answers window.__wechatBootstrap as the registered bundle would have set it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_script_stub(r"^\s*return\s+window\.__wechatBootstrap", self._bootstrap_version)
+
+    @staticmethod
+    def _bootstrap_version(driver, *args):
+        for source in reversed(driver.new_document_scripts):
+            match = re.search(r'window\.__wechatBootstrap\s*=\s*"([^"]*)"', source)
+            if match:
+                return match.group(1)
+        return None
+
+
+def use_bootstrap_driver(test: unittest.TestCase):
+    """Make fake-backend scrapers started by the test use BootstrapDriver."""
+    patcher = patch("fake_driver.FakeDriver", BootstrapDriver)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+def weixin_checked_page(driver, url):
+    """Serve the login page only if a new-document script presents a WeChat user agent."""
+    if any("MicroMessenger" in source for source in driver.new_document_scripts):
+        return LOGIN
+    return BLOCKED
+
+
+class TestBootstrapBundle(unittest.TestCase):
+    """Test cases for bootstrap_bundle and install_bootstrap"""
+
+    def setUp(self):
+        use_bootstrap_driver(self)
+
+    def test_bundle_is_versioned_and_compiled(self):
+        source, version = bootstrap_bundle(config.WECHAT_USER_AGENT_IOS)
+        self.assertTrue(version.startswith(f"{BOOTSTRAP_VERSION}-"))
+        self.assertIn(f'window.__wechatBootstrap = "{version}"', source)
+        self.assertIn("MicroMessenger", source)
+        self.assertIn("WeixinJSBridge", source)
+        self.assertIn("__wxjs_environment", source)
+        self.assertIn('"iPhone"', source)
+        self.assertNotIn("__UA__", source)
+        self.assertNotIn("\n//", source)
+        self.assertNotEqual(bootstrap_bundle(config.WECHAT_USER_AGENT_ANDROID)[1], version)
+
+    def test_install_registers_for_new_documents(self):
+        driver = BootstrapDriver()
+        version = install_bootstrap(driver)
+        commands = dict(driver.cdp_commands)
+        self.assertEqual(commands["Page.addScriptToEvaluateOnNewDocument"]["source"],
+                         bootstrap_bundle(config.DEFAULT_USER_AGENT)[0])
+        self.assertEqual(commands["Network.setUserAgentOverride"]["platform"], "Linux armv8l")
+        self.assertEqual(bootstrap_version(driver), version)
+
+    def test_scraper_start_installs_bundle(self):
+        with WeChatBrowserScraper(backend="fake") as scraper:
+            self.assertEqual(len(scraper.driver.new_document_scripts), 1)
+            self.assertEqual(bootstrap_version(scraper.driver), bootstrap_bundle(scraper.user_agent)[1])
+
+
+class TestDetectionSelfTest(unittest.TestCase):
+    """Test cases for detection_self_test"""
+
+    def setUp(self):
+        use_bootstrap_driver(self)
+
+    def make_scraper(self):
+        scraper = WeChatBrowserScraper(backend="fake")
+        scraper.start()
+        self.addCleanup(scraper.close)
+        site = FakeSite({config.VFMC_ENTRY_URL: ENTRY, "/User/Login": weixin_checked_page})
+        site.on_click("id", "login", lambda d, e: d.get(config.VFMC_BASE_URL + "/User/Login"))
+        scraper.driver.site = site
+        return scraper
+
+    def test_no_fallbacks_with_bootstrap(self):
+        report = detection_self_test(self.make_scraper(), runs=3, login_xpath="//*[@id='login']")
+        self.assertEqual(report["fallbacks"], 0)
+        self.assertEqual(report["kinds"], {"user_choose": 3})
+        self.assertEqual(list(report["bootstrap"]), [bootstrap_bundle(config.DEFAULT_USER_AGENT)[1]])
+
+    def test_fallbacks_counted_without_bootstrap(self):
+        scraper = self.make_scraper()
+        scraper.driver.new_document_scripts.clear()
+        report = detection_self_test(scraper, runs=2, login_xpath="//*[@id='login']")
+        self.assertEqual(report["fallback_rate"], 1.0)
+        self.assertEqual(report["bootstrap"], {"None": 2})
+
+    def test_captured_flow_still_reports_block(self):
+        # The saved captures predate the bootstrap; the fake serves them unchanged
+        with WeChatBrowserScraper(backend="fake") as scraper:
+            scraper.driver.site = capture_site()
+            report = detection_self_test(scraper, runs=1)
+        self.assertEqual(report["kinds"], {"wechat_block": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
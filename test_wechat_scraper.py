@@ -7,12 +7,19 @@ Basic tests to validate the scraper functionality.
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 from wechat_scraper import WeChatBrowserScraper
+import browser_cache
 import config
 
 
 class TestWeChatBrowserScraper(unittest.TestCase):
     """Test cases for WeChatBrowserScraper class"""
     
+    def setUp(self):
+        """Keep option-building tests from claiming a cache slot in the home directory"""
+        patcher = patch("browser_cache.process_cache_dir", browser_cache.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
     def test_initialization_default(self):
         """Test default initialization"""
         scraper = WeChatBrowserScraper()
@@ -81,7 +88,14 @@ class TestWeChatBrowserScraper(unittest.TestCase):
         self.assertIsNotNone(mobile_emulation)
         self.assertIn('deviceMetrics', mobile_emulation)
         self.assertIn('userAgent', mobile_emulation)
-    
+
+    def test_chrome_options_disk_cache(self):
+        """Test that the persistent disk cache directory is passed to Chrome"""
+        scraper = WeChatBrowserScraper()
+        options = scraper._setup_chrome_options()
+
+        self.assertTrue(any(arg.startswith('--disk-cache-dir=') for arg in options.arguments))
+
     def test_context_manager(self):
         """Test context manager protocol"""
         scraper = WeChatBrowserScraper()
@@ -0,0 +1,397 @@
+"""
+Availability Watch Daemon
+
+This module runs a long-lived watcher on a single asyncio event loop. It keeps
+one authenticated HTTP session, polls court availability, books matching slots
+the moment they free up, and serves its status as JSON on a small local HTTP
+endpoint. A WeChatBrowserScraper is only started when the HTTP path cannot
+proceed on its own, i.e. when the session has to log in again.
+
+Usage:
+    python watch_daemon.py --courts 3 5 --window 18-21 --hours 2
+    curl http://127.0.0.1:8765/
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from typing import Callable, Iterable, List, Optional
+
+import config
+from booking_planner import BookingAttempt, PlanSolver, PreferenceSpec
+from history_store import HistoryStore
+from page_parser import classify_page, free_cells, parse_page
+from resilient_http import ResilientSession
+from session_manager import SessionManager, http_heartbeat
+from slot_claims import ClaimCoordinator, target_keys
+
+
+class LoginRequiredError(RuntimeError):
+    """Raised by a fetch or booking call when the server wants a fresh login."""
+
+
+def browser_login(url: Optional[str] = None, wait: Optional[float] = None) -> list:
+    """
+    Log in through the WeChat browser and return the session cookies.
+
+    Opens the vfmc entry page, clicks the login entry and gives the user `wait`
+    seconds to finish logging in.
+
+    Args:
+        url: Entry page. If None, uses config.VFMC_ENTRY_URL
+        wait: Seconds to wait for the login to complete. If None, uses config default
+
+    Returns:
+        List of cookie dictionaries
+    """
+    # Imported here so the daemon never loads Selenium unless it has to log in
+    from selenium.webdriver.common.by import By
+    from wechat_scraper import WeChatBrowserScraper
+
+    wait = wait if wait is not None else config.LOGIN_WAIT
+    with WeChatBrowserScraper() as scraper:
+        scraper.open_url(url or config.VFMC_ENTRY_URL)
+        scraper.wait_for_element_clickable(By.XPATH, config.VFMC_LOGIN_XPATH).click()
+        print(f"Complete the login in the browser within {wait} seconds...")
+        time.sleep(wait)
+        return scraper.get_cookies()
+
+
+def login_required(response) -> bool:
+    """Tell whether a response means the session expired: 401/403 or a redirect to the user-type page."""
+    return (response.status_code in (401, 403) or "UserChoose" in response.url
+            or "UserChoose" in response.headers.get("Location", ""))
+
+
+def booking_confirmed(response) -> bool:
+    """
+    Tell whether a booking response confirms the booking.
+
+    Only a 2xx answer that is not a login, WeChat-block or browser-error page
+    counts; redirects are not followed, so an expired session never passes.
+    """
+    return (200 <= response.status_code < 300 and not login_required(response)
+            and classify_page(response.text) not in ("user_choose", "wechat_block", "browser_error"))
+
+
+def http_fetcher(client: ResilientSession, url_template: str,
+                 parse: Callable) -> Callable[[str], Iterable]:
+    """
+    Build a blocking fetch function that reads one day's availability over HTTP.
+
+    Args:
+        client: The session to fetch with
+        url_template: Availability URL with a {date} placeholder
+        parse: Function turning (date, response) into free (date, court, hour) cells
+
+    Returns:
+        Function taking a date string and returning its free cells
+    """
+    def fetch(date: str):
+        response = client.get(url_template.format(date=date), allow_redirects=True)
+        if login_required(response):
+            raise LoginRequiredError(f"Session expired while fetching {date}")
+        return parse(date, response)
+    return fetch
+
+
+def upcoming_dates(days: Optional[int] = None) -> List[str]:
+    """Get today and the following days as YYYY-MM-DD strings."""
+    today = datetime.date.today()
+    return [(today + datetime.timedelta(days=i)).isoformat()
+            for i in range(days or config.WATCH_DAYS_AHEAD)]
+
+
+class WatchDaemon:
+    """
+    Polls availability on one event loop and books slots as soon as they free up.
+
+    Blocking calls (HTTP fetches, bookings, browser logins) run in the loop's
+    default executor; the loop itself only sleeps between polls.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Iterable],
+        solver: PlanSolver,
+        book: Callable[[BookingAttempt], bool],
+        relogin: Optional[Callable[[], None]] = None,
+        dates: Callable[[], List[str]] = upcoming_dates,
+        interval: float = None,
+        max_bookings: int = 1,
+        history=None,
+        claims: Optional[ClaimCoordinator] = None,
+        status_host: str = None,
+        status_port: int = None
+    ):
+        """
+        Initialize the daemon.
+
+        Args:
+            fetch: Returns the free (date, court, hour) cells for one date; may be
+                a plain function or a coroutine function
+            solver: Compiled preferences deciding which free cells to book
+            book: Submits one attempt and returns True on success
+            relogin: Restores the session after LoginRequiredError. If None, the
+                error is recorded and polling continues
+            dates: Returns the dates to watch on each poll
+            interval: Seconds between polls. If None, uses config default
+            max_bookings: Stop booking once this many attempts have succeeded
+            history: Optional HistoryStore that records every availability change
+            claims: Optional ClaimCoordinator; a slot is only attempted after this node
+                has claimed it, so several nodes never attempt the same slot
+            status_host: Host of the status endpoint. If None, uses config default
+            status_port: Port of the status endpoint; 0 disables it. If None, uses config default
+        """
+        self.fetch = fetch
+        self.solver = solver
+        self.book = book
+        self.relogin = relogin
+        self.dates = dates
+        self.interval = interval if interval is not None else config.WATCH_INTERVAL
+        self.max_bookings = max_bookings
+        self.history = history
+        self.claims = claims
+        self.status_host = status_host or config.WATCH_STATUS_HOST
+        self.status_port = status_port if status_port is not None else config.WATCH_STATUS_PORT
+        self.free_cells = set()
+        self.booked: List[BookingAttempt] = []
+        self._tried = set()
+        self._deferred = False
+        self._stopping = None
+        self._server = None
+        self._started_at = time.time()
+        self._counters = {"polls": 0, "poll_errors": 0, "new_free_cells": 0,
+                          "booking_attempts": 0, "relogins": 0}
+        self._last_poll = None
+        self._last_error = None
+
+    async def _call(self, func, *args):
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def poll_once(self):
+        """
+        Fetch every watched date once and book any newly freed matching slot.
+        """
+        dates = self.dates()
+        if self.claims is not None:
+            await self._call(self.claims.renew)
+        results = await asyncio.gather(*(self._call(self.fetch, d) for d in dates),
+                                       return_exceptions=True)
+        self._counters["polls"] += 1
+        self._last_poll = time.time()
+
+        current = set()
+        fetched_dates = []
+        for date, result in zip(dates, results):
+            if isinstance(result, LoginRequiredError):
+                await self._relogin(result)
+                return
+            if isinstance(result, Exception):
+                self._counters["poll_errors"] += 1
+                self._last_error = f"{date}: {result}"
+                # Keep the last known state for a date that failed to load
+                current.update(cell for cell in self.free_cells if cell[0] == date)
+                continue
+            current.update(result)
+            fetched_dates.append(date)
+
+        if self.history is not None:
+            self.history.observe_free([c for c in current if c[0] in fetched_dates], fetched_dates)
+        new_cells = current - self.free_cells
+        self.free_cells = current
+        # Forget bookings whose cells are no longer free, so they are booked again if freed again
+        self._tried = {key for key in self._tried
+                       if all((key[0], key[1], h) in current for h in range(key[2], key[3]))}
+        if new_cells:
+            self._counters["new_free_cells"] += len(new_cells)
+        if new_cells or self._deferred:
+            await self._book(current)
+
+    async def _book(self, cells):
+        self._deferred = False
+        for attempt in self.solver.plan(cells):
+            if len(self.booked) >= self.max_bookings:
+                return
+            key = (attempt.date, attempt.court, attempt.start_hour, attempt.end_hour)
+            if key in self._tried:
+                continue
+            targets = target_keys(attempt)
+            if self.claims is not None and not await self._call(self.claims.claim_all, targets):
+                # Another node is on it (or on an overlapping block); look again next poll in case its claim lapses
+                self._deferred = True
+                continue
+            if self.claims is not None and not await self._call(self.claims.verify, targets):
+                # The lease lapsed since it was claimed; another node may be booking it
+                self._deferred = True
+                continue
+            self._counters["booking_attempts"] += 1
+            try:
+                ok = await self._call(self.book, attempt)
+            except LoginRequiredError as e:
+                await self._release(targets)
+                self._deferred = True
+                await self._relogin(e)
+                return
+            except Exception as e:
+                self._last_error = f"booking {key}: {e}"
+                ok = False
+            if not ok:
+                # Give the slot back so another node can try it; this one retries it next poll if it stays free
+                await self._release(targets)
+                self._deferred = True
+                continue
+            self._tried.add(key)
+            # The slot is ours and shows as taken from now on; keeping its leases would only make renew() grow
+            await self._release(targets)
+            print(f"Booked {attempt.court} on {attempt.date} "
+                  f"{attempt.start_hour}:00-{attempt.end_hour}:00")
+            self.booked.append(attempt)
+
+    async def _release(self, targets):
+        if self.claims is not None:
+            for target in targets:
+                await self._call(self.claims.release, target)
+
+    async def _relogin(self, error: Exception):
+        self._last_error = str(error)
+        if self.relogin is None:
+            return
+        print(f"{error}; logging in again...")
+        self._counters["relogins"] += 1
+        await self._call(self.relogin)
+
+    def status(self) -> dict:
+        """
+        Get the daemon's current status.
+
+        Returns:
+            JSON-serializable status dictionary
+        """
+        return {
+            "running": self._stopping is not None and not self._stopping.is_set(),
+            "uptime": round(time.time() - self._started_at, 1),
+            "last_poll": self._last_poll,
+            "last_error": self._last_error,
+            "free_cells": len(self.free_cells),
+            "booked": [attempt._asdict() for attempt in self.booked],
+            **self._counters,
+        }
+
+    async def _handle_status(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        body = json.dumps(self.status(), ensure_ascii=False, default=str).encode("utf-8")
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self):
+        """
+        Poll until stop() is called or max_bookings have been made.
+        """
+        self._stopping = asyncio.Event()
+        if self.status_port:
+            self._server = await asyncio.start_server(self._handle_status, self.status_host, self.status_port)
+            print(f"Status endpoint on http://{self.status_host}:{self.status_port}/")
+        try:
+            while not self._stopping.is_set() and len(self.booked) < self.max_bookings:
+                started = time.monotonic()
+                try:
+                    await self.poll_once()
+                except Exception as e:
+                    self._counters["poll_errors"] += 1
+                    self._last_error = str(e)
+                delay = max(0.0, self.interval - (time.monotonic() - started))
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._server is not None:
+                self._server.close()
+                await self._server.wait_closed()
+                self._server = None
+            self._stopping.set()
+
+    def stop(self):
+        """Ask run() to return after the current poll."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+
+def parse_free_cells(date: str, response) -> list:
+    """Read the free (date, court, hour) cells out of a court-list response."""
+    return free_cells(parse_page(response.text, default_date=date))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch vfmc availability and book freed slots")
+    parser.add_argument("--courts", nargs="*", default=[], help="Preferred courts, best first")
+    parser.add_argument("--window", action="append", default=[],
+                        help="Time window START-END in hours, best first (repeatable)")
+    parser.add_argument("--hours", type=int, default=1, help="Contiguous hours to book")
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between polls")
+    parser.add_argument("--port", type=int, default=None, help="Status port, 0 to disable")
+    parser.add_argument("--no-history", action="store_true", help="Do not record availability history")
+    args = parser.parse_args()
+
+    if not config.VFMC_AVAILABILITY_URL:
+        parser.error("Set VFMC_AVAILABILITY_URL in config.py first")
+
+    windows = [tuple(int(h) for h in w.split("-")) for w in args.window] or [(0, 24)]
+    solver = PlanSolver(PreferenceSpec(courts=args.courts, time_windows=windows, hours=args.hours))
+    client = ResilientSession()
+    heartbeat_url = config.SESSION_HEARTBEAT_URL or config.VFMC_AVAILABILITY_URL.format(date=upcoming_dates(1)[0])
+    session = SessionManager(browser_login, clients=[client], heartbeat=http_heartbeat(client, heartbeat_url))
+    session.load()
+    session.start()
+
+    def relogin():
+        # Never wait for the browser here: polling and booking carry on with the old cookies
+        session.invalidate("login required")
+
+    def book(attempt: BookingAttempt) -> bool:
+        if not config.VFMC_BOOKING_URL:
+            print(f"Dry run, would book: {attempt}")
+            return False
+        key = f"{attempt.date}-{attempt.court}-{attempt.start_hour}"
+        # An expired session answers with a redirect to the login page; following it would look like success
+        response = client.book(config.VFMC_BOOKING_URL, key, confirmed=booking_confirmed,
+                               allow_redirects=False, data={
+                                   "date": attempt.date, "court": attempt.court,
+                                   "start": attempt.start_hour, "end": attempt.end_hour,
+                               })
+        if login_required(response):
+            raise LoginRequiredError(f"Session expired while booking {key}")
+        return booking_confirmed(response)
+
+    history = None if args.no_history else HistoryStore()
+    claims = ClaimCoordinator() if config.CLAIM_STORE else None
+    daemon = WatchDaemon(http_fetcher(client, config.VFMC_AVAILABILITY_URL, parse_free_cells),
+                         solver, book, relogin=relogin, interval=args.interval,
+                         history=history, claims=claims, status_port=args.port)
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.stop()
+        client.close()
+        if history is not None:
+            history.close()
+        if claims is not None:
+            claims.release_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+WeChat Environment Bootstrap
+
+This module builds the script that makes every page believe it runs inside
+WeChat's built-in browser, and installs it with
+Page.addScriptToEvaluateOnNewDocument so it runs before any page script in
+every document, including after navigations and in new tabs. A one-off
+execute_script only patches the document that is current at the time, which
+leaves the vfmc pages' isWeixin checks to fire and sends the flow down the
+"blocked -> refetch -> sanitize -> data URL" fallback of badminton2.py.
+
+The bundle covers navigator.webdriver, the user agent fields (userAgent,
+appVersion, platform, vendor), a WeixinJSBridge stub that also fires
+WeixinJSBridgeReady, and window.__wxjs_environment. It is compiled once per
+user agent and tagged with a version, which pages expose as
+window.__wechatBootstrap so a run can tell which bundle it had.
+
+Usage:
+    install_bootstrap(driver, config.DEFAULT_USER_AGENT)
+
+    python wechat_bootstrap.py --runs 5   # detection self-test
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from selenium.webdriver.common.by import By
+
+import config
+from page_parser import classify_page
+
+BOOTSTRAP_VERSION = 1
+
+# Page kinds that mean the WeChat checks caught us and the fallback path is needed
+FALLBACK_KINDS = ("wechat_block", "browser_error")
+
+_BUNDLE_TEMPLATE = r"""
+(function () {
+  if (window.__wechatBootstrap) return;
+  var ua = __UA__, platform = __PLATFORM__, vendor = __VENDOR__;
+  function define(target, name, value) {
+    try {
+      Object.defineProperty(target, name, { get: function () { return value; }, configurable: true });
+    } catch (e) {}
+  }
+
+  // navigator fields read by isWeixin-style checks
+  define(Navigator.prototype, 'webdriver', undefined);
+  define(Navigator.prototype, 'userAgent', ua);
+  define(Navigator.prototype, 'appVersion', ua.replace(/^Mozilla\//, ''));
+  define(Navigator.prototype, 'platform', platform);
+  define(Navigator.prototype, 'vendor', vendor);
+
+  // Minimal WeixinJSBridge; API calls report failure instead of hanging
+  var handlers = {};
+  window.WeixinJSBridge = window.WeixinJSBridge || {
+    invoke: function (name, args, callback) {
+      if (typeof callback === 'function') setTimeout(function () { callback({ err_msg: name + ':fail' }); }, 0);
+    },
+    call: function () {},
+    on: function (name, handler) { (handlers[name] = handlers[name] || []).push(handler); },
+    publish: function () {},
+    subscribe: function () {},
+    config: function () {},
+    getEnv: function (callback) { if (typeof callback === 'function') callback({ miniprogram: false }); }
+  };
+  window.__wxjs_environment = window.__wxjs_environment || 'browser';
+
+  // Pages that wait for the bridge listen for this event
+  function ready() {
+    try { document.dispatchEvent(new Event('WeixinJSBridgeReady')); } catch (e) {}
+  }
+  if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', ready);
+  else ready();
+
+  window.__wechatBootstrap = __VERSION__;
+})();
+"""
+
+
+def platform_for(user_agent: str) -> tuple:
+    """
+    Get the navigator.platform and navigator.vendor values matching a user agent.
+
+    Args:
+        user_agent: WeChat User-Agent string
+
+    Returns:
+        (platform, vendor)
+    """
+    if "iPhone" in user_agent or "iPad" in user_agent:
+        return "iPhone", "Apple Computer, Inc."
+    return "Linux armv8l", "Google Inc."
+
+
+@lru_cache(maxsize=8)
+def bootstrap_bundle(user_agent: Optional[str] = None) -> tuple:
+    """
+    Compile the bootstrap script for a user agent.
+
+    Args:
+        user_agent: User-Agent the page should see. If None, uses default WeChat User-Agent
+
+    Returns:
+        (source, version); version is BOOTSTRAP_VERSION plus a hash of the source
+    """
+    user_agent = user_agent or config.DEFAULT_USER_AGENT
+    platform, vendor = platform_for(user_agent)
+    source = _BUNDLE_TEMPLATE
+    for name, value in (("__UA__", user_agent), ("__PLATFORM__", platform), ("__VENDOR__", vendor)):
+        source = source.replace(name, json.dumps(value))
+    # Drop comments and indentation; the bundle is injected into every document
+    lines = (line.strip() for line in source.splitlines())
+    source = "\n".join(line for line in lines if line and not line.startswith("//"))
+    version = f"{BOOTSTRAP_VERSION}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+    return source.replace("__VERSION__", json.dumps(version)), version
+
+
+def install_bootstrap(driver, user_agent: Optional[str] = None) -> str:
+    """
+    Install the bootstrap in a Selenium driver for every future document.
+
+    Args:
+        driver: Chrome (or fake) WebDriver
+        user_agent: User-Agent to present. If None, uses default WeChat User-Agent
+
+    Returns:
+        The installed bundle version
+    """
+    user_agent = user_agent or config.DEFAULT_USER_AGENT
+    source, version = bootstrap_bundle(user_agent)
+    platform, _ = platform_for(user_agent)
+    driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent, "platform": platform})
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+    # The current document predates the registration
+    driver.execute_script(source)
+    return version
+
+
+def bootstrap_version(driver) -> Optional[str]:
+    """Get the bootstrap version the current document ran with, or None if it had none."""
+    return driver.execute_script("return window.__wechatBootstrap || null")
+
+
+def detection_self_test(scraper, runs: int = 5, url: Optional[str] = None,
+                        login_xpath: Optional[str] = None, settle: float = 0.5) -> dict:
+    """
+    Walk the entry -> login flow repeatedly and count how often WeChat detection still wins.
+
+    Args:
+        scraper: A started WeChatBrowserScraper
+        runs: Number of flows
+        url: Entry page. If None, uses config default
+        login_xpath: Login entry clicked on the entry page. If None, uses config default
+        settle: Longest time in seconds to wait for the page after the click to finish loading
+
+    Returns:
+        Dictionary with runs, fallbacks, fallback_rate, page kinds and the bootstrap
+        versions the pages reported
+    """
+    url = url or config.VFMC_ENTRY_URL
+    login_xpath = login_xpath or config.VFMC_LOGIN_XPATH
+    kinds = Counter()
+    versions = Counter()
+    for _ in range(runs):
+        scraper.open_url(url)
+        scraper.wait_for_element_clickable(By.XPATH, login_xpath).click()
+        deadline = time.monotonic() + settle
+        while (scraper.execute_script("return document.readyState") != "complete"
+               and time.monotonic() < deadline):
+            time.sleep(0.02)
+        kinds[classify_page(scraper.get_page_source())] += 1
+        versions[str(bootstrap_version(scraper.driver))] += 1
+    fallbacks = sum(kinds[kind] for kind in FALLBACK_KINDS)
+    return {
+        "runs": runs,
+        "fallbacks": fallbacks,
+        "fallback_rate": fallbacks / runs if runs else 0.0,
+        "kinds": dict(kinds),
+        "bootstrap": dict(versions),
+    }
+
+
+def main():
+    from wechat_scraper import WeChatBrowserScraper
+
+    parser = argparse.ArgumentParser(description="Measure how often WeChat detection still forces the fallback path")
+    parser.add_argument("--runs", type=int, default=5, help="Number of entry -> login flows")
+    parser.add_argument("--backend", choices=["chrome", "fake"], default=None, help="Driver backend")
+    args = parser.parse_args()
+
+    with WeChatBrowserScraper(backend=args.backend) as scraper:
+        report = detection_self_test(scraper, runs=args.runs)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,11 +12,16 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 from typing import Optional
 
 import config
+from browser_cache import cache_arguments
+from dom_journal import DRAIN_SCRIPT, install_script
+from rate_limiter import PRIORITY_POLLING, shared_limiter
+from wechat_bootstrap import install_bootstrap
 
 
 class WeChatBrowserScraper:
@@ -32,7 +37,9 @@ class WeChatBrowserScraper:
         user_agent: Optional[str] = None,
         headless: bool = None,
         window_size: tuple = None,
-        timeout: int = None
+        timeout: int = None,
+        backend: Optional[str] = None,
+        cache_stats: bool = False
     ):
         """
         Initialize the WeChat browser scraper.
@@ -42,12 +49,21 @@ class WeChatBrowserScraper:
             headless: Whether to run browser in headless mode. If None, uses config default
             window_size: Browser window size as (width, height). If None, uses config default
             timeout: Default wait timeout in seconds. If None, uses config default
+            backend: "chrome" or "fake" (fake_driver.FakeDriver, no browser). If None, uses config default
+            cache_stats: Log network events so browser_cache.CacheStats can report hits. Chrome
+                buffers that log until it is read, so leave it off unless the statistics are wanted
         """
         self.user_agent = user_agent or config.DEFAULT_USER_AGENT
         self.headless = headless if headless is not None else config.HEADLESS
         self.window_size = window_size or (config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
         self.timeout = timeout or config.DEFAULT_TIMEOUT
+        self.backend = backend or config.DRIVER_BACKEND
+        self.cache_stats = cache_stats
         self.driver = None
+        self._journal_source = None
+        self._journal_driver = None
+        self._journal_script_id = None
+        self._journal_doc = None
         
     def _setup_chrome_options(self) -> Options:
         """
@@ -83,6 +99,14 @@ class WeChatBrowserScraper:
         }
         chrome_options.add_experimental_option("mobileEmulation", mobile_emulation)
         
+        # Reuse the persistent HTTP disk cache across runs
+        for arg in cache_arguments():
+            chrome_options.add_argument(arg)
+        
+        # Log network events only when browser_cache.CacheStats will read them
+        if self.cache_stats:
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        
         return chrome_options
     
     def start(self):
@@ -93,29 +117,66 @@ class WeChatBrowserScraper:
             print("Browser is already running")
             return
         
-        chrome_options = self._setup_chrome_options()
+        self.launch(self.resolve_driver())
+    
+    def resolve_driver(self) -> Optional[str]:
+        """
+        Find the ChromeDriver executable, downloading it if needed.
+        
+        Returns:
+            Path to ChromeDriver, or None for the fake backend
+        """
+        if self.backend == "fake":
+            return None
         
         # Use webdriver_manager to automatically manage ChromeDriver
-        service = Service(ChromeDriverManager().install())
+        return ChromeDriverManager().install()
+    
+    def launch(self, driver_path: Optional[str], chrome_options: Optional[Options] = None):
+        """
+        Launch the browser with an already resolved ChromeDriver.
+        
+        start() runs resolve_driver() and launch() in sequence; startup.StartupOrchestrator
+        runs them alongside the other startup work.
+        
+        Args:
+            driver_path: Path returned by resolve_driver()
+            chrome_options: Options from _setup_chrome_options(). If None, builds them
+        """
+        if self.backend == "fake":
+            from fake_driver import FakeDriver
+            self.driver = FakeDriver(user_agent=self.user_agent)
+            install_bootstrap(self.driver, self.user_agent)
+            print(f"Fake driver started with User-Agent: {self.user_agent}")
+            return
+        
+        chrome_options = chrome_options or self._setup_chrome_options()
+        service = Service(driver_path)
         
         # Create the driver
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
         
-        # Execute script to prevent detection
-        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        # Run the WeChat environment bootstrap before page scripts in every document
+        version = install_bootstrap(self.driver, self.user_agent)
+        print(f"WeChat bootstrap {version} installed")
         
         print(f"Browser started with User-Agent: {self.user_agent}")
     
-    def open_url(self, url: str):
+    def open_url(self, url: str, priority: int = PRIORITY_POLLING):
         """
         Navigate to a URL.
         
         Args:
             url: The URL to navigate to
+            priority: Rate limiter priority class of the navigation
         """
         if self.driver is None:
             raise RuntimeError("Browser not started. Call start() first.")
         
+        # Navigations share the host-wide request budget with every HTTP client;
+        # the fake backend never reaches the server
+        if self.backend != "fake" and not shared_limiter().acquire(url, priority, timeout=self.timeout):
+            raise TimeoutException(f"No rate limit token for {url} within {self.timeout}s")
         print(f"Navigating to: {url}")
         self.driver.get(url)
     
@@ -222,6 +283,103 @@ class WeChatBrowserScraper:
         
         self.driver.add_cookie(cookie_dict)
     
+    def start_change_journal(self, limit: Optional[int] = None):
+        """
+        Record DOM changes in the current document and every later one.
+        
+        Args:
+            limit: Entries kept between drains before the journal overflows. If None, uses config default
+        """
+        if self.driver is None:
+            raise RuntimeError("Browser not started. Call start() first.")
+        
+        self._journal_source = install_script(limit)
+        self._register_journal()
+        self.driver.execute_script(self._journal_source)
+        self._journal_doc = None
+    
+    def _register_journal(self):
+        # Replace this browser's earlier registration instead of stacking another one
+        if self._journal_driver is self.driver and self._journal_script_id is not None:
+            self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument",
+                                        {"identifier": self._journal_script_id})
+        result = self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                                             {"source": self._journal_source})
+        self._journal_script_id = result.get("identifier")
+        self._journal_driver = self.driver
+    
+    def drain_changes(self) -> dict:
+        """
+        Get the DOM changes since the previous call, and clear them in the page.
+        
+        When "reset" is set the page is a different document than at the
+        previous drain (a navigation, or the journal just started) and when
+        "overflow" is set changes were dropped; in both cases the changes do
+        not describe the page, so read it once with get_page_source().
+        
+        Returns:
+            Dictionary with "changes" (compact entries, see dom_journal), "overflow" and "reset"
+        """
+        if self.driver is None:
+            raise RuntimeError("Browser not started. Call start() first.")
+        if self._journal_source is None:
+            self.start_change_journal()
+        
+        result = self.driver.execute_script(DRAIN_SCRIPT)
+        if result is None:
+            # Not running in this document: a recycled browser, or a page that opened before the install
+            if self._journal_driver is not self.driver:
+                self._register_journal()
+            self._journal_doc = self.driver.execute_script("return " + self._journal_source)
+            return {"changes": [], "overflow": False, "reset": True}
+        
+        reset = result["doc"] != self._journal_doc
+        self._journal_doc = result["doc"]
+        return {"changes": result["changes"], "overflow": result["overflow"], "reset": reset}
+    
+    def set_cookies(self, cookies: list, url: Optional[str] = None):
+        """
+        Set cookies before any page of their site is open.
+        
+        Unlike add_cookie(), which only accepts cookies for the open page, this
+        goes through CDP, so the cookies are in place for the first request.
+        
+        Args:
+            cookies: List of cookie dictionaries, as returned by get_cookies()
+            url: Site for cookies saved without a domain
+        """
+        if self.driver is None:
+            raise RuntimeError("Browser not started. Call start() first.")
+        
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": [
+            {k: v for k, v in {"name": c["name"], "value": c.get("value", ""), "domain": c.get("domain") or None,
+                               "url": None if c.get("domain") else url,
+                               "path": c.get("path", "/"), "secure": c.get("secure", False),
+                               "httpOnly": c.get("httpOnly", False), "sameSite": c.get("sameSite"),
+                               "expires": c.get("expiry")}.items() if v is not None}
+            for c in cookies
+        ]})
+    
+    def recycle(self):
+        """
+        Restart the browser, carrying the session cookies and the current URL over.
+        
+        Frees everything a long-lived browser has accumulated (renderer leaks,
+        buffered logs, old documents) without logging in again.
+        """
+        if self.driver is None:
+            raise RuntimeError("Browser not started. Call start() first.")
+        
+        cookies = self.driver.get_cookies()
+        url = self.driver.current_url
+        self.close()
+        self.start()
+        
+        self.set_cookies(cookies)
+        if url and url.startswith("http"):
+            self.open_url(url)
+        print(f"Browser recycled with {len(cookies)} cookies")
+    
     def close(self):
         """
         Close the browser.